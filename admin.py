@@ -1,7 +1,6 @@
 # admin.py
+import io
 import os
-import json
-import tempfile
 from functools import wraps
 from typing import Any, Dict, List, Optional
 from flask import (
@@ -14,83 +13,45 @@ from flask import (
     current_app,
     abort,
 )
+import jsoncodec
+from store import get_storage, empty_hour
+from events import bus
 
 # Blueprint độc lập (template_folder trỏ tới thư mục templates của project)
 admin_bp = Blueprint("admin_bp", __name__, template_folder="templates")
 
-# Cấu hình file (có thể override bằng env vars)
-DATA_FILE = os.getenv("DATA_FILE", "data.json")
-HOUR_FILE = os.getenv("HOUR_FILE", "hour.json")
+# Cấu hình (có thể override bằng env vars)
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # set this in environment for production
 
 # -----------------------
 # Helpers: IO an toàn
 # -----------------------
-def ensure_file(path: str, default: Any) -> None:
+def load_data_file() -> List[Dict]:
     """
-    Tạo file nếu chưa tồn tại, ghi default (JSON) vào file.
+    Trả về list rounds; nếu storage lỗi trả [].
     """
-    if not os.path.exists(path):
-        try:
-            dirn = os.path.dirname(path) or "."
-            os.makedirs(dirn, exist_ok=True)
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(default, f, ensure_ascii=False, indent=2)
-        except Exception:
-            current_app.logger.exception("Failed to create file %s", path)
-
-def atomic_write_json(path: str, obj: Any) -> None:
-    """
-    Ghi JSON một cách atomic: ghi vào temp file rồi replace.
-    """
-    dirn = os.path.dirname(path) or "."
-    os.makedirs(dirn, exist_ok=True)
-    fd, tmp = tempfile.mkstemp(dir=dirn)
+    # dùng chung storage (và cache) với main.py
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
-            f.flush()
-            os.fsync(f.fileno())
-        os.replace(tmp, path)
-    finally:
-        if os.path.exists(tmp):
-            try:
-                os.remove(tmp)
-            except Exception:
-                pass
+        return get_storage().load_rounds()
+    except Exception:
+        current_app.logger.exception("Failed to load rounds")
+    return []
 
-def load_data_file(path: str = DATA_FILE) -> List[Dict]:
+def load_hour_file() -> Dict[str, Any]:
     """
-    Trả về list rounds; nếu file không hợp lệ trả [].
+    Trả về dict hour data; nếu storage lỗi trả default structure.
     """
-    ensure_file(path, [])
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
+        return get_storage().load_hour()
     except Exception:
-        current_app.logger.exception("Failed to load data file %s", path)
-    return []
+        current_app.logger.exception("Failed to load hour data")
+    return empty_hour()
 
-def load_hour_file(path: str = HOUR_FILE) -> Dict[str, Any]:
+def publish_reset() -> None:
     """
-    Trả về dict hour data; nếu file không hợp lệ trả default structure.
+    Báo cho các client /api/stream tải lại toàn bộ sau khi admin sửa dữ liệu.
     """
-    default = {"aa": {}, "four_kind": {}}
-    ensure_file(path, default)
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                # nhẹ nhàng migrate nếu cần
-                for k in ("aa", "four_kind"):
-                    if k not in data:
-                        data[k] = {}
-                return data
-    except Exception:
-        current_app.logger.exception("Failed to load hour file %s", path)
-    return default
+    bus.publish("reset", {"version": get_storage().data_version().version})
 
 # -----------------------
 # Auth decorator
@@ -123,14 +84,21 @@ def index():
     """
     Dashboard: hiển thị stats và preview recent rounds.
     """
-    data = load_data_file()
+    # số round từ aggregate + đọc đuôi cho preview: không nạp cả list rounds
+    storage = get_storage()
     hour_data = load_hour_file()
+    try:
+        total, _ = storage.totals()
+        preview = storage.tail_rounds(50)[::-1]
+    except Exception:
+        current_app.logger.exception("Failed to load rounds")
+        total, preview = 0, []
     stats = {
-        "rounds": len(data),
+        "rounds": total,
         "hour_slots_aa": len(hour_data.get("aa", {})),
         "hour_slots_fk": len(hour_data.get("four_kind", {})),
+        "tombstones": storage.tombstones(),
     }
-    preview = data[-50:][::-1] if isinstance(data, list) else []
     return render_template("admin/index.html", stats=stats, preview=preview)
 
 @admin_bp.route("/delete_round", methods=["POST"])
@@ -142,11 +110,10 @@ def delete_round():
     rid = request.form.get("round_id")
     if not rid:
         return redirect(url_for("admin_bp.index"))
-    data = load_data_file()
-    new = [r for r in data if r.get("round_id") != rid]
     try:
-        atomic_write_json(DATA_FILE, new)
+        get_storage().delete_round(rid)
         current_app.logger.info("admin deleted round %s", rid)
+        publish_reset()
     except Exception:
         current_app.logger.exception("Failed to delete round %s", rid)
     return redirect(url_for("admin_bp.index"))
@@ -158,9 +125,10 @@ def clear_all():
     Xóa toàn bộ data.json và hour.json (ghi lại default).
     """
     try:
-        atomic_write_json(DATA_FILE, [])
-        atomic_write_json(HOUR_FILE, {"aa": {}, "four_kind": {}})
+        get_storage().save_rounds([])
+        get_storage().save_hour(empty_hour())
         current_app.logger.info("admin cleared all data")
+        publish_reset()
     except Exception:
         current_app.logger.exception("Failed to clear all data")
     return redirect(url_for("admin_bp.index"))
@@ -169,16 +137,19 @@ def clear_all():
 @require_admin
 def export(which: str):
     """
-    Tải về data.json hoặc hour.json.
+    Tải về data.json hoặc hour.json (mặc định indent 2; ?pretty=0 = file như trên đĩa).
     """
-    if which == "data":
-        path = DATA_FILE
-        name = "data.json"
-    elif which == "hour":
-        path = HOUR_FILE
-        name = "hour.json"
-    else:
+    if which not in ("data", "hour"):
         return abort(404)
+    name = f"{which}.json"
+    path = get_storage().raw_json_path(which)
+    pretty = request.args.get("pretty", "1") != "0"
+    if path is None or (pretty and not jsoncodec.file_is_pretty()):
+        # journal / sqlite / file compact: dựng lại JSON dạng dễ đọc để tải về
+        obj = load_data_file() if which == "data" else load_hour_file()
+        payload = jsoncodec.dumps(obj, pretty=pretty)
+        return send_file(io.BytesIO(payload), mimetype="application/json",
+                         as_attachment=True, download_name=name)
     if not os.path.exists(path):
         return abort(404)
     # send_file sẽ stream file hiện có
@@ -192,20 +163,31 @@ def export(which: str):
 @require_admin
 def slot_delete():
     """
-    Xóa một slot trong hour.json (form POST: box='aa'|'four_kind', slot='HH:MM').
+    Xóa một slot trong hour data (form POST: box='aa'|'four_kind', slot='HH:MM').
     """
     box = request.form.get("box")
     slot = request.form.get("slot")
     if not box or not slot:
         return redirect(url_for("admin_bp.index"))
-    hour_data = load_hour_file()
-    if box in hour_data and slot in hour_data[box]:
-        try:
-            del hour_data[box][slot]
-            atomic_write_json(HOUR_FILE, hour_data)
+    try:
+        if get_storage().delete_slot(box, slot):
             current_app.logger.info("admin removed slot %s from %s", slot, box)
-        except Exception:
-            current_app.logger.exception("Failed to remove slot %s from %s", slot, box)
+            publish_reset()
+    except Exception:
+        current_app.logger.exception("Failed to remove slot %s from %s", slot, box)
+    return redirect(url_for("admin_bp.index"))
+
+@admin_bp.route("/compact", methods=["POST"])
+@require_admin
+def compact():
+    """
+    Compaction theo yêu cầu: ghi lại store, bỏ tombstone của các lần xóa.
+    """
+    try:
+        stats = get_storage().compact()
+        current_app.logger.info("admin compacted store: %s", stats)
+    except Exception:
+        current_app.logger.exception("Failed to compact store")
     return redirect(url_for("admin_bp.index"))
 
 @admin_bp.route("/health", methods=["GET"])
@@ -214,8 +196,8 @@ def health():
     Health check: trả 200 nếu có thể đọc file data/hour.
     """
     try:
-        _ = load_data_file()
-        _ = load_hour_file()
+        # refresh cả 2 store (chỉ đọc phần file mới đổi), không dựng list rounds
+        get_storage().data_version()
         return ("ok", 200)
     except Exception:
         return ("error", 500)
\ No newline at end of file
@@ -0,0 +1,222 @@
+# bench.py
+"""
+Micro-benchmark cho các đường nóng (load/save, stats, hour helpers, render index),
+chạy trên dữ liệu giả lập của gendata.py:
+
+    python bench.py                               # 1k, 100k, 1m -> bench_results/bench-<time>.json
+    python bench.py --sizes 1k,100k --repeat 10
+    python bench.py --journal                     # backend journal (data.jsonl/hour.jsonl)
+    python bench.py --compare before.json after.json
+
+Mỗi size chạy trong 1 process riêng (env DATA_FILE/HOUR_FILE trỏ vào bản copy của
+dataset) để cache trong bộ nhớ của size trước không ảnh hưởng size sau.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+DEFAULT_SIZES = "1k,100k,1m"
+DATA_DIR = "bench_data"
+RESULTS_DIR = "bench_results"
+BENCH_CARD = "As"
+
+
+def summarize(samples: List[float]) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "min_ms": round(min(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def timed(fn: Callable[[], object], repeat: int, warmup: bool = True) -> dict:
+    if warmup:
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+# -----------------------
+# Worker: chạy trong process con, env đã trỏ vào dataset
+# -----------------------
+def run_worker(repeat: int, save_repeat: int) -> Dict[str, dict]:
+    import main
+    from store import RoundStore, minute_counts_for_box
+
+    client = main.app.test_client()
+    data_file = os.environ["DATA_FILE"]
+    results: Dict[str, dict] = {}
+
+    def get(path: str) -> Callable[[], object]:
+        def call():
+            resp = client.get(path)
+            assert resp.status_code == 200, (path, resp.status_code)
+            return resp
+        return call
+
+    # parse lại cả file mỗi lần (instance mới, không có cache trong bộ nhớ)
+    results["load_data (cold parse)"] = timed(lambda: RoundStore(data_file).load(), repeat, warmup=False)
+    results["load_data (cached)"] = timed(main.load_data, repeat)
+    results["load_hour_data"] = timed(main.load_hour_data, repeat)
+
+    hour = main.load_hour_data()
+    aa_slots = list(hour.get("aa", {}).keys())
+    results["compute_stats_for_card"] = timed(lambda: main.compute_stats_for_card(BENCH_CARD), repeat)
+    results["top_cards_for_box"] = timed(lambda: main.top_cards_for_box("aa"), repeat)
+    results["best_card_for_slot x12"] = timed(
+        lambda: [main.best_card_for_slot("aa", t) for t in aa_slots[-12:]], repeat)
+    results["minute_counts_for_box"] = timed(lambda: minute_counts_for_box(hour, "aa"), repeat)
+    results["slots_after"] = timed(
+        lambda: main.slots_after(main.get_storage().slot_index("aa"), 3, main.now_minute_vn()), repeat)
+
+    for path in ("/", f"/?card={BENCH_CARD}", f"/api/stats/{BENCH_CARD}", "/api/stats/all",
+                 "/api/minutes/aa", "/api/top_cards?box=aa"):
+        results[f"GET {path}"] = timed(get(path), repeat)
+
+    def save():
+        resp = client.post("/save", data={
+            "first_card": BENCH_CARD,
+            "selected_box": ["cowboy_win", "suited_combo", "high_onepair"],
+        })
+        assert resp.status_code == 302, resp.status_code
+    results["POST /save"] = timed(save, save_repeat, warmup=False)
+    # sau khi ghi: lần đọc đầu tiên phải nạp lại phần đã đổi
+    results["GET / (after save)"] = timed(lambda: (save(), get("/")()), save_repeat, warmup=False)
+    return results
+
+# -----------------------
+# Driver
+# -----------------------
+def dataset_dir(size: str, journal: bool) -> str:
+    return os.path.join(DATA_DIR, size + ("-jsonl" if journal else ""))
+
+
+def ensure_dataset(size: str, journal: bool) -> str:
+    from gendata import parse_size, write_dataset
+    out = dataset_dir(size, journal)
+    meta = os.path.join(out, "meta.json")
+    n = parse_size(size)
+    try:
+        with open(meta, "r", encoding="utf-8") as f:
+            if json.load(f).get("rounds") == n:
+                return out
+    except (OSError, ValueError):
+        pass
+    print(f"Generating {size} dataset in {out} ...", file=sys.stderr)
+    info = write_dataset(n, out, journal)
+    with open(meta, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    return out
+
+
+def run_size(size: str, journal: bool, repeat: int, save_repeat: int) -> Dict[str, dict]:
+    src = ensure_dataset(size, journal)
+    ext = "jsonl" if journal else "json"
+    work = tempfile.mkdtemp(prefix=f"bench-{size}-")
+    try:
+        for name in (f"data.{ext}", f"hour.{ext}"):
+            shutil.copy(os.path.join(src, name), work)
+        env = dict(os.environ)
+        env.update({
+            "DATA_FILE": os.path.join(work, f"data.{ext}"),
+            "HOUR_FILE": os.path.join(work, f"hour.{ext}"),
+            "STORAGE_BACKEND": "json",
+        })
+        env.setdefault("SAVE_FLUSH_INTERVAL", "0")
+        env.setdefault("THEORY_WARM", "0")  # không để thread tính bảng lý thuyết chen vào số đo
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker",
+             "--repeat", str(repeat), "--save-repeat", str(save_repeat)],
+            env=env, cwd=work, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"benchmark worker for {size} failed:\n{proc.stderr}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """
+    In median của 2 file kết quả cạnh nhau, kèm tỉ lệ after/before.
+    """
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)["results"]
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)["results"]
+    for size in after:
+        print(f"== {size}")
+        for name, stats in after[size].items():
+            old = before.get(size, {}).get(name)
+            new_ms = stats["median_ms"]
+            if old is None:
+                print(f"  {name:32s} {'-':>10s} {new_ms:10.3f}")
+                continue
+            ratio = new_ms / old["median_ms"] if old["median_ms"] else float("inf")
+            print(f"  {name:32s} {old['median_ms']:10.3f} {new_ms:10.3f}  x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark hot paths against synthetic datasets")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="vd. 1k,100k,1m")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--save-repeat", type=int, default=3, help="số lần POST /save (ghi file thật)")
+    ap.add_argument("--journal", action="store_true", help="dùng data.jsonl/hour.jsonl")
+    ap.add_argument("--out", help="file kết quả JSON (mặc định bench_results/bench-<time>.json)")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeat, args.save_repeat)))
+        sys.exit(0)
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    started = datetime.datetime.now()
+    report = {
+        "meta": {
+            "started": started.isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": "jsonl" if args.journal else "json",
+            "repeat": args.repeat,
+            "save_repeat": args.save_repeat,
+        },
+        "results": {},
+    }
+    for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        print(f"Benchmarking {size} ...", file=sys.stderr)
+        report["results"][size] = run_size(size, args.journal, args.repeat, args.save_repeat)
+        for name, stats in report["results"][size].items():
+            print(f"  {name:32s} median {stats['median_ms']:10.3f} ms", file=sys.stderr)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {out}", file=sys.stderr)
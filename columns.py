@@ -0,0 +1,662 @@
+# columns.py
+import base64
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy không bắt buộc -> reduction bằng vòng lặp Python
+    np = None
+
+# Cùng thứ tự với all_cards() / BOXES trong main.py
+RANKS = "23456789TJQKA"
+SUITS = ['h', 'd', 'c', 's']
+CARDS = [r + s for r in RANKS for s in SUITS]
+BOX_KEYS = (
+    "cowboy_win", "draw", "bull_win",
+    "suited_combo", "pair_any", "aa",
+    "high_onepair", "two_pair", "trips", "full_house", "four_kind",
+)
+CARD_INDEX = {c: i for i, c in enumerate(CARDS)}
+BOX_BIT = {b: 1 << i for i, b in enumerate(BOX_KEYS)}
+NO_CARD = 255  # first_card rỗng / không hợp lệ
+NO_TS = -1  # round chưa có ts: đứng đầu bảng, không thuộc cửa sổ thời gian nào
+
+VN_OFFSET = 7 * 3600
+MINUTES_PER_DAY = 24 * 60
+
+
+def box_mask(boxes: Iterable[str]) -> int:
+    mask = 0
+    for b in boxes or ():
+        mask |= BOX_BIT.get(b, 0)
+    return mask
+
+
+def card_box_of(r: dict) -> Tuple[int, int]:
+    return CARD_INDEX.get(r.get("first_card"), NO_CARD), box_mask(r.get("selected_boxes"))
+
+
+def row_of(r: dict, ts: Optional[int]) -> Tuple[int, int, int]:
+    return card_box_of(r) + (NO_TS if ts is None else ts,)
+
+
+class RoundFilter(NamedTuple):
+    """
+    Điều kiện AND trên round: rank/suit của first_card, các box phải có / không được có.
+    """
+    rank: Optional[str] = None
+    suit: Optional[str] = None
+    with_boxes: Tuple[str, ...] = ()
+    without_boxes: Tuple[str, ...] = ()
+
+
+class BitsetIndex:
+    """
+    Inverted index dạng bitset (int Python, bit i = dòng i của RoundTable) theo box,
+    rank và suit. Query AND nhiều điều kiện = AND các int rồi bit_count().
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.boxes: Dict[str, int] = {}
+        self.ranks: Dict[str, int] = {}
+        self.suits: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, table: "RoundTable") -> "BitsetIndex":
+        n = len(table)
+        idx = cls(n)
+        if np is not None and n:
+            card = np.frombuffer(table.card, dtype=np.uint8)
+            boxes = np.frombuffer(table.boxes, dtype=np.uint16)
+            valid = card != NO_CARD
+
+            def bits(mask) -> int:
+                return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+            idx.boxes = {b: bits((boxes & bit) != 0) for b, bit in BOX_BIT.items()}
+            idx.ranks = {r: bits(valid & (card // 4 == i)) for i, r in enumerate(RANKS)}
+            idx.suits = {s: bits(valid & (card % 4 == i)) for i, s in enumerate(SUITS)}
+            return idx
+        # không có numpy: bật bit trong bytearray rồi đổi sang int 1 lần (tránh O(n^2))
+        nbytes = (n + 7) // 8
+        raw = {kind: {name: bytearray(nbytes) for name in names}
+               for kind, names in (("boxes", BOX_KEYS), ("ranks", RANKS), ("suits", SUITS))}
+        for i in range(n):
+            byte, bit = i >> 3, 1 << (i & 7)
+            for kind, name in cls._keys(table.card[i], table.boxes[i]):
+                raw[kind][name][byte] |= bit
+        for kind, bufs in raw.items():
+            setattr(idx, kind, {name: int.from_bytes(buf, "little") for name, buf in bufs.items()})
+        return idx
+
+    @staticmethod
+    def _keys(card: int, boxes: int) -> Iterator[Tuple[str, str]]:
+        for b, bit in BOX_BIT.items():
+            if boxes & bit:
+                yield "boxes", b
+        if card != NO_CARD:
+            yield "ranks", RANKS[card // 4]
+            yield "suits", SUITS[card % 4]
+
+    def append(self, card: int, boxes: int) -> None:
+        bit = 1 << self.size
+        self.size += 1
+        for kind, name in self._keys(card, boxes):
+            target = getattr(self, kind)
+            target[name] = target.get(name, 0) | bit
+
+    def match(self, flt: RoundFilter, lo: int, hi: int) -> int:
+        """
+        Bitset các dòng trong [lo, hi) thỏa flt.
+        """
+        acc = ((1 << hi) - 1) ^ ((1 << lo) - 1)
+        if flt.rank is not None:
+            acc &= self.ranks.get(flt.rank, 0)
+        if flt.suit is not None:
+            acc &= self.suits.get(flt.suit, 0)
+        for b in flt.with_boxes:
+            acc &= self.boxes.get(b, 0)
+        for b in flt.without_boxes:
+            acc &= ~self.boxes.get(b, 0)
+        return acc
+
+
+class RoundTable:
+    """
+    Bảng round dạng cột: card (1 byte, index theo CARDS), boxes (bitmask uint16 theo
+    BOX_KEYS), ts (int64, NO_TS nếu không có). Sắp theo ts để cắt cửa sổ [since, until)
+    bằng bisect; các reduction chạy bằng numpy trên buffer (không copy) nếu có.
+    ~11 byte/round thay vì vài trăm byte của 1 dict round.
+    """
+
+    def __init__(self):
+        self.card = array("B")
+        self.boxes = array("H")
+        self.ts = array("q")
+        self._bits: Optional[BitsetIndex] = None  # dựng lúc query đầu tiên
+
+    def __len__(self) -> int:
+        return len(self.card)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.card, self.boxes, self.ts))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, int, int]]) -> "RoundTable":
+        t = cls()
+        # sort ổn định theo ts: round cùng ts giữ thứ tự ghi (giống time index)
+        for card, boxes, ts in sorted(rows, key=lambda row: row[2]):
+            t.card.append(card)
+            t.boxes.append(boxes)
+            t.ts.append(ts)
+        return t
+
+    def add(self, row: Tuple[int, int, int]) -> None:
+        card, boxes, ts = row
+        if not self.ts or ts >= self.ts[-1]:
+            i = len(self.ts)
+            if self._bits is not None:
+                self._bits.append(card, boxes)
+        else:
+            i = bisect_right(self.ts, ts)
+            self._bits = None  # chèn giữa làm lệch vị trí bit -> dựng lại khi cần
+        self.card.insert(i, card)
+        self.boxes.insert(i, boxes)
+        self.ts.insert(i, ts)
+
+    def remove(self, row: Tuple[int, int, int]) -> bool:
+        # các dòng giống hệt nhau thì bỏ dòng nào cũng cho cùng kết quả thống kê
+        card, boxes, ts = row
+        for i in range(bisect_left(self.ts, ts), bisect_right(self.ts, ts)):
+            if self.card[i] == card and self.boxes[i] == boxes:
+                self._bits = None
+                del self.card[i]
+                del self.boxes[i]
+                del self.ts[i]
+                return True
+        return False
+
+    def window(self, since: Optional[int], until: Optional[int]) -> Tuple[int, int]:
+        """
+        [lo, hi) của các dòng có since <= ts < until (bỏ dòng không có ts).
+        """
+        lo = bisect_left(self.ts, max(since, 0) if since is not None else 0)
+        hi = bisect_left(self.ts, until) if until is not None else len(self.ts)
+        return lo, max(lo, hi)
+
+    # -----------------------
+    # Snapshot
+    # -----------------------
+    def to_state(self) -> Dict[str, str]:
+        return {k: base64.b64encode(getattr(self, k).tobytes()).decode("ascii")
+                for k in ("card", "boxes", "ts")}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, str]) -> "RoundTable":
+        t = cls()
+        for k in ("card", "boxes", "ts"):
+            getattr(t, k).frombytes(base64.b64decode(state[k]))
+        if not (len(t.card) == len(t.boxes) == len(t.ts)):
+            raise ValueError("round table columns differ in length")
+        return t
+
+    # -----------------------
+    # Reductions trên [lo, hi)
+    # -----------------------
+    def _np(self, lo: int, hi: int):
+        card = np.frombuffer(self.card, dtype=np.uint8)[lo:hi] if len(self.card) else np.zeros(0, np.uint8)
+        boxes = np.frombuffer(self.boxes, dtype=np.uint16)[lo:hi] if len(self.boxes) else np.zeros(0, np.uint16)
+        return card, boxes
+
+    def _ordered_cards(self, card_col, counts) -> List[Tuple[str, int]]:
+        # như Counter.most_common: cùng số lần thì lá xuất hiện trước đứng trước
+        uniq, first = np.unique(card_col, return_index=True)
+        first_pos = dict(zip(uniq.tolist(), first.tolist()))
+        order = sorted((i for i in range(len(CARDS)) if counts[i] > 0),
+                       key=lambda i: (-counts[i], first_pos[i]))
+        return [(CARDS[i], int(counts[i])) for i in order]
+
+    def card_stats(self, card: str, lo: int, hi: int) -> Tuple[int, Dict[str, int]]:
+        idx = CARD_INDEX.get(card)
+        if idx is None:
+            return 0, {}
+        if np is None:
+            total, counts = 0, Counter()
+            for i in range(lo, hi):
+                if self.card[i] == idx:
+                    total += 1
+                    counts.update(b for b, bit in BOX_BIT.items() if self.boxes[i] & bit)
+            return total, dict(counts)
+        card_col, boxes = self._np(lo, hi)
+        sel = boxes[card_col == idx]
+        counts = {b: int(np.count_nonzero(sel & bit)) for b, bit in BOX_BIT.items()}
+        return int(sel.size), {b: n for b, n in counts.items() if n}
+
+    def all_card_stats(self, lo: int, hi: int) -> Dict[str, Tuple[int, Dict[str, int]]]:
+        if np is None:
+            out: Dict[str, Tuple[int, Counter]] = {}
+            for i in range(lo, hi):
+                if self.card[i] == NO_CARD:
+                    continue
+                total, counts = out.get(CARDS[self.card[i]], (0, Counter()))
+                counts.update(b for b, bit in BOX_BIT.items() if self.boxes[i] & bit)
+                out[CARDS[self.card[i]]] = (total + 1, counts)
+            return {c: (n, dict(counts)) for c, (n, counts) in out.items()}
+        card_col, boxes = self._np(lo, hi)
+        totals = np.bincount(card_col, minlength=256)
+        per_box = {b: np.bincount(card_col[(boxes & bit) != 0], minlength=256) for b, bit in BOX_BIT.items()}
+        return {
+            c: (int(totals[i]), {b: int(v[i]) for b, v in per_box.items() if v[i]})
+            for i, c in enumerate(CARDS) if totals[i]
+        }
+
+    def top_cards(self, limit: int, lo: int, hi: int) -> List[Tuple[str, int]]:
+        if np is None:
+            counts = Counter(CARDS[self.card[i]] for i in range(lo, hi) if self.card[i] != NO_CARD)
+            return counts.most_common(limit)
+        card_col, _ = self._np(lo, hi)
+        card_col = card_col[card_col != NO_CARD]
+        return self._ordered_cards(card_col, np.bincount(card_col, minlength=256))[:limit]
+
+    def box_card_counts(self, box: str, lo: int, hi: int) -> Counter:
+        bit = BOX_BIT.get(box, 0)
+        if np is None:
+            return Counter(CARDS[self.card[i]] for i in range(lo, hi)
+                           if self.boxes[i] & bit and self.card[i] != NO_CARD)
+        card_col, boxes = self._np(lo, hi)
+        card_col = card_col[((boxes & bit) != 0) & (card_col != NO_CARD)]
+        return Counter(dict(self._ordered_cards(card_col, np.bincount(card_col, minlength=256))))
+
+    def bitsets(self) -> BitsetIndex:
+        if self._bits is None:
+            self._bits = BitsetIndex.build(self)
+        return self._bits
+
+    def query(self, flt: RoundFilter, targets: Iterable[str], lo: int, hi: int) -> Tuple[int, Dict[str, int]]:
+        """
+        (số dòng thỏa flt, {target: số dòng thỏa flt và có box target}) trong [lo, hi).
+        """
+        bits = self.bitsets()
+        acc = bits.match(flt, lo, hi)
+        return acc.bit_count(), {t: (acc & bits.boxes.get(t, 0)).bit_count() for t in targets}
+
+    def hit_times(self, box: str, lo: int, hi: int) -> List[int]:
+        """
+        ts (tăng dần) của các round có box trong [lo, hi), bỏ round không có ts / lá.
+        """
+        bit = BOX_BIT.get(box, 0)
+        if np is None:
+            return [self.ts[i] for i in range(lo, hi)
+                    if self.boxes[i] & bit and self.card[i] != NO_CARD and self.ts[i] != NO_TS]
+        card_col, boxes = self._np(lo, hi)
+        ts = np.frombuffer(self.ts, dtype=np.int64)[lo:hi] if len(self.ts) else np.zeros(0, np.int64)
+        return ts[((boxes & bit) != 0) & (card_col != NO_CARD) & (ts != NO_TS)].tolist()
+
+    def minute_counts(self, box: str, lo: int, hi: int) -> List[int]:
+        """
+        Số round có box theo phút trong ngày (giờ VN).
+        """
+        bit = BOX_BIT.get(box, 0)
+        if np is None:
+            counts = [0] * MINUTES_PER_DAY
+            for i in range(lo, hi):
+                if self.boxes[i] & bit and self.card[i] != NO_CARD:
+                    counts[((self.ts[i] + VN_OFFSET) // 60) % MINUTES_PER_DAY] += 1
+            return counts
+        card_col, boxes = self._np(lo, hi)
+        ts = np.frombuffer(self.ts, dtype=np.int64)[lo:hi] if len(self.ts) else np.zeros(0, np.int64)
+        sel = ts[((boxes & bit) != 0) & (card_col != NO_CARD)]
+        return np.bincount((sel + VN_OFFSET) // 60 % MINUTES_PER_DAY, minlength=MINUTES_PER_DAY).tolist()
+
+
+class RoundLog:
+    """
+    Các round còn sống theo thứ tự ghi: card, boxes, ts (như RoundTable) kèm seq tăng dần
+    (không dùng lại sau khi xóa). round_id -> seq -> vị trí bằng bisect, nên xóa 1 round
+    lấy được dòng của nó và các round kề bên mà không cần list dict của toàn bộ history.
+    """
+
+    def __init__(self):
+        self.seq = array("q")
+        self.card = array("B")
+        self.boxes = array("H")
+        self.ts = array("q")
+        self.next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self.seq)
+
+    def append(self, card: int, boxes: int, ts: int) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        self.seq.append(seq)
+        self.card.append(card)
+        self.boxes.append(boxes)
+        self.ts.append(ts)
+        return seq
+
+    def position(self, seq: int) -> Optional[int]:
+        i = bisect_left(self.seq, seq)
+        return i if i < len(self.seq) and self.seq[i] == seq else None
+
+    def row(self, i: int) -> Tuple[int, int, int]:
+        return self.card[i], self.boxes[i], self.ts[i]
+
+    def remove(self, i: int) -> None:
+        for col in (self.seq, self.card, self.boxes, self.ts):
+            del col[i]
+
+    def tail(self, n: int) -> List[Tuple[int, int]]:
+        """
+        (card, boxes) của n round mới nhất, cũ -> mới.
+        """
+        start = max(0, len(self.seq) - n)
+        return list(zip(self.card[start:], self.boxes[start:]))
+
+    # -----------------------
+    # Snapshot (seq đánh lại 0..n-1)
+    # -----------------------
+    def to_state(self) -> Dict[str, str]:
+        return {k: base64.b64encode(getattr(self, k).tobytes()).decode("ascii")
+                for k in ("card", "boxes", "ts")}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, str]) -> "RoundLog":
+        log = cls()
+        for k in ("card", "boxes", "ts"):
+            getattr(log, k).frombytes(base64.b64decode(state[k]))
+        if not (len(log.card) == len(log.boxes) == len(log.ts)):
+            raise ValueError("round log columns differ in length")
+        log.seq = array("q", range(len(log.card)))
+        log.next_seq = len(log.card)
+        return log
+
+
+# bit index của các box trong mask (tra bảng thay vì duyệt BOX_BIT mỗi lần)
+_MASK_BITS = [tuple(j for j in range(len(BOX_KEYS)) if m >> j & 1) for m in range(1 << len(BOX_KEYS))]
+
+
+class WindowCounts:
+    """
+    Bộ đếm của 1 cửa sổ: tổng round, số lần mỗi box, theo lá (total + box).
+    """
+
+    def __init__(self):
+        nb = len(BOX_KEYS)
+        self.total = 0
+        self.box = [0] * nb
+        self.card_total = [0] * len(CARDS)
+        self.card_box = [0] * (len(CARDS) * nb)
+
+    def update(self, card: int, boxes: int, sign: int) -> None:
+        self.total += sign
+        bits = _MASK_BITS[boxes]
+        for j in bits:
+            self.box[j] += sign
+        if card != NO_CARD:
+            self.card_total[card] += sign
+            base = card * len(BOX_KEYS)
+            for j in bits:
+                self.card_box[base + j] += sign
+
+
+class RecentWindows:
+    """
+    Ring buffer của `capacity` round mới nhất (theo thứ tự ghi) và bộ đếm cho từng cỡ
+    cửa sổ (vd. 50/200/1000 round gần nhất). Mỗi round mới: cộng vào mọi cửa sổ, trừ
+    round vừa rơi khỏi từng cửa sổ -> O(số cửa sổ) mỗi lần, không quét lại history.
+    """
+
+    def __init__(self, sizes: Iterable[int]):
+        self.sizes = tuple(sorted({int(w) for w in sizes if int(w) > 0}))
+        self.capacity = self.sizes[-1] if self.sizes else 0
+        self.card = array("B", [NO_CARD]) * self.capacity
+        self.boxes = array("H", [0]) * self.capacity
+        self.head = 0  # vị trí ghi tiếp theo
+        self.filled = 0
+        self.windows = {w: WindowCounts() for w in self.sizes}
+
+    def push(self, card: int, boxes: int) -> None:
+        if not self.capacity:
+            return
+        for w, counts in self.windows.items():
+            if self.filled >= w:
+                old = (self.head - w) % self.capacity
+                counts.update(self.card[old], self.boxes[old], -1)
+            counts.update(card, boxes, 1)
+        self.card[self.head] = card
+        self.boxes[self.head] = boxes
+        self.head = (self.head + 1) % self.capacity
+        self.filled = min(self.filled + 1, self.capacity)
+
+    def rows(self) -> List[Tuple[int, int]]:
+        """
+        Các dòng trong ring, cũ -> mới.
+        """
+        start = (self.head - self.filled) % self.capacity if self.capacity else 0
+        return [(self.card[(start + i) % self.capacity], self.boxes[(start + i) % self.capacity])
+                for i in range(self.filled)]
+
+    def totals(self, window: int) -> Tuple[int, Dict[str, int]]:
+        counts = self.windows[window]
+        return counts.total, {b: n for b, n in zip(BOX_KEYS, counts.box) if n}
+
+    def card_stats(self, card: str, window: int) -> Tuple[int, Dict[str, int]]:
+        counts = self.windows[window]
+        idx = CARD_INDEX.get(card)
+        if idx is None:
+            return 0, {}
+        base = idx * len(BOX_KEYS)
+        return counts.card_total[idx], {
+            b: n for b, n in zip(BOX_KEYS, counts.card_box[base:base + len(BOX_KEYS)]) if n}
+
+    # -----------------------
+    # Snapshot
+    # -----------------------
+    def to_state(self) -> Dict[str, Any]:
+        rows = self.rows()
+        return {
+            "sizes": list(self.sizes),
+            "card": base64.b64encode(array("B", [c for c, _ in rows]).tobytes()).decode("ascii"),
+            "boxes": base64.b64encode(array("H", [b for _, b in rows]).tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_state(cls, sizes: Iterable[int], state: Dict[str, Any]) -> "RecentWindows":
+        rw = cls(sizes)
+        if list(rw.sizes) != state["sizes"]:
+            # đổi RECENT_WINDOWS -> ring cũ có thể không đủ dài, phải build lại từ rounds
+            raise ValueError("recent window sizes changed")
+        card, boxes = array("B"), array("H")
+        card.frombytes(base64.b64decode(state["card"]))
+        boxes.frombytes(base64.b64decode(state["boxes"]))
+        if len(card) != len(boxes):
+            raise ValueError("recent window columns differ in length")
+        for row in zip(card, boxes):
+            rw.push(*row)
+        return rw
+
+    @classmethod
+    def from_rows(cls, sizes: Iterable[int], rows: Iterable[Tuple[int, int]]) -> "RecentWindows":
+        """
+        Ring từ các dòng (card, boxes) cũ -> mới, vd. RoundLog.tail(capacity).
+        """
+        rw = cls(sizes)
+        for row in rows:
+            rw.push(*row)
+        return rw
+
+
+# thứ tự giống TOP_KEYS / RIGHT_KEYS trong main.py
+TOP_OUTCOMES = ("cowboy_win", "draw", "bull_win")
+HAND_OUTCOMES = ("high_onepair", "two_pair", "trips", "full_house", "four_kind")
+
+
+def _outcome_table(outcomes: Tuple[str, ...]) -> List[Optional[int]]:
+    # mask -> index outcome nếu round có đúng 1 box trong nhóm, None nếu 0 hoặc nhiều
+    group = box_mask(outcomes)
+    bit_index = {BOX_BIT[b]: i for i, b in enumerate(outcomes)}
+    return [bit_index.get(m & group) for m in range(1 << len(BOX_KEYS))]
+
+
+_TOP_OF = _outcome_table(TOP_OUTCOMES)
+_HAND_OF = _outcome_table(HAND_OUTCOMES)
+
+
+def _longest_run(col: Sequence[int], skip: int, j: int, v: int) -> int:
+    """
+    Chuỗi dài nhất các round liên tiếp có bit j == v trong col, bỏ qua dòng skip.
+    """
+    if np is not None:
+        bits = (np.delete(np.asarray(col, dtype=np.uint16), skip) >> j & 1) == v
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], bits, [False])).astype(np.int8)))
+        return int((edges[1::2] - edges[::2]).max()) if edges.size else 0
+    best = cur = 0
+    for i, m in enumerate(col):
+        if i == skip:
+            continue
+        cur = cur + 1 if (m >> j & 1) == v else 0
+        best = max(best, cur)
+    return best
+
+
+class SequenceStats:
+    """
+    Thống kê theo thứ tự ghi của rounds: ma trận chuyển (Markov bậc 1) giữa kết quả
+    top (cowboy/draw/bull) và giữa loại bài bên phải của 2 round liên tiếp, cùng chuỗi
+    nổ / chuỗi trượt hiện tại và dài nhất của từng box. push() là O(số box).
+    Round không có đúng 1 kết quả trong nhóm thì cắt chuỗi chuyển của nhóm đó.
+    """
+
+    FIELDS = ("count", "top", "hand", "last_top", "last_hand",
+              "current", "longest", "misses", "longest_misses")
+
+    def __init__(self):
+        nb = len(BOX_KEYS)
+        self.count = 0
+        self.top = [[0] * len(TOP_OUTCOMES) for _ in TOP_OUTCOMES]
+        self.hand = [[0] * len(HAND_OUTCOMES) for _ in HAND_OUTCOMES]
+        self.last_top: Optional[int] = None
+        self.last_hand: Optional[int] = None
+        self.current = [0] * nb  # số round liên tiếp gần nhất có box
+        self.longest = [0] * nb
+        self.misses = [0] * nb  # số round liên tiếp gần nhất không có box
+        self.longest_misses = [0] * nb
+
+    def push(self, boxes: int) -> None:
+        self.count += 1
+        top, hand = _TOP_OF[boxes], _HAND_OF[boxes]
+        if top is not None and self.last_top is not None:
+            self.top[self.last_top][top] += 1
+        if hand is not None and self.last_hand is not None:
+            self.hand[self.last_hand][hand] += 1
+        self.last_top, self.last_hand = top, hand
+        for j in range(len(BOX_KEYS)):
+            if boxes >> j & 1:
+                self.current[j] += 1
+                self.misses[j] = 0
+                if self.current[j] > self.longest[j]:
+                    self.longest[j] = self.current[j]
+            else:
+                self.misses[j] += 1
+                self.current[j] = 0
+                if self.misses[j] > self.longest_misses[j]:
+                    self.longest_misses[j] = self.misses[j]
+
+    def remove(self, col: Sequence[int], pos: int) -> None:
+        """
+        Bỏ round thứ pos khỏi thống kê; col = cột boxes theo thứ tự ghi, vẫn còn round đó.
+        Ma trận chuyển và chuỗi cuối sửa từ các round kề bên (O(độ dài chuỗi chứa round));
+        chuỗi dài nhất chỉ phải quét lại col khi round nằm trong 1 chuỗi đang dài nhất.
+        """
+        n = len(col)
+        x = col[pos]
+        prev = col[pos - 1] if pos > 0 else None
+        nxt = col[pos + 1] if pos + 1 < n else None
+        self.count -= 1
+        for matrix, outcome_of, last in ((self.top, _TOP_OF, "last_top"), (self.hand, _HAND_OF, "last_hand")):
+            a = outcome_of[prev] if prev is not None else None
+            b = outcome_of[x]
+            c = outcome_of[nxt] if nxt is not None else None
+            if a is not None and b is not None:
+                matrix[a][b] -= 1
+            if b is not None and c is not None:
+                matrix[b][c] -= 1
+            if a is not None and c is not None:
+                matrix[a][c] += 1
+            if nxt is None:
+                setattr(self, last, a)
+
+        rescan = []
+        for j in range(len(BOX_KEYS)):
+            v = x >> j & 1
+            # tail/longest của chuỗi cùng giá trị với round bị xóa, và của chuỗi ngược giá trị
+            same_tail, other_tail = (self.current, self.misses) if v else (self.misses, self.current)
+            same_longest, other_longest = (self.longest, self.longest_misses) if v else (self.longest_misses, self.longest)
+            start, end = pos, pos + 1
+            while start > 0 and (col[start - 1] >> j & 1) == v:
+                start -= 1
+            while end < n and (col[end] >> j & 1) == v:
+                end += 1
+            if end - start == same_longest[j]:
+                rescan.append((j, v, same_longest))
+            if end - start > 1:
+                if end == n:
+                    same_tail[j] -= 1
+                continue
+            # round đứng riêng 1 chuỗi: 2 chuỗi ngược giá trị ở 2 bên nối lại
+            left = start
+            while left > 0 and (col[left - 1] >> j & 1) != v:
+                left -= 1
+            if end == n:
+                same_tail[j] = 0
+                other_tail[j] = start - left
+                continue
+            if start == 0:
+                continue
+            right = end
+            while right < n and (col[right] >> j & 1) != v:
+                right += 1
+            merged = (start - left) + (right - end)
+            other_longest[j] = max(other_longest[j], merged)
+            if right == n:
+                other_tail[j] = merged
+        for j, v, longest in rescan:
+            longest[j] = _longest_run(col, pos, j, v)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Bản sao dạng dict (đọc ngoài lock được).
+        """
+        return {
+            "rounds": self.count,
+            "top": {"outcomes": list(TOP_OUTCOMES), "counts": [list(r) for r in self.top],
+                    "last": TOP_OUTCOMES[self.last_top] if self.last_top is not None else None},
+            "hand": {"outcomes": list(HAND_OUTCOMES), "counts": [list(r) for r in self.hand],
+                     "last": HAND_OUTCOMES[self.last_hand] if self.last_hand is not None else None},
+            "streaks": {b: {"current": self.current[j], "longest": self.longest[j],
+                            "misses": self.misses[j], "longest_misses": self.longest_misses[j]}
+                        for j, b in enumerate(BOX_KEYS)},
+        }
+
+    # -----------------------
+    # Snapshot
+    # -----------------------
+    def to_state(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "SequenceStats":
+        seq = cls()
+        for k in cls.FIELDS:
+            value = state[k]
+            if isinstance(getattr(seq, k), list) and (
+                    not isinstance(value, list) or len(value) != len(getattr(seq, k))):
+                raise ValueError(f"bad sequence state: {k}")
+            setattr(seq, k, value)
+        return seq
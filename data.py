@@ -175,6 +175,12 @@ def print_report(stats):
     print()
 
 if __name__ == "__main__":
-    data = load_data(DATA_FILE)
+    import sys
+    if len(sys.argv) > 1:
+        data = load_data(sys.argv[1])
+    else:
+        # mặc định đọc qua storage của app (json / jsonl / sqlite)
+        from store import get_storage
+        data = get_storage().load_rounds()
     stats = analyze(data)
     print_report(stats)
\ No newline at end of file
@@ -0,0 +1,65 @@
+# events.py
+import queue
+import threading
+from typing import Any, Set, Tuple
+
+import jsoncodec
+
+Event = Tuple[str, Any]
+
+
+class EventBus:
+    """
+    Pub/sub trong process cho /api/stream (SSE).
+    Mỗi subscriber có 1 queue riêng; subscriber chậm bị đầy queue thì nhận 'reset'
+    thay vì làm nghẽn save_round.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subs: Set["queue.Queue[Event]"] = set()
+
+    def subscribe(self) -> "queue.Queue[Event]":
+        q: "queue.Queue[Event]" = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q: "queue.Queue[Event]") -> None:
+        with self._lock:
+            self._subs.discard(q)
+
+    def publish(self, event: str, data: Any) -> None:
+        with self._lock:
+            subs = list(self._subs)
+        for q in subs:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                # bỏ các delta đang chờ, client sẽ tải lại toàn bộ
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait(("reset", {"version": data.get("version") if isinstance(data, dict) else None}))
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+
+def format_sse(event: str, data: Any, event_id: Any = None) -> str:
+    """
+    Một message SSE: 'id:' (tuỳ chọn), 'event:', 'data:' (JSON 1 dòng), kết thúc bằng dòng trống.
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + jsoncodec.dumps_str(data))
+    return "\n".join(lines) + "\n\n"
+
+
+bus = EventBus()
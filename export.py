@@ -0,0 +1,112 @@
+# export.py
+import csv
+import io
+import zlib
+from typing import Any, Iterable, Iterator, Sequence, Tuple
+
+import jsoncodec
+
+# gom dòng tới ~64KB rồi mới yield để không gửi quá nhiều chunk nhỏ
+CHUNK_BYTES = 64 * 1024
+
+ROUND_FIELDS = ("round_id", "first_card", "selected_boxes", "ts")
+HOUR_FIELDS = ("box", "slot", "card")
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def hour_rows(hour_data: dict) -> Iterator[dict]:
+    """
+    Hour data -> mỗi lần nổ 1 dòng {box, slot, card}; slot rỗng -> card None.
+    """
+    for box, slots in hour_data.items():
+        if not isinstance(slots, dict):
+            continue
+        for slot, cards in slots.items():
+            if not cards:
+                yield {"box": box, "slot": slot, "card": None}
+                continue
+            for card in cards:
+                yield {"box": box, "slot": slot, "card": card}
+
+
+def _csv_value(v: Any) -> Any:
+    if v is None:
+        return ""
+    if isinstance(v, (list, tuple)):
+        return "|".join(str(x) for x in v)
+    return v
+
+
+def _buffered(lines: Iterable[str]) -> Iterator[bytes]:
+    buf = []
+    size = 0
+    for line in lines:
+        buf.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def iter_ndjson(rows: Iterable[dict]) -> Iterator[bytes]:
+    return _buffered(jsoncodec.dumps_str(r) + "\n" for r in rows)
+
+
+def iter_csv(rows: Iterable[dict], fields: Sequence[str]) -> Iterator[bytes]:
+    """
+    CSV với header = fields; list (selected_boxes) ghép bằng '|'.
+    """
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    for r in rows:
+        writer.writerow([_csv_value(r.get(f)) for f in fields])
+        if out.tell() >= CHUNK_BYTES:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode("utf-8")
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Nén gzip từng chunk khi stream (không giữ toàn bộ output trong bộ nhớ).
+    """
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> header gzip
+    for chunk in chunks:
+        data = comp.compress(chunk)
+        if data:
+            yield data
+    yield comp.flush()
+
+
+def stream_rows(rows: Iterable[dict], fmt: str, fields: Sequence[str]) -> Iterator[bytes]:
+    if fmt == "csv":
+        return iter_csv(rows, fields)
+    return iter_ndjson(rows)
+
+
+def export_filename(which: str, fmt: str, gz: bool) -> str:
+    return f"{which}.{FORMATS[fmt][1]}" + (".gz" if gz else "")
+
+
+def content_type(fmt: str) -> str:
+    return FORMATS[fmt][0]
+
+
+def page_bounds(cursor: str, limit: str, total: int) -> Tuple[int, int]:
+    """
+    (offset, limit) từ query cursor/limit; limit <= 0 hoặc rỗng = tới hết. ValueError nếu sai.
+    """
+    offset = int(cursor) if cursor else 0
+    n = int(limit) if limit else 0
+    if offset < 0:
+        raise ValueError("cursor phải >= 0")
+    return offset, (n if n > 0 else max(0, total - offset))
@@ -0,0 +1,111 @@
+# gendata.py
+"""
+Sinh data.json / hour.json giả lập (vd. cho bench.py):
+
+    python gendata.py 100k bench_data/100k            # data.json + hour.json
+    python gendata.py 1m bench_data/1m --journal      # data.jsonl + hour.jsonl
+
+Mỗi round được chia bài ngẫu nhiên rồi chốt box bằng theory.settle_batch, nên tỉ lệ
+các box giống ván thật; ts cách nhau ~ROUND_INTERVAL giây, kết thúc ở thời điểm hiện tại.
+"""
+import argparse
+import os
+import random
+import time
+import uuid
+from typing import Iterator, List, Optional
+
+import jsoncodec
+from store import empty_hour, fold_hit, round_hits, write_hour_file
+from theory import card_name, settle_batch
+
+ROUND_INTERVAL = 45  # giây giữa 2 round
+CHUNK = 50000
+
+SIZES = {"k": 1000, "m": 1000000}
+
+
+def parse_size(value: str) -> int:
+    """
+    '1k' / '100k' / '1m' / '2500' -> số rounds.
+    """
+    value = value.strip().lower()
+    if value and value[-1] in SIZES:
+        return int(float(value[:-1]) * SIZES[value[-1]])
+    return int(value)
+
+
+def gen_rounds(n: int, seed: int = 1, interval: int = ROUND_INTERVAL,
+               end_ts: Optional[int] = None) -> Iterator[List[dict]]:
+    """
+    Sinh n round theo từng chunk (không giữ cả 1M round trong bộ nhớ).
+    """
+    rng = random.Random(seed)
+    end_ts = int(time.time()) if end_ts is None else end_ts
+    ts = end_ts - n * interval
+    deck = list(range(52))
+    done = 0
+    while done < n:
+        size = min(CHUNK, n - done)
+        deals = [rng.sample(deck, 9) for _ in range(size)]
+        chunk = []
+        for deal, boxes in zip(deals, settle_batch(deals)):
+            ts += max(1, int(rng.gauss(interval, interval / 6)))
+            chunk.append({
+                "round_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "first_card": card_name(deal[4]),
+                "selected_boxes": boxes,
+                "ts": ts,
+            })
+        done += size
+        yield chunk
+
+
+def write_dataset(n: int, out_dir: str, journal: bool = False, seed: int = 1) -> dict:
+    """
+    Ghi data + hour vào out_dir, trả về {data_file, hour_file, rounds, hits}.
+    data.json có cùng định dạng với atomic_write_json (theo DATA_JSON_STYLE).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ext = "jsonl" if journal else "json"
+    data_file = os.path.join(out_dir, f"data.{ext}")
+    hour_file = os.path.join(out_dir, f"hour.{ext}")
+    hour = empty_hour()
+    hits = 0
+    first = True
+    pretty = jsoncodec.file_is_pretty()
+    with open(data_file, "w", encoding="utf-8") as f:
+        if not journal:
+            f.write("[")
+        for chunk in gen_rounds(n, seed):
+            for r in chunk:
+                if journal:
+                    f.write(jsoncodec.dumps_str(r) + "\n")
+                    continue
+                if pretty:
+                    f.write("\n  " if first else ",\n  ")
+                    f.write(jsoncodec.dumps(r, pretty=True).decode("utf-8").replace("\n", "\n  "))
+                else:
+                    f.write("" if first else ",")
+                    f.write(jsoncodec.dumps_str(r))
+                first = False
+            for box, slot, card in round_hits(chunk):
+                fold_hit(hour, {"box": box, "slot": slot, "card": card})
+                hits += 1
+        if not journal:
+            f.write("\n]" if pretty and not first else "]")
+    write_hour_file(hour, hour_file)
+    return {"data_file": data_file, "hour_file": hour_file, "rounds": n, "hits": hits}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate synthetic data.json/hour.json")
+    ap.add_argument("size", help="số rounds, vd. 1k, 100k, 1m")
+    ap.add_argument("out_dir")
+    ap.add_argument("--journal", action="store_true", help="ghi data.jsonl/hour.jsonl")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    info = write_dataset(parse_size(args.size), args.out_dir, args.journal, args.seed)
+    print(f"Wrote {info['rounds']} rounds ({info['hits']} hour hits) to {args.out_dir} "
+          f"in {time.perf_counter() - t0:.1f}s")
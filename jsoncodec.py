@@ -0,0 +1,93 @@
+# jsoncodec.py
+import os
+import re
+import json
+from typing import Any, Iterable, Iterator, Union
+
+try:
+    import orjson
+except ImportError:  # orjson không bắt buộc -> dùng json của stdlib
+    orjson = None
+
+# Cấu hình (có thể override bằng env vars)
+# JSON_CODEC: "auto" = orjson nếu đã cài, "orjson", hoặc "json" (stdlib)
+# DATA_JSON_STYLE: định dạng data.json/hour.json trên đĩa, "compact" hoặc "pretty" (indent=2)
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+DATA_JSON_STYLE = os.getenv("DATA_JSON_STYLE", "compact").lower()
+
+_use_orjson = orjson is not None and JSON_CODEC in ("auto", "orjson")
+
+
+def codec_name() -> str:
+    return "orjson" if _use_orjson else "json"
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    obj -> UTF-8 bytes (không escape non-ASCII). pretty = indent 2, còn lại compact.
+    """
+    if _use_orjson:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError:
+            # kiểu orjson không hỗ trợ (vd. int > 64 bit) -> để stdlib xử lý
+            pass
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    """
+    Compact, dạng str (cho SSE / NDJSON).
+    """
+    return dumps(obj).decode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Parse JSON; lỗi cú pháp raise ValueError (như json.JSONDecodeError).
+    """
+    if _use_orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_array(data: Union[bytes, str]) -> Iterator[Any]:
+    """
+    Decode lần lượt từng phần tử của 1 JSON array (không dựng cả list trong bộ nhớ).
+    Không phải array -> không có phần tử nào; lỗi cú pháp raise ValueError.
+    """
+    text = data.decode("utf-8") if isinstance(data, bytes) else data
+    decoder = json.JSONDecoder()
+    i = _SEPARATORS.match(text).end()
+    if text[i:i + 1] != "[":
+        return
+    i += 1
+    while True:
+        i = _SEPARATORS.match(text, i).end()
+        if i >= len(text) or text[i] == "]":
+            return
+        item, i = decoder.raw_decode(text, i)
+        yield item
+
+
+def dump_file(obj: Any) -> bytes:
+    """
+    Nội dung file data.json/hour.json theo DATA_JSON_STYLE.
+    """
+    return dumps(obj, pretty=DATA_JSON_STYLE == "pretty")
+
+
+def file_is_pretty() -> bool:
+    return DATA_JSON_STYLE == "pretty"
+
+
+def dump_lines(records: Iterable[Any]) -> bytes:
+    """
+    Các dòng journal (JSONL): mỗi record 1 dòng compact.
+    """
+    return b"".join(dumps(r) + b"\n" for r in records)
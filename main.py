@@ -1,19 +1,46 @@
 from flask import Flask, render_template, request, redirect, url_for, jsonify, flash
+from flask import make_response, session, Response, stream_with_context, g
+from functools import wraps
+from werkzeug.http import is_resource_modified
+import io
 import os
-import json
+import re
+import time
+import queue
+import statistics
+import threading
 import datetime
 import uuid
 from flask import send_file, abort
+from bisect import bisect_right
 from collections import Counter
-from typing import Optional, Iterable, List, Tuple
+from itertools import islice
+from typing import Any, Callable, Dict, Optional, Iterable, List, Tuple
 from markupsafe import Markup, escape
 from admin import admin_bp
+from events import bus, format_sse
+import jsoncodec
+from metrics import SLOW_REQUEST_MS, metrics
+from export import (
+    FORMATS, HOUR_FIELDS, ROUND_FIELDS, content_type, export_filename,
+    gzip_stream, hour_rows, page_bounds, stream_rows,
+)
+from columns import RoundFilter
+from store import (
+    HOUR_BOXES, RECENT_WINDOWS, VN_TZ, PartialCommitError, SlotIndex, get_storage, parse_hhmm,
+)
+from theory import THEORY_WARM, TheoryNotReady, card_name, parse_deal, settle, settle_batch, theory
+from writer import writer
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret")  # đổi trên production
 app.register_blueprint(admin_bp, url_prefix="/admin")
-DATA_FILE = "data.json"
-HOUR_FILE = "hour.json"
+DATA_FILE = os.getenv("DATA_FILE", "data.json")
+HOUR_FILE = os.getenv("HOUR_FILE", "hour.json")
+
+# THEORY_WARM=1: chưa có theory.json thì bắt đầu tính ở thread nền ngay (khoá file, 1 worker tính)
+if THEORY_WARM:
+    theory.ensure()
 
 
 BOXES = {
@@ -62,83 +89,47 @@ def card_label(c: Optional[str]) -> Optional[str]:
         return Markup(f'{escape(rank)}<span style="color:{dark};font-weight:600;margin-left:4px">{escape(symbol)}</span>')
 
 def ensure_data_file() -> None:
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f)
+    get_storage().ensure()
 
 def load_data() -> List[dict]:
-    ensure_data_file()
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return []
+    # đọc qua storage (JSON: cache RoundStore, chỉ parse lại khi data.json thay đổi)
+    with metrics.timer("load_data"):
+        return get_storage().load_rounds()
 
 def save_data(arr: List[dict]) -> None:
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(arr, f, ensure_ascii=False, indent=2)
+    with metrics.timer("save_data"):
+        get_storage().save_rounds(arr)
 
 # -----------------------
 # Hour file helpers (slot -> list of cards)
 # -----------------------
 def ensure_hour_file() -> None:
-    if not os.path.exists(HOUR_FILE):
-        with open(HOUR_FILE, "w", encoding="utf-8") as f:
-            json.dump({"aa": {}, "four_kind": {}}, f)
+    get_storage().ensure()
 
 def load_hour_data() -> dict:
-    ensure_hour_file()
-    try:
-        with open(HOUR_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except (json.JSONDecodeError, OSError):
-        data = {"aa": {}, "four_kind": {}}
-
-    # migrate nhẹ nếu dữ liệu cũ là list các HH:MM strings
-    for key in ("aa", "four_kind"):
-        if key in data and isinstance(data[key], list):
-            new = {}
-            for t in data[key]:
-                if isinstance(t, str):
-                    new.setdefault(t, [])
-            data[key] = new
-        elif key not in data:
-            data[key] = {}
-
-    return data
+    with metrics.timer("load_hour_data"):
+        return get_storage().load_hour()
 
 def save_hour_data(data: dict) -> None:
-    with open(HOUR_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with metrics.timer("save_hour_data"):
+        get_storage().save_hour(data)
 
 # -----------------------
 # Time helpers (VN)
 # -----------------------
-VN_TZ = datetime.timezone(datetime.timedelta(hours=7))
-
 def now_vn() -> datetime.datetime:
     return datetime.datetime.now(datetime.timezone.utc).astimezone(VN_TZ)
 
-def format_hhmm(dt: datetime.datetime) -> str:
-    return dt.strftime("%H:%M")
-
-def parse_hhmm(s: str) -> Optional[Tuple[int, int]]:
+def request_now_vn() -> datetime.datetime:
     """
-    Chuyển 'HH:MM' -> (h, m). Trả None nếu không phải chuỗi hợp lệ hoặc ngoài phạm vi.
+    now_vn() đọc 1 lần cho cả request (ETag và nội dung cùng 1 phút).
     """
-    if not isinstance(s, str):
-        return None
-    parts = s.split(":")
-    if len(parts) != 2:
-        return None
-    try:
-        h = int(parts[0])
-        m = int(parts[1])
-    except ValueError:
-        return None
-    if 0 <= h < 24 and 0 <= m < 60:
-        return h, m
-    return None
+    if "now_vn" not in g:
+        g.now_vn = now_vn()
+    return g.now_vn
+
+def format_hhmm(dt: datetime.datetime) -> str:
+    return dt.strftime("%H:%M")
 
 def hhmm_to_minutes(hhmm: str) -> Optional[int]:
     """
@@ -156,71 +147,144 @@ def minutes_to_hhmm(minutes: int) -> str:
     m = minutes % 60
     return f"{h:02d}:{m:02d}"
 
-def next_cycle_slots(history_list: Optional[Iterable[str]], n: int = 3) -> Optional[List[str]]:
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_time_param(value: Optional[str], now: int) -> Optional[int]:
     """
-    Trả về danh sách n slot 'HH:MM' tiếp theo theo vòng trong ngày dựa trên history_list.
-    - history_list có thể là None, list các chuỗi, hoặc dict.keys() (iterable).
-    - Nếu không có slot hợp lệ trả về None.
-    - Sắp xếp theo phút trong ngày, chọn slot đầu tiên lớn hơn thời điểm hiện tại,
-      nếu không có thì quay vòng từ đầu.
+    Tham số since/until -> UTC epoch (giây). Nhận: epoch (giây hoặc ms),
+    ISO 8601 (không có múi giờ = giờ VN), 'today' (00:00 hôm nay giờ VN), 'now',
+    hoặc khoảng lùi từ hiện tại như '2h', '30m', '7d'. Rỗng -> None; sai -> ValueError.
     """
-    if not history_list:
+    if value is None or value.strip() == "":
         return None
+    v = value.strip().lower()
+    if v == "now":
+        return now
+    if v == "today":
+        day = datetime.datetime.fromtimestamp(now, VN_TZ).replace(hour=0, minute=0, second=0)
+        return int(day.timestamp())
+    m = re.fullmatch(r"(\d+)([smhd])", v)
+    if m:
+        return now - int(m.group(1)) * DURATION_UNITS[m.group(2)]
+    try:
+        ts = float(v)
+    except ValueError:
+        return parse_iso_time(value)
+    return epoch_seconds(ts)
 
-    # Chuẩn hoá: lấy các chuỗi hợp lệ 'HH:MM' duy nhất theo thứ tự xuất hiện
-    seen = set()
-    clean: List[str] = []
-    for item in history_list:
-        if not isinstance(item, str):
-            continue
-        if item in seen:
-            continue
-        if parse_hhmm(item) is None:
-            continue
-        seen.add(item)
-        clean.append(item)
+def epoch_seconds(ts: float) -> int:
+    # epoch ms (> 1e12) -> giây
+    return int(ts / 1000 if ts > 1e12 else ts)
 
-    if not clean:
-        return None
+def parse_iso_time(value: str) -> int:
+    """
+    ISO 8601 -> UTC epoch (giây); không có múi giờ = giờ VN. Sai -> ValueError.
+    """
+    try:
+        dt = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"thời gian không hợp lệ: {value!r}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=VN_TZ)
+    return int(dt.timestamp())
 
-    # helper chuyển 'HH:MM' -> phút (đảm bảo int)
-    def to_minutes(s: str) -> int:
-        val = hhmm_to_minutes(s)
-        return int(val) if val is not None else 0
+def parse_round_ts(value: Any) -> int:
+    """
+    ts của round gửi lên: chỉ nhận epoch dạng số nguyên (giây hoặc ms) hoặc chuỗi ISO 8601.
+    Không nhận dạng tương đối của since/until ('2h', 'today', 'now').
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return epoch_seconds(value)
+    if isinstance(value, str) and value.strip():
+        return parse_iso_time(value)
+    raise ValueError(f"ts phải là epoch (số nguyên) hoặc ISO 8601: {value!r}")
 
-    sorted_day = sorted(clean, key=to_minutes)
+def request_window() -> Tuple[Optional[int], Optional[int]]:
+    """
+    (since, until) từ query string. Mốc tương đối tính theo đầu phút hiện tại
+    để kết quả (và ETag) giữ nguyên trong cùng 1 phút.
+    """
+    now = int(time.time()) // 60 * 60
+    return (parse_time_param(request.args.get("since"), now),
+            parse_time_param(request.args.get("until"), now))
 
-    now_minutes = now_vn().hour * 60 + now_vn().minute
+def request_recent_window() -> Optional[int]:
+    """
+    Tham số ?window=N (N round gần nhất), N phải thuộc RECENT_WINDOWS.
+    """
+    value = request.args.get("window")
+    if value is None or value == "":
+        return None
+    try:
+        window = int(value)
+    except ValueError:
+        window = None
+    if window not in RECENT_WINDOWS:
+        raise ValueError(f"window phải là một trong {', '.join(map(str, RECENT_WINDOWS))}")
+    return window
 
-    # tìm index bắt đầu: slot đầu tiên có phút > now_minutes
-    idx_start = 0
-    for i, s in enumerate(sorted_day):
-        if to_minutes(s) > now_minutes:
-            idx_start = i
-            break
-    else:
-        idx_start = 0
+def window_vary() -> str:
+    try:
+        since, until = request_window()
+    except ValueError:
+        return "invalid"
+    return f"{since}-{until}" if since is not None or until is not None else "all"
+
+def now_minute_vn(now: Optional[datetime.datetime] = None) -> int:
+    """
+    Phút trong ngày (giờ VN) từ 1 lần đọc đồng hồ, tránh giờ/phút lệch nhau qua mốc.
+    """
+    now = now or now_vn()
+    return now.hour * 60 + now.minute
 
-    length = len(sorted_day)
-    res = [sorted_day[(idx_start + k) % length] for k in range(n)]
-    return res
+def slots_after(index: SlotIndex, n: int, now_minute: Optional[int] = None) -> Optional[List[str]]:
+    """
+    n slot 'HH:MM' kế tiếp sau now_minute (quay vòng trong ngày); None nếu box chưa có slot.
+    """
+    minutes = index.next_minutes(now_minute_vn() if now_minute is None else now_minute, n)
+    return [minutes_to_hhmm(m) for m in minutes] or None
 
 # -----------------------
 # Statistics
 # -----------------------
-def compute_stats_for_card(card: str) -> dict:
-    data = load_data()  # list round objects (schema mới)
-    # lọc rounds cho lá được chọn
-    rounds = [r for r in data if r.get("first_card") == card]
-    total = len(rounds)
-
-    # counts: số rounds chứa mỗi box (inclusive)
-    counts = Counter()
-    for r in rounds:
-        sbs = r.get("selected_boxes") or []
-        for sb in sbs:
-            counts[sb] += 1
+def compute_stats_for_card(card: str, since: Optional[int] = None, until: Optional[int] = None) -> dict:
+    # total + counts lấy từ aggregate của RoundStore (không quét lại history);
+    # có since/until thì chỉ đếm các round trong cửa sổ (bisect trên time index)
+    total, counts = get_storage().card_stats(card, since, until)
+    return stats_from_counts(total, counts)
+
+def compute_recent_stats(window: int, card: Optional[str] = None) -> dict:
+    """
+    Stats trên `window` round mới nhất (bộ đếm trượt, không quét history);
+    card=None -> mọi lá.
+    """
+    total, counts = get_storage().recent_stats(window, card)
+    stats = stats_from_counts(total, counts)
+    stats["window"] = window
+    return stats
+
+def compute_stats_for_all_cards(since: Optional[int] = None, until: Optional[int] = None) -> dict:
+    """
+    Stats của cả 52 lá từ 1 lần đọc storage (1 lượt qua rounds khi có since/until),
+    cùng cấu trúc với compute_stats_for_card cho từng lá.
+    """
+    per_card = get_storage().all_card_stats(since, until)
+    return {c: stats_from_counts(*per_card.get(c, (0, {}))) for c in all_cards()}
 
+def card_box_matrix(stats: dict) -> dict:
+    """
+    Ma trận đếm lá x box (hàng theo all_cards(), cột theo BOXES) cho front end.
+    """
+    boxes = list(BOXES.keys())
+    cards = all_cards()
+    return {
+        "cards": cards,
+        "boxes": boxes,
+        "totals": [stats[c]["total"] for c in cards],
+        "counts": [[stats[c]["counts"].get(b, 0) for b in boxes] for c in cards],
+    }
+
+def stats_from_counts(total: int, counts: dict) -> dict:
     # percent: tỉ lệ mỗi ô trên tổng rounds (inclusive)
     percent = {k: round((counts.get(k, 0) / total * 100), 2) if total > 0 else 0.0 for k in BOXES.keys()}
 
@@ -257,51 +321,44 @@ def compute_stats_for_card(card: str) -> dict:
         "percent_by_section": percent_by_section
     }
     
-def compute_global_top_cards(limit: int = 12) -> List[tuple]:
-    data = load_data()  # mỗi phần tử là 1 round
-    c = Counter()
-    for r in data:
-        card = r.get("first_card")
-        if card:
-            c[card] += 1
-    return c.most_common(limit)
+def compute_global_top_cards(limit: int = 12, since: Optional[int] = None,
+                             until: Optional[int] = None) -> List[tuple]:
+    return get_storage().top_cards(limit, since, until)
     
 # -----------------------
 # Helpers for hour.json analysis
 # -----------------------
-def best_card_for_slot_from_hour(hour_box: dict, slot: str, min_samples: int = 1) -> Optional[dict]:
-    if not isinstance(hour_box, dict):
-        return None
-    cards = hour_box.get(slot, [])
-    if not cards:
-        return None
-    counts = Counter(cards)
-    total = len(cards)
-    best_card, best_count = counts.most_common(1)[0]
-    if best_count < min_samples:
+def best_card_entry(card: str, count: int, total: int, min_samples: int = 1) -> Optional[dict]:
+    if count < min_samples:
         return None
     return {
-        "card": best_card,
-        "count": best_count,
+        "card": card,
+        "count": count,
         "total": total,
-        "rate": round(best_count / total * 100, 2)
+        "rate": round(count / total * 100, 2)
     }
 
-def compute_topN_for_box(hour_data: dict, box_key: str, limit: int = 5) -> List[dict]:
+def best_card_for_slot(box_key: str, slot: str, min_samples: int = 1) -> Optional[dict]:
+    """
+    Lá nổ nhiều nhất ở slot, đọc thẳng bộ đếm theo slot của storage (không dựng Counter).
+    """
+    best = get_storage().slot_best_card(box_key, slot)
+    return best_card_entry(*best, min_samples) if best else None
+
+def top_cards_for_box(box_key: str, limit: int = 5) -> List[dict]:
     """
-    Tính top N lá bài cho một box (ví dụ 'aa' hoặc 'four_kind').
+    Top N lá nổ nhiều nhất của box (vd. 'aa'), đọc top-k đã duy trì sẵn của storage.
     Trả về list các dict: {card, count, total, rate}
     """
-    counts = Counter()
-    total = 0
-    box_dict = hour_data.get(box_key, {})
-    if not isinstance(box_dict, dict):
-        return []
-    for slot, cards in box_dict.items():
-        if isinstance(cards, list):
-            for c in cards:
-                counts[c] += 1
-                total += 1
+    top, total = get_storage().box_top_cards(box_key, limit)
+    return [{"card": card, "count": cnt, "total": total,
+             "rate": round((cnt / total * 100) if total > 0 else 0.0, 2)} for card, cnt in top]
+
+def topN_from_counts(counts: Counter, limit: int = 5) -> List[dict]:
+    """
+    Top N từ Counter lá -> số lần nổ (vd. get_storage().box_card_counts('aa')).
+    """
+    total = sum(counts.values())
     top = counts.most_common(limit)
     result = []
     for card, cnt in top:
@@ -314,94 +371,241 @@ def compute_topN_for_box(hour_data: dict, box_key: str, limit: int = 5) -> List[
     return result
 
 # -----------------------
-# Minute stats helper + API
+# Slot prediction (cache theo phiên bản dữ liệu)
 # -----------------------
+GAP_BUCKETS = (5, 15, 30, 60, 120, 240, 480, 1440)  # phút
+_prediction_cache: Dict[str, Tuple[str, dict]] = {}
+_prediction_lock = threading.Lock()
 
-def minute_counts_for_box(hour_data: dict, box_key: str) -> list:
+def gap_distribution(times: List[int]) -> dict:
     """
-    Trả về list 1440 số nguyên: counts[0] = số lần nổ phút 00:00,
-    counts[1] = phút 00:01, ..., counts[1439] = phút 23:59.
+    Phân phối khoảng cách (phút) giữa 2 lần nổ liên tiếp từ ts các round đã nổ.
+    cdf[i] = % khoảng cách <= GAP_BUCKETS[i].
     """
-    counts = [0] * (24 * 60)
-    box = hour_data.get(box_key, {}) if isinstance(hour_data, dict) else {}
-    for slot, cards in box.items():
-        parsed = parse_hhmm(slot)
-        if parsed is None:
-            continue
-        h, m = parsed
-        idx = h * 60 + m
-        if isinstance(cards, list):
-            counts[idx] += len(cards)
-        elif isinstance(cards, int):
-            counts[idx] += cards
-    return counts
+    gaps = sorted((b - a) / 60 for a, b in zip(times, times[1:]))
+    if not gaps:
+        return {"count": 0, "buckets": list(GAP_BUCKETS), "histogram": [0] * (len(GAP_BUCKETS) + 1),
+                "cdf": [0.0] * len(GAP_BUCKETS)}
+    edges = [bisect_right(gaps, le) for le in GAP_BUCKETS]
+    return {
+        "count": len(gaps),
+        "min": round(gaps[0], 1),
+        "median": round(statistics.median(gaps), 1),
+        "mean": round(statistics.fmean(gaps), 1),
+        "p90": round(gaps[min(len(gaps) - 1, int(len(gaps) * 0.9))], 1),
+        "max": round(gaps[-1], 1),
+        "buckets": list(GAP_BUCKETS),
+        # bucket cuối: > GAP_BUCKETS[-1]
+        "histogram": [hi - lo for lo, hi in zip([0] + edges, edges + [len(gaps)])],
+        "cdf": [round(e / len(gaps) * 100, 2) for e in edges],
+    }
+
+def prediction_model(box: str) -> dict:
+    """
+    Phần không phụ thuộc giờ hiện tại của dự đoán cho box: slot index, histogram theo
+    phút, phân phối gap. Chỉ tính lại khi dữ liệu đổi (ETag của storage).
+    """
+    storage = get_storage()
+    etag = storage.data_version().etag
+    with _prediction_lock:
+        cached = _prediction_cache.get(box)
+        if cached is not None and cached[0] == etag:
+            return cached[1]
+    times = storage.hit_times(box)
+    model = {
+        "slots": storage.slot_index(box),
+        "hist": storage.minute_histogram(box),
+        "gaps": gap_distribution(times),
+        "last_hit": times[-1] if times else None,
+    }
+    with _prediction_lock:
+        _prediction_cache[box] = (etag, model)
+    return model
+
+def predict_slots(box: str, n: int, now: datetime.datetime) -> dict:
+    model = prediction_model(box)
+    now_minute = now_minute_vn(now)
+    hist = model["hist"]
+    total = hist.total()
+    upcoming = []
+    for m in model["slots"].next_minutes(now_minute, n):
+        slot = minutes_to_hhmm(m)
+        upcoming.append({
+            "slot": slot,
+            "in_minutes": (m - now_minute) % (24 * 60) or 24 * 60,
+            "hits": hist.counts[m],
+            # mật độ: % số lần nổ của box rơi vào slot này
+            "density": round(hist.counts[m] / total * 100, 2) if total > 0 else 0.0,
+            "best": best_card_for_slot(box, slot),
+        })
+    last = model["last_hit"]
+    return {
+        "box": box,
+        "now": format_hhmm(now),
+        "slots": len(model["slots"]),
+        "hits": total,
+        "next": upcoming,
+        "gaps": model["gaps"],
+        "minutes_since_last": round((now.timestamp() - last) / 60, 1) if last is not None else None,
+    }
+
+# -----------------------
+# Request timing (/metrics)
+# -----------------------
+def _route_label() -> str:
+    # label theo rule ('/api/stats/<card>') thay vì path để số series không tăng theo lá/box
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+def _finish_request(status: int) -> None:
+    scope = metrics.end_request()
+    if scope is None:
+        return
+    elapsed = time.perf_counter() - scope.started
+    slow = SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS
+    metrics.observe_request(request.method, _route_label(), status, elapsed, scope.parses, slow)
+    if slow:
+        app.logger.warning(
+            "Slow request %s %s -> %d took %.1f ms (parses=%d, read=%d B, written=%d B)",
+            request.method, request.full_path.rstrip("?"), status, elapsed * 1000,
+            scope.parses, scope.bytes_read, scope.bytes_written)
+
+@app.before_request
+def start_request_timer():
+    metrics.begin_request()
+
+@app.after_request
+def record_request_timer(resp):
+    _finish_request(resp.status_code)
+    return resp
+
+@app.teardown_request
+def record_failed_request(exc):
+    # after_request không chạy khi view raise -> vẫn ghi nhận như 500
+    if exc is not None:
+        _finish_request(500)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# -----------------------
+# HTTP caching: ETag / Last-Modified theo phiên bản dữ liệu
+# -----------------------
+def versioned(vary: Optional[Callable[[], str]] = None):
+    """
+    Decorator cho các route chỉ đọc: gắn ETag/Last-Modified theo data_version của storage
+    và trả 304 ngay (không tính toán gì) nếu client đã có bản hiện tại.
+    vary: phần thêm vào ETag cho nội dung phụ thuộc thứ khác ngoài dữ liệu (vd. giờ hiện tại).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # flash message chỉ hiện 1 lần -> không được trả 304
+            if "_flashes" in session:
+                return view(*args, **kwargs)
+            dv = get_storage().data_version()
+            etag = dv.etag + (f"-{vary()}" if vary else "")
+            modified = datetime.datetime.fromtimestamp(int(dv.modified), datetime.timezone.utc)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+                resp = app.response_class(status=304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+            resp.set_etag(etag)
+            resp.last_modified = modified
+            resp.cache_control.no_cache = True
+            return resp
+        return wrapper
+    return decorator
 
 # -----------------------
 # Routes
 # -----------------------
-@app.route("/api/four_kind_minutes")
-def api_four_kind_minutes():
+def parse_minute_param(value: Optional[str], default: int) -> int:
+    """
+    Tham số phút cho /api/minutes: 'HH:MM' hoặc số phút (0..1440). Sai định dạng -> default.
+    """
+    if value is None or value == "":
+        return default
+    m = hhmm_to_minutes(value)
+    if m is not None:
+        return m
+    try:
+        m = int(value)
+    except ValueError:
+        return default
+    return m if 0 <= m <= 24 * 60 else default
+
+@app.route("/api/minutes/<box>")
+@versioned(vary=window_vary)
+def api_minutes(box: str):
+    """
+    Histogram số lần nổ theo phút của box (aa, four_kind).
+    Query: agg (phút mỗi bucket), from/to (cửa sổ [from, to), 'HH:MM' hoặc phút;
+    to <= from nghĩa là vắt qua nửa đêm), since/until (chỉ tính round trong khoảng thời gian).
+    """
+    if box not in HOUR_BOXES:
+        abort(404)
+    try:
+        since, until = request_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
         agg = int(request.args.get('agg', '1'))
         if agg <= 0:
             agg = 1
     except Exception:
         agg = 1
+    start = parse_minute_param(request.args.get("from"), 0) % (24 * 60)
+    end = parse_minute_param(request.args.get("to"), 24 * 60)
+
+    # prefix sum được cache trong storage, chỉ build lại khi có lần nổ mới
+    hist = get_storage().minute_histogram(box, since, until)
+    labels, counts = hist.buckets(agg, start, end)
+    payload = {"labels": labels, "counts": counts, "agg": agg}
+    if "from" in request.args or "to" in request.args:
+        payload["from"] = minutes_to_hhmm(start)
+        payload["to"] = minutes_to_hhmm(end)
+    if since is not None or until is not None:
+        payload["since"] = since
+        payload["until"] = until
+    return jsonify(payload)
+
+@app.route("/api/predict/<box>")
+@versioned(vary=lambda: format_hhmm(request_now_vn()))
+def api_predict(box: str):
+    """
+    n slot kế tiếp của box (aa, four_kind) kèm mật độ nổ từng slot và phân phối
+    khoảng cách giữa các lần nổ. Query: n (1..50, mặc định 3).
+    """
+    if box not in HOUR_BOXES:
+        abort(404)
+    try:
+        n = min(50, max(1, int(request.args.get("n", "3"))))
+    except ValueError:
+        n = 3
+    return jsonify(predict_slots(box, n, request_now_vn()))
 
-    hour_data = load_hour_data()
-    counts = minute_counts_for_box(hour_data, "four_kind")
+@app.route("/api/four_kind_minutes")
+def api_four_kind_minutes():
+    return api_minutes("four_kind")
 
-    if agg == 1:
-        labels = [f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)]
-        return jsonify({"labels": labels, "counts": counts})
-    else:
-        buckets = []
-        labels = []
-        for start in range(0, 24*60, agg):
-            s = sum(counts[start:start+agg])
-            buckets.append(s)
-            h = start // 60
-            m = start % 60
-            labels.append(f"{h:02d}:{m:02d}")
-        return jsonify({"labels": labels, "counts": buckets, "agg": agg})
 @app.route("/api/aa_minutes")
 def api_aa_minutes():
-    try:
-        agg = int(request.args.get('agg', '1'))
-        if agg <= 0: agg = 1
-    except:
-        agg = 1
-    hour_data = load_hour_data()
-    counts = minute_counts_for_box(hour_data, "aa")
-    if agg == 1:
-        labels = [f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)]
-        return jsonify({"labels": labels, "counts": counts})
-    else:
-        buckets = []
-        labels = []
-        for start in range(0, 24*60, agg):
-            s = sum(counts[start:start+agg])
-            buckets.append(s)
-            h = start // 60
-            m = start % 60
-            labels.append(f"{h:02d}:{m:02d}")
-        return jsonify({"labels": labels, "counts": buckets, "agg": agg})
+    return api_minutes("aa")
+
 @app.route("/", methods=["GET"])
+@versioned(vary=lambda: format_hhmm(request_now_vn()))  # dự đoán slot đổi theo phút hiện tại
 def index():
     sel = request.args.get("card", "")
     cards = all_cards()
     top_cards = compute_global_top_cards()
     details = compute_stats_for_card(sel) if sel else None
 
-    # aggregate across rounds (schema mới)
-    data = load_data()
-    agg_counts = Counter()
-    total_all = len(data)  # mỗi phần tử là 1 round
-    for r in data:
-        sbs = r.get("selected_boxes", []) or []
-        for sb in sbs:
-            agg_counts[sb] += 1
+    # aggregate across rounds (schema mới), duy trì sẵn trong RoundStore
+    total_all, agg_counts = get_storage().totals()
     agg_percent = {k: round((agg_counts.get(k, 0) / total_all * 100) if total_all > 0 else 0.0, 2) for k in BOXES.keys()}
+    # N round gần nhất (của lá đang chọn nếu có)
+    recent = [compute_recent_stats(w, sel or None) for w in RECENT_WINDOWS]
 
     # load hour data early
     hour_data = load_hour_data()
@@ -416,12 +620,10 @@ def index():
     aa_recent = aa_slots[-3:][::-1] if aa_slots else []
     fk_recent = fk_slots[-3:][::-1] if fk_slots else []
 
-    # predictions (theo vòng lặp trong ngày) dựa trên slot list
-    aa_pred = next_cycle_slots(aa_slots, 3)
-    fk_pred = next_cycle_slots(fk_slots, 3)
-
-    # tổng số bản ghi trong data (dùng khi chưa chọn lá)
-    total_all = len(data)
+    # predictions (theo vòng lặp trong ngày): bisect trên SlotIndex đã cache của storage
+    now_minute = now_minute_vn(request_now_vn())
+    aa_pred = slots_after(get_storage().slot_index("aa"), 3, now_minute)
+    fk_pred = slots_after(get_storage().slot_index("four_kind"), 3, now_minute)
 
     # nếu có lá được chọn, details đã chứa "total"
     if sel and details:
@@ -433,19 +635,19 @@ def index():
     aa_best: dict = {}
     fk_best: dict = {}
     for t in aa_recent:
-        aa_best[t] = best_card_for_slot_from_hour(hour_data.get("aa", {}), t)
+        aa_best[t] = best_card_for_slot("aa", t)
     for t in fk_recent:
-        fk_best[t] = best_card_for_slot_from_hour(hour_data.get("four_kind", {}), t)
+        fk_best[t] = best_card_for_slot("four_kind", t)
     if aa_pred:
         for t in aa_pred:
-            aa_best.setdefault(t, best_card_for_slot_from_hour(hour_data.get("aa", {}), t))
+            aa_best.setdefault(t, best_card_for_slot("aa", t))
     if fk_pred:
         for t in fk_pred:
-            fk_best.setdefault(t, best_card_for_slot_from_hour(hour_data.get("four_kind", {}), t))
+            fk_best.setdefault(t, best_card_for_slot("four_kind", t))
 
-    # Tính Top 5 riêng cho AA và Tứ quý
-    top5_aa = compute_topN_for_box(hour_data, "aa", limit=5)
-    top5_fk = compute_topN_for_box(hour_data, "four_kind", limit=5)
+    # Top 5 riêng cho AA và Tứ quý (top-k duy trì sẵn theo từng lần nổ)
+    top5_aa = top_cards_for_box("aa", limit=5)
+    top5_fk = top_cards_for_box("four_kind", limit=5)
 
     return render_template("index.html",
         cards=cards, RANKS=RANKS, SUITS=SUITS,
@@ -456,28 +658,26 @@ def index():
         aa_pred=aa_pred, fk_pred=fk_pred,
         aa_best=aa_best, fk_best=fk_best,
         top5_aa=top5_aa, top5_fk=top5_fk,
-        count_for_display=count_for_display
+        count_for_display=count_for_display,
+        recent=recent
     )
 
-@app.route("/save", methods=["POST"])
-def save_round():
-    first_card = request.form.get("first_card", "").strip()
-    selected_boxes = request.form.getlist("selected_box")
-
-    # Basic check: must have a card
-    if not first_card:
-        flash("Vui lòng chọn lá bài đầu tiên.", "error")
-        return redirect(url_for("index"))
+# -----------------------
+# Round validation (dùng chung cho /save và /api/rounds/bulk)
+# -----------------------
+TOP_KEYS = {"cowboy_win", "draw", "bull_win"}
+RIGHT_KEYS = {"high_onepair", "two_pair", "trips", "full_house", "four_kind"}
 
+def validate_boxes(selected_boxes: Iterable[str]) -> Tuple[List[str], Optional[str]]:
+    """
+    Chuẩn hoá danh sách box và kiểm tra luật TOP/RIGHT.
+    Trả về (boxes đã chuẩn hoá, None) hoặc (boxes, thông báo lỗi).
+    """
     # Normalize: remove duplicates and keep only known keys
     valid_keys = set(BOXES.keys())
     # preserve order, remove duplicates
     selected_boxes = [k for k in dict.fromkeys(selected_boxes) if k in valid_keys]
 
-    # Define groups
-    TOP_KEYS = {"cowboy_win", "draw", "bull_win"}
-    RIGHT_KEYS = {"high_onepair", "two_pair", "trips", "full_house", "four_kind"}
-
     # Compute selections
     top_selected = [b for b in selected_boxes if b in TOP_KEYS]
     right_selected = [b for b in selected_boxes if b in RIGHT_KEYS]
@@ -486,76 +686,467 @@ def save_round():
     # Validation rules
     # 1) Top must be exactly 1
     if len(top_selected) == 0:
-        flash("Lỗi: phải chọn 1 ô trong TOP (cowboy_win, draw, bull_win).", "error")
-        return redirect(url_for("index", card=first_card))
+        return selected_boxes, "Lỗi: phải chọn 1 ô trong TOP (cowboy_win, draw, bull_win)."
     if len(top_selected) > 1:
-        flash("Lỗi: chỉ được chọn đúng 1 ô trong TOP.", "error")
-        return redirect(url_for("index", card=first_card))
+        return selected_boxes, "Lỗi: chỉ được chọn đúng 1 ô trong TOP."
 
     # 2) Right must have at least 1
     if len(right_selected) == 0:
-        flash("Lỗi: phải chọn ít nhất 1 ô trong RIGHT (high_onepair, two_pair, trips, full_house, four_kind).", "error")
-        return redirect(url_for("index", card=first_card))
+        return selected_boxes, "Lỗi: phải chọn ít nhất 1 ô trong RIGHT (high_onepair, two_pair, trips, full_house, four_kind)."
 
     # 3) Rights excluding four_kind must be at most 1
     if len(rights_excl_fk) > 1:
-        flash("Lỗi: chỉ được chọn tối đa 1 ô trong RIGHT (không tính tứ quý).", "error")
+        return selected_boxes, "Lỗi: chỉ được chọn tối đa 1 ô trong RIGHT (không tính tứ quý)."
+
+    return selected_boxes, None
+
+DEAL_FIELDS = ("cowboy", "bull", "board")
+
+def settle_first_card(first_card: str, deal: List[int]) -> Tuple[str, Optional[str]]:
+    """
+    first_card = lá chung đầu tiên của deal; nếu đã chọn lá khác thì báo lỗi.
+    """
+    dealt = card_name(deal[4])
+    if first_card and first_card != dealt:
+        return first_card, f"Lỗi: first_card {first_card} khác lá chung đầu tiên {dealt}."
+    return dealt, None
+
+def settle_boxes(selected_boxes: Iterable[str], settled: List[str]) -> Tuple[List[str], Optional[str]]:
+    """
+    Dùng box chốt từ bài; nếu người chia cũng đã tick box mà khác kết quả thì báo lỗi.
+    """
+    ticked = [b for b in selected_boxes if b]
+    if ticked and set(ticked) != set(settled):
+        return ticked, f"Lỗi: box đã chọn {sorted(ticked)} khác kết quả từ bài {sorted(settled)}."
+    return settled, None
+
+@app.route("/save", methods=["POST"])
+def save_round():
+    first_card = request.form.get("first_card", "").strip()
+    selected_boxes = request.form.getlist("selected_box")
+
+    # có nhập lá đã chia (Cowboy/Bull/board) -> tự chốt selected_boxes từ bài
+    cards = [request.form.get(k, "").strip() for k in DEAL_FIELDS]
+    if any(cards):
+        try:
+            deal = parse_deal(*cards)
+        except ValueError as e:
+            flash(f"Lỗi: bài không hợp lệ ({e}).", "error")
+            return redirect(url_for("index", card=first_card or None))
+        first_card, error = settle_first_card(first_card, deal)
+        if error is None:
+            selected_boxes, error = settle_boxes(selected_boxes, settle(deal))
+        if error:
+            flash(error, "error")
+            return redirect(url_for("index", card=first_card))
+
+    # Basic check: must have a card
+    if not first_card:
+        flash("Vui lòng chọn lá bài đầu tiên.", "error")
+        return redirect(url_for("index"))
+
+    selected_boxes, error = validate_boxes(selected_boxes)
+    if error:
+        flash(error, "error")
         return redirect(url_for("index", card=first_card))
 
     # Passed validation -> save
-    data = load_data()
-    hour_data = load_hour_data()
-    now_str = format_hhmm(now_vn())
+    now = now_vn()
+    now_str = format_hhmm(now)
 
     rec = {
         "round_id": str(uuid.uuid4()),
         "first_card": first_card,
-        "selected_boxes": selected_boxes
+        "selected_boxes": selected_boxes,
+        "ts": int(now.timestamp())
     }
-    data.append(rec)
 
     # update hour.json
     slot = now_str
-    if "aa" in selected_boxes:
-        hour_data.setdefault("aa", {})
-        hour_data["aa"].setdefault(slot, [])
-        hour_data["aa"][slot].append(first_card)
-    if "four_kind" in selected_boxes:
-        hour_data.setdefault("four_kind", {})
-        hour_data["four_kind"].setdefault(slot, [])
-        hour_data["four_kind"][slot].append(first_card)
-
-    save_data(data)
-    save_hour_data(hour_data)
+    hits = [(box, slot, first_card) for box in HOUR_BOXES if box in selected_boxes]
+
+    # ghi qua write-behind queue (gom chung 1 lần ghi với các request đồng thời);
+    # queue tự đẩy delta cho các dashboard đang mở /api/stream
+    try:
+        writer.submit([rec], hits)
+    except PartialCommitError:
+        app.logger.exception("Round %s saved without its hour hits", rec["round_id"])
+        flash("Round đã được lưu nhưng chưa cập nhật được dữ liệu giờ; không cần lưu lại.", "error")
+        return redirect(url_for("index"))
+    except Exception:
+        app.logger.exception("Failed to save round %s", rec["round_id"])
+        flash("Lỗi: không lưu được round, vui lòng thử lại.", "error")
+        return redirect(url_for("index", card=first_card))
     return redirect(url_for("index"))
 
+def parse_bulk_body() -> Optional[list]:
+    """
+    Body của /api/rounds/bulk: JSON array, hoặc NDJSON (mỗi dòng 1 round). None nếu không đọc được.
+    """
+    raw = request.get_data(as_text=True)
+    stripped = raw.lstrip()
+    if stripped.startswith("["):
+        try:
+            items = jsoncodec.loads(raw)
+        except ValueError:
+            return None
+        return items if isinstance(items, list) else None
+    items = []
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(jsoncodec.loads(line))
+        except ValueError:
+            # giữ chỗ để báo lỗi đúng index
+            items.append(None)
+    return items
+
+@app.route("/api/rounds/bulk", methods=["POST"])
+def api_rounds_bulk():
+    """
+    Nhập nhiều round 1 lần: body là JSON array hoặc NDJSON các object
+    {"first_card", "selected_boxes", "round_id"? (không trùng trong batch / với round đã có),
+     "ts"? (epoch số nguyên hoặc ISO 8601, mặc định hiện tại), "slot"? ('HH:MM', phải khớp ts nếu gửi)}.
+    Thay cho selected_boxes có thể gửi "cowboy", "bull" (2 lá), "board" (5 lá): box được
+    chốt từ bài (cả batch xếp hạng 1 lần), first_card mặc định = lá chung đầu tiên.
+    Mọi round hợp lệ + cập nhật hour được ghi trong 1 lần; trả về lỗi theo từng item.
+    """
+    items = parse_bulk_body()
+    if items is None:
+        return jsonify({"error": "body phải là JSON array hoặc NDJSON"}), 400
+
+    # item có bài -> chốt box cho cả batch trước (1 lần xếp hạng vector hoá)
+    deals = {}
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and any(item.get(k) for k in DEAL_FIELDS):
+            try:
+                deals[i] = parse_deal(*(item.get(k) for k in DEAL_FIELDS))
+            except ValueError as e:
+                deals[i] = e
+    dealt = [i for i, d in deals.items() if not isinstance(d, ValueError)]
+    settled = dict(zip(dealt, settle_batch([deals[i] for i in dealt])))
+
+    # round_id do client gửi: trùng trong batch hoặc với round đã có -> từ chối
+    # (xóa theo round_id sẽ xóa luôn mọi round trùng id)
+    client_ids = Counter(str(item["round_id"]) for item in items
+                         if isinstance(item, dict) and item.get("round_id"))
+    taken = get_storage().existing_round_ids(client_ids)
+    taken.update(rid for rid, n in client_ids.items() if n > 1)
+
+    known_cards = set(all_cards())
+    now_ts = int(time.time())
+    recs: List[dict] = []
+    hits: List[Tuple[str, str, str]] = []
+    errors: List[dict] = []
+    accepted = set()
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": i, "error": "item không phải JSON object"})
+            continue
+        first_card = str(item.get("first_card") or "").strip()
+        boxes = item.get("selected_boxes")
+        if i in deals:
+            if isinstance(deals[i], ValueError):
+                errors.append({"index": i, "error": f"bài không hợp lệ: {deals[i]}"})
+                continue
+            first_card, error = settle_first_card(first_card, deals[i])
+            if error is None:
+                boxes, error = settle_boxes(boxes if isinstance(boxes, list) else [], settled[i])
+            if error:
+                errors.append({"index": i, "error": error})
+                continue
+        if first_card not in known_cards:
+            errors.append({"index": i, "error": f"first_card không hợp lệ: {first_card!r}"})
+            continue
+        if not isinstance(boxes, list):
+            errors.append({"index": i, "error": "selected_boxes phải là list"})
+            continue
+        boxes, error = validate_boxes(boxes)
+        if error:
+            errors.append({"index": i, "error": error})
+            continue
+        try:
+            ts = parse_round_ts(item["ts"]) if item.get("ts") is not None else now_ts
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+            continue
+        # slot luôn suy từ ts (xóa/compact cũng tính slot từ ts để gỡ hit khỏi hour data)
+        slot = format_hhmm(datetime.datetime.fromtimestamp(ts, VN_TZ))
+        if item.get("slot") and parse_hhmm(str(item["slot"])) != parse_hhmm(slot):
+            errors.append({"index": i, "error": f"slot {item['slot']!r} không khớp ts (giờ VN {slot})"})
+            continue
+        round_id = str(item.get("round_id") or uuid.uuid4())
+        if round_id in taken:
+            errors.append({"index": i, "error": f"round_id trùng: {round_id!r}"})
+            continue
+        rec = {
+            "round_id": round_id,
+            "first_card": first_card,
+            "selected_boxes": boxes,
+            "ts": ts
+        }
+        recs.append(rec)
+        accepted.add(i)
+        hits.extend((box, slot, first_card) for box in HOUR_BOXES if box in boxes)
+
+    if recs:
+        try:
+            writer.submit(recs, hits, notify="reset")
+        except PartialCommitError:
+            # rounds đã lưu: báo round_ids để client không gửi lại (sẽ bị trùng)
+            app.logger.exception("%d bulk rounds saved without their hour hits", len(recs))
+            return jsonify({
+                "error": "rounds đã lưu nhưng không cập nhật được hour data",
+                "accepted": len(recs),
+                "round_ids": [r["round_id"] for r in recs],
+                "hour_saved": False,
+            }), 500
+        except Exception:
+            app.logger.exception("Failed to save %d bulk rounds", len(recs))
+            return jsonify({"error": "không lưu được dữ liệu"}), 500
+
+    return jsonify({
+        "accepted": len(recs),
+        "rejected": len(errors),
+        "settled": sum(1 for i in settled if i in accepted),
+        "round_ids": [r["round_id"] for r in recs],
+        "errors": errors,
+    })
+
 @app.route("/api/stats/<card>")
+@versioned(vary=window_vary)
 def api_stats_card(card: str):
-    return jsonify(compute_stats_for_card(card))
+    try:
+        since, until = request_window()
+        window = request_recent_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if window is not None:
+        if since is not None or until is not None:
+            return jsonify({"error": "window không dùng chung với since/until"}), 400
+        return jsonify(compute_recent_stats(window, card))
+    stats = compute_stats_for_card(card, since, until)
+    if since is not None or until is not None:
+        stats["since"] = since
+        stats["until"] = until
+    return jsonify(stats)
+
+@app.route("/api/stats/all")
+@versioned(vary=window_vary)
+def api_stats_all():
+    """
+    Stats của mọi lá trong 1 request: {"cards": {card: <như /api/stats/card>}, "matrix": ...}.
+    """
+    try:
+        since, until = request_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    stats = compute_stats_for_all_cards(since, until)
+    payload = {
+        "total": sum(v["total"] for v in stats.values()),
+        "cards": stats,
+        "matrix": card_box_matrix(stats),
+    }
+    if since is not None or until is not None:
+        payload["since"] = since
+        payload["until"] = until
+    return jsonify(payload)
+
+def request_box_list(name: str) -> List[str]:
+    """
+    Danh sách box từ query (lặp lại tham số hoặc phân tách bằng dấu phẩy).
+    """
+    boxes = [b.strip() for v in request.args.getlist(name) for b in v.split(",") if b.strip()]
+    for b in boxes:
+        if b not in BOXES:
+            raise ValueError(f"{name}: box không hợp lệ: {b}")
+    return list(dict.fromkeys(boxes))
+
+def request_round_filter() -> RoundFilter:
+    rank = request.args.get("rank", "").strip().upper() or None
+    if rank == "10":
+        rank = "T"
+    if rank is not None and (len(rank) != 1 or rank not in RANKS):
+        raise ValueError(f"rank không hợp lệ: {rank}")
+    suit = request.args.get("suit", "").strip().lower() or None
+    if suit is not None and suit not in SUITS:
+        raise ValueError(f"suit không hợp lệ: {suit}")
+    return RoundFilter(rank, suit, tuple(request_box_list("with")), tuple(request_box_list("without")))
+
+@app.route("/api/query")
+@versioned(vary=window_vary)
+def api_query():
+    """
+    P(target | điều kiện): rank/suit của lá mở, with/without (box đã nổ / không nổ),
+    target (mặc định mọi box), since/until như /api/stats/<card>.
+    Vd. /api/query?rank=A&with=bull_win&target=four_kind
+    """
+    try:
+        since, until = request_window()
+        flt = request_round_filter()
+        targets = request_box_list("target") or list(BOXES.keys())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    total, counts = get_storage().query(flt, targets, since, until)
+    return jsonify({
+        "filters": {"rank": flt.rank, "suit": flt.suit,
+                    "with": list(flt.with_boxes), "without": list(flt.without_boxes)},
+        "since": since,
+        "until": until,
+        "total": total,
+        "counts": {t: counts.get(t, 0) for t in targets},
+        "percent": {t: round(counts.get(t, 0) / total * 100, 2) if total > 0 else 0.0 for t in targets},
+    })
+
+def transition_view(group: dict) -> dict:
+    """
+    Thêm xác suất chuyển (% theo từng hàng) và phân phối cho round kế tiếp (hàng của
+    kết quả cuối cùng) vào 1 nhóm của sequence_summary().
+    """
+    probs = []
+    for row in group["counts"]:
+        n = sum(row)
+        probs.append([round(c / n * 100, 2) if n > 0 else 0.0 for c in row])
+    group["probabilities"] = probs
+    last = group["last"]
+    group["next"] = (dict(zip(group["outcomes"], probs[group["outcomes"].index(last)]))
+                     if last is not None else None)
+    return group
+
+@app.route("/api/sequence")
+@versioned()
+def api_sequence():
+    """
+    Phân tích theo thứ tự round: ma trận chuyển top (cowboy/draw/bull) và loại bài
+    (high_onepair..four_kind) giữa 2 round liên tiếp, chuỗi nổ/trượt của từng box.
+    """
+    summary = get_storage().sequence_summary()
+    transition_view(summary["top"])
+    transition_view(summary["hand"])
+    return jsonify(summary)
+
+def theory_vary() -> str:
+    # 503 lúc bảng chưa có không được dùng chung ETag với kết quả thật
+    return "t1" if theory.ready() else "t0"
+
+@app.route("/api/theory/<card>")
+@versioned(vary=theory_vary)
+def api_theory_card(card: str):
+    """
+    Xác suất lý thuyết của từng box khi lá mở là `card`, kèm số liệu thực tế để so sánh.
+    503 + Retry-After trong lúc bảng đang được tính ở thread nền.
+    """
+    if card not in all_cards():
+        return jsonify({"error": f"invalid card: {card}"}), 404
+    try:
+        result = theory.for_card(card)
+    except TheoryNotReady as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "10"}
+    stats = compute_stats_for_card(card)
+    result["empirical"] = {
+        "total": stats["total"],
+        "percent": stats["percent"],
+        "percent_by_section": stats["percent_by_section"],
+    }
+    return jsonify(result)
+
+@app.route("/api/top_cards")
+@versioned(vary=window_vary)
+def api_top_cards():
+    """
+    Top lá ra nhiều nhất (toàn bộ rounds), hoặc top lá nổ box=aa|four_kind.
+    Query: limit, since/until như /api/stats/<card>.
+    """
+    try:
+        since, until = request_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        limit = max(1, int(request.args.get("limit", "12")))
+    except ValueError:
+        limit = 12
+    box = request.args.get("box")
+    if box:
+        if box not in HOUR_BOXES:
+            abort(404)
+        if since is None and until is None:
+            top = top_cards_for_box(box, limit)
+        else:
+            top = topN_from_counts(get_storage().box_card_counts(box, since, until), limit)
+    else:
+        top = [{"card": c, "count": n} for c, n in compute_global_top_cards(limit, since, until)]
+    return jsonify({"box": box, "since": since, "until": until, "top": top})
 
 @app.route("/api/boxes")
+@versioned()
 def api_boxes():
     return jsonify([
         {"key": k, "label": v[0], "payout": v[1], "color": v[2]}
         for k, v in BOXES.items()
     ])
 
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))
+
+@app.route("/api/stream")
+def api_stream():
+    """
+    Server-Sent Events: 'round' (round mới + các lần nổ aa/four_kind + version) sau mỗi /save,
+    'reset' khi dữ liệu bị xoá/ghi lại, 'version' khi phát hiện thay đổi từ worker khác.
+    Cần worker hỗ trợ kết nối dài (gunicorn -k gthread/gevent).
+    """
+    def gen():
+        q = bus.subscribe()
+        try:
+            last = get_storage().data_version().version
+            yield "retry: 3000\n\n"
+            yield format_sse("hello", {"version": last}, last)
+            while True:
+                try:
+                    event, data = q.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    # không có event trong process này -> kiểm tra thay đổi từ worker khác
+                    version = get_storage().data_version().version
+                    if version != last:
+                        last = version
+                        yield format_sse("version", {"version": last}, last)
+                    else:
+                        yield ": keepalive\n\n"
+                    continue
+                last = data.get("version", last) if isinstance(data, dict) else last
+                yield format_sse(event, data, last)
+        finally:
+            bus.unsubscribe(q)
+
+    return Response(stream_with_context(gen()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/admin/clear", methods=["POST"])
 def admin_clear():
     save_data([])
     save_hour_data({"aa": {}, "four_kind": {}})
+    bus.publish("reset", {"version": get_storage().data_version().version})
     return redirect(url_for("index"))
 
 
-ALLOWED_DOWNLOADS = {"data.json", "hour.json"}
+ALLOWED_DOWNLOADS = {"data.json": "data", "hour.json": "hour"}
 
 @app.route("/download/<filename>")
 def download_file(filename: str):
     # bảo vệ: chỉ cho phép tên file trong whitelist
     if filename not in ALLOWED_DOWNLOADS:
         abort(404)
+    src = get_storage().raw_json_path(ALLOWED_DOWNLOADS[filename])
+    # file tải về cho người đọc: mặc định indent 2; ?pretty=0 = file như trên đĩa
+    pretty = request.args.get("pretty", "1") != "0"
+    if src is None or (pretty and not jsoncodec.file_is_pretty()):
+        # journal / sqlite / file compact: dựng lại JSON dạng dễ đọc để tải về
+        obj = load_data() if filename == "data.json" else load_hour_data()
+        payload = jsoncodec.dumps(obj, pretty=pretty)
+        return send_file(io.BytesIO(payload), mimetype="application/json",
+                         as_attachment=True, download_name=filename)
     # đường dẫn tuyệt đối tới file trong repo
-    path = os.path.abspath(filename)
+    path = os.path.abspath(src)
     # kiểm tra file nằm trong repo hiện tại (tuỳ chọn)
     if not os.path.exists(path):
         abort(404)
@@ -563,6 +1154,56 @@ def download_file(filename: str):
         return send_file(path, as_attachment=True)
     except Exception:
         abort(500)
+
+@app.route("/api/export/<which>")
+def api_export(which: str):
+    """
+    Export dạng stream (bộ nhớ không phụ thuộc độ dài history).
+    which: rounds | hour. Query: format=ndjson|csv, cursor/limit (phân trang theo offset,
+    trang kế tiếp ở header X-Next-Cursor), since (chỉ rounds).
+    gzip=1 -> tải file .gz; nếu không thì nén khi client gửi Accept-Encoding: gzip.
+    """
+    if which not in ("rounds", "hour"):
+        abort(404)
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format phải là một trong {sorted(FORMATS)}"}), 400
+    storage = get_storage()
+    try:
+        since = parse_time_param(request.args.get("since"), int(time.time()))
+        if which == "rounds":
+            total = storage.count_rounds(since)
+            offset, limit = page_bounds(request.args.get("cursor"), request.args.get("limit"), total)
+            rows = storage.iter_rounds(since, offset, limit)
+            fields = ROUND_FIELDS
+        else:
+            if since is not None:
+                raise ValueError("since chỉ áp dụng cho rounds (hour data không lưu ngày)")
+            hour = storage.load_hour()
+            total = sum(max(1, len(cards or [])) for slots in hour.values()
+                        if isinstance(slots, dict) for cards in slots.values())
+            offset, limit = page_bounds(request.args.get("cursor"), request.args.get("limit"), total)
+            rows = islice(hour_rows(hour), offset, offset + limit)
+            fields = HOUR_FIELDS
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    body = stream_rows(rows, fmt, fields)
+    gz_file = request.args.get("gzip") == "1"
+    gz_transport = not gz_file and request.accept_encodings["gzip"] > 0
+    if gz_file or gz_transport:
+        body = gzip_stream(body)
+    resp = Response(stream_with_context(body),
+                    mimetype="application/gzip" if gz_file else content_type(fmt))
+    if gz_transport:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.vary.add("Accept-Encoding")
+    resp.headers["Content-Disposition"] = (
+        f"attachment; filename={export_filename(which, fmt, gz_file)}")
+    resp.headers["X-Total-Count"] = str(total)
+    if offset + limit < total:
+        resp.headers["X-Next-Cursor"] = str(offset + limit)
+    return resp
 if __name__ == "__main__":
     ensure_data_file()
     ensure_hour_file()
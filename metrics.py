@@ -0,0 +1,195 @@
+# metrics.py
+import bisect
+import contextlib
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Cấu hình (có thể override bằng env vars)
+# SLOW_REQUEST_MS: request chậm hơn ngưỡng này (ms) thì log warning; 0 = tắt
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+PREFIX = "texascowboy_"
+# bucket (giây) giống mặc định của client Prometheus
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PARSE_BUCKETS = (0, 1, 2, 5, 10)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List] = {}  # labels -> [counts theo bucket, sum, count]
+
+    def observe(self, value: float, labels: Labels) -> None:
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            s[0][i] += 1
+        s[1] += value
+        s[2] += 1
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, n) in sorted(self._series.items()):
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                yield f"{self.name}_bucket{_format_labels(labels, [('le', _format_value(le))])} {acc}"
+            yield f"{self.name}_bucket{_format_labels(labels, [('le', '+Inf')])} {n}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {n}"
+
+
+class CounterMetric:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._series: Dict[Labels, float] = {}
+
+    def inc(self, amount: float, labels: Labels) -> None:
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, v in sorted(self._series.items()):
+            yield f"{self.name}{_format_labels(labels)} {_format_value(v)}"
+
+
+class RequestScope:
+    """
+    Số liệu I/O của request đang chạy trên thread hiện tại (cho histogram/slow log).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.parses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+
+class Metrics:
+    """
+    Registry trong process: latency theo route, timer/counter quanh I/O của store.
+    Mỗi worker gunicorn có registry riêng (Prometheus scrape từng worker / cộng dồn).
+    Ghi từ thread write-behind không thuộc request nào nên chỉ vào counter tổng.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.request_seconds = Histogram(
+            PREFIX + "http_request_duration_seconds", "HTTP request latency by route.", LATENCY_BUCKETS)
+        self.request_parses = Histogram(
+            PREFIX + "http_request_file_parses", "Full-file parses done while serving a request.",
+            PARSE_BUCKETS)
+        self.slow_requests = CounterMetric(
+            PREFIX + "http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.")
+        self.op_seconds = Histogram(
+            PREFIX + "store_op_duration_seconds", "Duration of store operations.", LATENCY_BUCKETS)
+        self.bytes_read = CounterMetric(PREFIX + "store_bytes_read_total", "Bytes read from data files.")
+        self.bytes_written = CounterMetric(
+            PREFIX + "store_bytes_written_total", "Bytes written to data files.")
+        self.parses = CounterMetric(
+            PREFIX + "store_full_parses_total", "Full parses of a data file (cache miss).")
+        self._all = (self.request_seconds, self.request_parses, self.slow_requests,
+                     self.op_seconds, self.bytes_read, self.bytes_written, self.parses)
+
+    # -----------------------
+    # Request scope
+    # -----------------------
+    def begin_request(self) -> RequestScope:
+        scope = RequestScope()
+        self._local.scope = scope
+        return scope
+
+    def end_request(self) -> Optional[RequestScope]:
+        scope = getattr(self._local, "scope", None)
+        self._local.scope = None
+        return scope
+
+    def _scope(self) -> Optional[RequestScope]:
+        return getattr(self._local, "scope", None)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        parses: int, slow: bool) -> None:
+        labels = _labels({"method": method, "route": route, "status": status})
+        with self._lock:
+            self.request_seconds.observe(seconds, labels)
+            self.request_parses.observe(parses, _labels({"route": route}))
+            if slow:
+                self.slow_requests.inc(1, _labels({"route": route}))
+
+    # -----------------------
+    # Store I/O
+    # -----------------------
+    @contextlib.contextmanager
+    def timer(self, op: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.op_seconds.observe(elapsed, _labels({"op": op}))
+
+    def add_read(self, path: str, n: int) -> None:
+        scope = self._scope()
+        if scope is not None:
+            scope.bytes_read += n
+        with self._lock:
+            self.bytes_read.inc(n, _labels({"file": os.path.basename(path)}))
+
+    def add_written(self, path: str, n: int) -> None:
+        scope = self._scope()
+        if scope is not None:
+            scope.bytes_written += n
+        with self._lock:
+            self.bytes_written.inc(n, _labels({"file": os.path.basename(path)}))
+
+    def count_parse(self, path: str) -> None:
+        scope = self._scope()
+        if scope is not None:
+            scope.parses += 1
+        with self._lock:
+            self.parses.inc(1, _labels({"file": os.path.basename(path)}))
+
+    def render(self) -> str:
+        """
+        Toàn bộ metric theo Prometheus text exposition format 0.0.4.
+        """
+        with self._lock:
+            lines = [line for m in self._all for line in m.render()]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -1,9 +1,11 @@
 # migrate.py
-import json
 import os
+import sys
 import uuid
 from collections import defaultdict
 from datetime import datetime
+import jsoncodec
+from store import SQLITE_FILE, VN_TZ, get_storage, read_hour_file, round_ts, write_hour_file, write_journal
 
 DATA_FILE = "data.json"
 HOUR_FILE = "hour.json"
@@ -11,15 +13,15 @@ HOUR_FILE = "hour.json"
 def load_json(path):
     if not os.path.exists(path):
         return []
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         try:
-            return json.load(f)
+            return jsoncodec.loads(f.read())
         except Exception:
             return []
 
 def save_json(path, obj):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    with open(path, "wb") as f:
+        f.write(jsoncodec.dump_file(obj))
 
 def migrate_group_contiguous_by_first_card():
     raw = load_json(DATA_FILE)
@@ -114,6 +116,98 @@ def rebuild_hour_from_rounds(rounds):
     save_json(HOUR_FILE, hour)
     print(f"Rebuilt {HOUR_FILE} from rounds. Backup saved to {HOUR_FILE + '.bak'}")
 
+def convert_to_journal(data_src=DATA_FILE, hour_src=HOUR_FILE):
+    """
+    Chuyển data.json / hour.json (JSON array/dict) sang journal data.jsonl / hour.jsonl.
+    File gốc được giữ nguyên; chạy app với DATA_FILE=data.jsonl HOUR_FILE=hour.jsonl.
+    """
+    rounds = load_json(data_src)
+    if not isinstance(rounds, list):
+        rounds = []
+    data_dst = os.path.splitext(data_src)[0] + ".jsonl"
+    write_journal(data_dst, rounds)
+    print(f"Converted {len(rounds)} rounds: {data_src} -> {data_dst}")
+
+    hour_dst = os.path.splitext(hour_src)[0] + ".jsonl"
+    write_hour_file(read_hour_file(hour_src), hour_dst)
+    print(f"Converted {hour_src} -> {hour_dst}")
+
+def convert_to_sqlite(db_path=SQLITE_FILE, data_src=DATA_FILE, hour_src=HOUR_FILE):
+    """
+    Nạp data.json / hour.json vào SQLite (ghi đè nội dung DB hiện có).
+    Chạy app với STORAGE_BACKEND=sqlite SQLITE_FILE=<db_path>.
+    """
+    from sqlite_store import SqliteStorage
+    rounds = load_json(data_src)
+    if not isinstance(rounds, list):
+        rounds = []
+    db = SqliteStorage(db_path)
+    db.save_rounds(rounds)
+    db.save_hour(read_hour_file(hour_src))
+    print(f"Imported {len(rounds)} rounds and {hour_src} into {db_path}")
+
+def legacy_timestamp_to_epoch(value):
+    """
+    Field 'timestamp' của schema cũ -> UTC epoch (giây), None nếu không suy ra được ngày
+    (vd. chỉ có 'HH:MM'). Chuỗi không có múi giờ được hiểu là giờ VN.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value / 1000 if value > 1e12 else value)
+    if not isinstance(value, str) or len(value.strip()) <= 5:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=VN_TZ)
+    return int(dt.timestamp())
+
+def backfill_timestamps():
+    """
+    Thêm 'ts' (UTC epoch) cho các round chưa có, suy từ field 'timestamp' cũ nếu được.
+    Chạy trên backend đang cấu hình (STORAGE_BACKEND / DATA_FILE / SQLITE_FILE).
+    """
+    storage = get_storage()
+    rounds = [dict(r) for r in storage.load_rounds()]
+    filled = missing = 0
+    for r in rounds:
+        if round_ts(r) is not None:
+            continue
+        ts = legacy_timestamp_to_epoch(r.get("timestamp"))
+        if ts is None:
+            missing += 1
+            continue
+        r["ts"] = ts
+        filled += 1
+    if filled:
+        storage.save_rounds(rounds)
+    print(f"Backfilled ts on {filled} rounds; {missing} rounds have no usable timestamp "
+          f"(excluded from since/until queries).")
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "snapshot":
+        paths = get_storage().write_snapshots()
+        print(f"Wrote snapshots: {paths}" if paths else "Backend has no snapshots.")
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        print(f"Compacted: {get_storage().compact()}")
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "theory":
+        from theory import theory
+        table = theory.load(rebuild=True)
+        print(f"Wrote {theory.path}: {len(table['cards'])} cards, {table['samples']} samples per rank ({table['engine']}).")
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill-ts":
+        backfill_timestamps()
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "to-jsonl":
+        convert_to_journal()
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "to-sqlite":
+        convert_to_sqlite()
+        sys.exit(0)
     print("** RUNNING MIGRATION ** — make sure you backed up files before proceeding.")
     migrate_group_contiguous_by_first_card()
\ No newline at end of file
@@ -0,0 +1,519 @@
+# sqlite_store.py
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import jsoncodec
+from columns import RoundFilter, SequenceStats, box_mask
+from store import (
+    MINUTES_PER_DAY, VN_TZ, DataVersion, HourIndex, MinuteHistogram, SlotIndex, Storage,
+    empty_hour, parse_hhmm, round_hits, round_ts,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rounds (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    round_id   TEXT NOT NULL,
+    first_card TEXT,
+    extra      TEXT,                -- JSON các field khác của round (nếu có)
+    ts         INTEGER              -- UTC epoch (giây), NULL với round cũ
+);
+CREATE INDEX IF NOT EXISTS idx_rounds_first_card ON rounds(first_card);
+CREATE INDEX IF NOT EXISTS idx_rounds_round_id ON rounds(round_id);
+
+-- mỗi box được chọn trong round là 1 dòng; first_card lặp lại để đếm theo lá bằng index
+CREATE TABLE IF NOT EXISTS round_boxes (
+    seq        INTEGER NOT NULL REFERENCES rounds(seq) ON DELETE CASCADE,
+    pos        INTEGER NOT NULL,    -- thứ tự trong selected_boxes
+    box        TEXT NOT NULL,
+    first_card TEXT,
+    PRIMARY KEY (seq, pos)
+);
+CREATE INDEX IF NOT EXISTS idx_round_boxes_box ON round_boxes(box);
+CREATE INDEX IF NOT EXISTS idx_round_boxes_card_box ON round_boxes(first_card, box);
+
+-- mỗi lần nổ aa/four_kind là 1 dòng; card NULL = slot rỗng (dữ liệu cũ)
+CREATE TABLE IF NOT EXISTS slot_hits (
+    id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    box    TEXT NOT NULL,
+    slot   TEXT NOT NULL,
+    minute INTEGER,                 -- phút trong ngày (0..1439)
+    card   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_slot_hits_box_minute ON slot_hits(box, minute);
+CREATE INDEX IF NOT EXISTS idx_slot_hits_box_card ON slot_hits(box, card);
+
+-- bộ đếm phiên bản (round_version / hour_version tăng mỗi lần bảng tương ứng thay đổi,
+-- hour_rewrites tăng khi slot_hits có dòng bị xóa, modified_at = epoch lần đổi gần nhất)
+-- để cache và ETag nhất quán giữa các worker
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+BASE_FIELDS = ("round_id", "first_card", "selected_boxes", "ts")
+
+
+def window_sql(since: Optional[int], until: Optional[int], col: str = "ts") -> Tuple[str, list]:
+    """
+    Điều kiện ' AND ...' cho cửa sổ [since, until) trên cột ts (bỏ round chưa có ts).
+    """
+    sql, params = f" AND {col} IS NOT NULL", []
+    if since is not None:
+        sql += f" AND {col} >= ?"
+        params.append(since)
+    if until is not None:
+        sql += f" AND {col} < ?"
+        params.append(until)
+    return sql, params
+
+
+class SqliteStorage(Storage):
+    """
+    Backend SQLite: stats theo lá, top-N và histogram theo phút là các query có index
+    thay vì vòng lặp Python trên toàn bộ history.
+    Mỗi thread dùng một connection riêng (WAL cho phép nhiều worker đọc/ghi song song).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._hist_lock = threading.Lock()
+        self._hist: Dict[str, Tuple[int, MinuteHistogram]] = {}
+        self._slots: Dict[str, Tuple[int, SlotIndex]] = {}
+        # (hour_rewrites, id slot_hits cuối đã cộng, HourIndex) - chỉ đọc thêm các lần nổ mới
+        self._index_lock = threading.Lock()
+        self._hour_index: Tuple[int, int, Optional[HourIndex]] = (-1, 0, None)
+        # (seq cuối đã đọc, SequenceStats) - chỉ đọc thêm các round mới
+        self._seq_lock = threading.Lock()
+        self._sequence: Tuple[int, SequenceStats] = (0, SequenceStats())
+        self.ensure()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def ensure(self) -> None:
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        # DB tạo trước khi có cột ts
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(rounds)")}
+        if "ts" not in cols:
+            conn.execute("ALTER TABLE rounds ADD COLUMN ts INTEGER")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rounds_ts ON rounds(ts)")
+        conn.commit()
+
+    def _bump(self, conn: sqlite3.Connection, key: str) -> None:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('modified_at', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (int(time.time()),))
+
+    def _meta(self, key: str) -> int:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def data_version(self) -> DataVersion:
+        meta = dict(self._conn().execute(
+            "SELECT key, value FROM meta WHERE key IN ('round_version', 'hour_version', 'modified_at')"))
+        version = meta.get("round_version", 0) + meta.get("hour_version", 0)
+        return DataVersion(version, str(version), float(meta.get("modified_at", 0)))
+
+    # -----------------------
+    # rounds
+    # -----------------------
+    def _insert_rounds(self, conn: sqlite3.Connection, rounds: List[dict]) -> None:
+        for rec in rounds:
+            extra = {k: v for k, v in rec.items() if k not in BASE_FIELDS}
+            cur = conn.execute(
+                "INSERT INTO rounds (round_id, first_card, extra, ts) VALUES (?, ?, ?, ?)",
+                (rec.get("round_id") or "", rec.get("first_card"),
+                 jsoncodec.dumps_str(extra) if extra else None, round_ts(rec)),
+            )
+            conn.executemany(
+                "INSERT INTO round_boxes (seq, pos, box, first_card) VALUES (?, ?, ?, ?)",
+                [(cur.lastrowid, i, b, rec.get("first_card"))
+                 for i, b in enumerate(rec.get("selected_boxes") or [])],
+            )
+
+    def _select_rounds(self, where: str = "", params: Sequence = (), order: str = "seq") -> List[dict]:
+        conn = self._conn()
+        boxes: Dict[int, List[str]] = {}
+        for seq, box in conn.execute(
+                "SELECT rb.seq, rb.box FROM round_boxes rb JOIN rounds ON rounds.seq = rb.seq "
+                f"WHERE 1 = 1{where} ORDER BY rb.seq, rb.pos", params):
+            boxes.setdefault(seq, []).append(box)
+        out: List[dict] = []
+        for seq, rid, card, extra, ts in conn.execute(
+                "SELECT seq, round_id, first_card, extra, ts FROM rounds "
+                f"WHERE 1 = 1{where} ORDER BY {order}", params):
+            rec = {"round_id": rid, "first_card": card, "selected_boxes": boxes.get(seq, [])}
+            if ts is not None:
+                rec["ts"] = ts
+            if extra:
+                rec.update(jsoncodec.loads(extra))
+            out.append(rec)
+        return out
+
+    def load_rounds(self) -> List[dict]:
+        return self._select_rounds()
+
+    def rounds_between(self, since: Optional[int] = None, until: Optional[int] = None) -> List[dict]:
+        where, params = window_sql(since, until, "rounds.ts")
+        return self._select_rounds(where, params, order="ts, seq")
+
+    def count_rounds(self, since: Optional[int] = None) -> int:
+        where, params = window_sql(since, None) if since is not None else ("", [])
+        (n,) = self._conn().execute(f"SELECT COUNT(*) FROM rounds WHERE 1 = 1{where}", params).fetchone()
+        return n
+
+    def iter_rounds(self, since: Optional[int] = None, offset: int = 0,
+                    limit: Optional[int] = None, chunk: int = 1000) -> Iterator[dict]:
+        # đọc từng chunk bằng cursor, boxes gộp sẵn theo pos -> bộ nhớ không phụ thuộc số round
+        where, params = window_sql(since, None, "r.ts") if since is not None else ("", [])
+        order = "r.ts, r.seq" if since is not None else "r.seq"
+        cur = self._conn().execute(
+            "SELECT r.round_id, r.first_card, r.extra, r.ts, "
+            "(SELECT group_concat(box, char(31)) FROM "
+            " (SELECT box FROM round_boxes WHERE seq = r.seq ORDER BY pos)) "
+            f"FROM rounds r WHERE 1 = 1{where} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset])
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                return
+            for rid, card, extra, ts, boxes in rows:
+                rec = {"round_id": rid, "first_card": card,
+                       "selected_boxes": boxes.split("\x1f") if boxes else []}
+                if ts is not None:
+                    rec["ts"] = ts
+                if extra:
+                    rec.update(jsoncodec.loads(extra))
+                yield rec
+
+    def save_rounds(self, arr: List[dict]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM round_boxes")
+            conn.execute("DELETE FROM rounds")
+            self._insert_rounds(conn, list(arr))
+            self._bump(conn, "round_version")
+
+    def extend_rounds(self, recs: List[dict]) -> None:
+        if not recs:
+            return
+        conn = self._conn()
+        with conn:
+            self._insert_rounds(conn, list(recs))
+            self._bump(conn, "round_version")
+
+    def existing_round_ids(self, round_ids: Iterable[str]) -> set:
+        wanted = list(set(round_ids))
+        found = set()
+        conn = self._conn()
+        # chia nhỏ: SQLite giới hạn số tham số mỗi câu lệnh
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            rows = conn.execute(
+                f"SELECT DISTINCT round_id FROM rounds WHERE round_id IN ({','.join('?' * len(chunk))})",
+                chunk)
+            found.update(rid for (rid,) in rows)
+        return found
+
+    def commit_batch(self, recs: List[dict], hits: List[Tuple[str, str, str]]) -> None:
+        # 1 transaction cho cả rounds + slot_hits: lỗi thì không có gì được ghi
+        if not recs and not hits:
+            return
+        conn = self._conn()
+        with conn:
+            if recs:
+                self._insert_rounds(conn, list(recs))
+                self._bump(conn, "round_version")
+            if hits:
+                self._insert_hits(conn, hits)
+
+    def delete_round(self, round_id: str) -> int:
+        removed = self._select_rounds(" AND rounds.round_id = ?", [round_id])
+        if not removed:
+            return 0
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("DELETE FROM rounds WHERE round_id = ?", (round_id,))
+            self._bump(conn, "round_version")
+            # bỏ luôn lần nổ tương ứng trong slot_hits (mỗi hit 1 dòng, lấy dòng mới nhất)
+            hits_deleted = 0
+            for box, slot, card in round_hits(removed):
+                hits_deleted += conn.execute(
+                    "DELETE FROM slot_hits WHERE id = (SELECT id FROM slot_hits "
+                    "WHERE box = ? AND slot = ? AND card = ? ORDER BY id DESC LIMIT 1)",
+                    (box, slot, card)).rowcount
+            if hits_deleted:
+                self._bump(conn, "hour_version")
+                self._bump(conn, "hour_rewrites")
+        return cur.rowcount
+
+    def compact(self) -> Dict[str, int]:
+        # DELETE trong SQLite đã là O(log n); compaction chỉ trả lại dung lượng file
+        conn = self._conn()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        return {}
+
+    def totals(self) -> Tuple[int, Dict[str, int]]:
+        conn = self._conn()
+        (total,) = conn.execute("SELECT COUNT(*) FROM rounds").fetchone()
+        counts = dict(conn.execute("SELECT box, COUNT(*) FROM round_boxes GROUP BY box"))
+        return total, counts
+
+    def card_stats(self, card: str, since: Optional[int] = None,
+                   until: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
+        conn = self._conn()
+        if since is None and until is None:
+            (total,) = conn.execute(
+                "SELECT COUNT(*) FROM rounds WHERE first_card = ?", (card,)).fetchone()
+            counts = dict(conn.execute(
+                "SELECT box, COUNT(*) FROM round_boxes WHERE first_card = ? GROUP BY box", (card,)))
+            return total, counts
+        where, params = window_sql(since, until, "r.ts")
+        (total,) = conn.execute(
+            f"SELECT COUNT(*) FROM rounds r WHERE r.first_card = ?{where}", [card] + params).fetchone()
+        counts = dict(conn.execute(
+            "SELECT rb.box, COUNT(*) FROM round_boxes rb JOIN rounds r ON r.seq = rb.seq "
+            f"WHERE rb.first_card = ?{where} GROUP BY rb.box", [card] + params))
+        return total, counts
+
+    def all_card_stats(self, since: Optional[int] = None,
+                       until: Optional[int] = None) -> Dict[str, Tuple[int, Dict[str, int]]]:
+        conn = self._conn()
+        where, params = window_sql(since, until, "r.ts") if since is not None or until is not None else ("", [])
+        totals = conn.execute(
+            "SELECT r.first_card, COUNT(*) FROM rounds r WHERE r.first_card IS NOT NULL "
+            f"AND r.first_card != ''{where} GROUP BY r.first_card", params)
+        out = {card: (n, {}) for card, n in totals}
+        for card, box, n in conn.execute(
+                "SELECT r.first_card, rb.box, COUNT(*) FROM round_boxes rb JOIN rounds r ON r.seq = rb.seq "
+                f"WHERE r.first_card IS NOT NULL AND r.first_card != ''{where} "
+                "GROUP BY r.first_card, rb.box", params):
+            out[card][1][box] = n
+        return out
+
+    def top_cards(self, limit: int = 12, since: Optional[int] = None,
+                  until: Optional[int] = None) -> List[Tuple[str, int]]:
+        where, params = window_sql(since, until) if since is not None or until is not None else ("", [])
+        rows = self._conn().execute(
+            "SELECT first_card, COUNT(*) AS n FROM rounds WHERE first_card IS NOT NULL "
+            f"AND first_card != ''{where} GROUP BY first_card ORDER BY n DESC, MIN(seq) LIMIT ?",
+            params + [limit])
+        return [(card, n) for card, n in rows]
+
+    def recent_stats(self, window: int, card: Optional[str] = None) -> Tuple[int, Dict[str, int]]:
+        # N round mới nhất theo seq (khóa chính) -> chỉ đọc N dòng cuối của index
+        recent = "SELECT seq, first_card FROM rounds ORDER BY seq DESC LIMIT ?"
+        where, params = ("WHERE r.first_card = ?", [window, card]) if card is not None else ("", [window])
+        conn = self._conn()
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM ({recent}) r {where}", params).fetchone()
+        counts = dict(conn.execute(
+            f"SELECT rb.box, COUNT(*) FROM ({recent}) r JOIN round_boxes rb ON rb.seq = r.seq "
+            f"{where} GROUP BY rb.box", params))
+        return total, counts
+
+    def _extend_sequence(self, last_seq: int, seq: SequenceStats) -> int:
+        for row_seq, boxes in self._conn().execute(
+                "SELECT r.seq, group_concat(rb.box) FROM rounds r "
+                "LEFT JOIN round_boxes rb ON rb.seq = r.seq WHERE r.seq > ? "
+                "GROUP BY r.seq ORDER BY r.seq", (last_seq,)):
+            seq.push(box_mask(boxes.split(",") if boxes else ()))
+            last_seq = row_seq
+        return last_seq
+
+    def sequence_summary(self) -> Dict[str, Any]:
+        with self._seq_lock:
+            last_seq, seq = self._sequence
+            (count,) = self._conn().execute("SELECT COUNT(*) FROM rounds").fetchone()
+            last_seq = self._extend_sequence(last_seq, seq)
+            if seq.count != count:
+                # có round bị xóa / bảng bị ghi lại -> đọc lại từ đầu
+                seq = SequenceStats()
+                last_seq = self._extend_sequence(0, seq)
+            self._sequence = (last_seq, seq)
+            return seq.summary()
+
+    def query(self, flt: RoundFilter, targets: Sequence[str], since: Optional[int] = None,
+              until: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
+        where, params = window_sql(since, until, "r.ts") if since is not None or until is not None else ("", [])
+        if flt.rank is not None:
+            where += " AND substr(r.first_card, 1, 1) = ?"
+            params.append(flt.rank)
+        if flt.suit is not None:
+            where += " AND substr(r.first_card, 2, 1) = ?"
+            params.append(flt.suit)
+        for op, boxes in (("EXISTS", flt.with_boxes), ("NOT EXISTS", flt.without_boxes)):
+            for box in boxes:
+                where += f" AND {op} (SELECT 1 FROM round_boxes x WHERE x.seq = r.seq AND x.box = ?)"
+                params.append(box)
+        conn = self._conn()
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM rounds r WHERE 1{where}", params).fetchone()
+        counts = dict.fromkeys(targets, 0)
+        if targets:
+            marks = ",".join("?" * len(targets))
+            counts.update(conn.execute(
+                "SELECT rb.box, COUNT(DISTINCT rb.seq) FROM round_boxes rb JOIN rounds r ON r.seq = rb.seq "
+                f"WHERE rb.box IN ({marks}){where} GROUP BY rb.box", list(targets) + params))
+        return total, counts
+
+    # -----------------------
+    # hour slots
+    # -----------------------
+    def load_hour(self) -> dict:
+        data = empty_hour()
+        for box, slot, card in self._conn().execute(
+                "SELECT box, slot, card FROM slot_hits ORDER BY id"):
+            cards = data.setdefault(box, {}).setdefault(slot, [])
+            if card:
+                cards.append(card)
+        return data
+
+    def _insert_hits(self, conn: sqlite3.Connection, hits: List[Tuple[str, str, str]]) -> None:
+        rows = []
+        for box, slot, card in hits:
+            parsed = parse_hhmm(slot)
+            minute = parsed[0] * 60 + parsed[1] if parsed else None
+            rows.append((box, slot, minute, card))
+        conn.executemany(
+            "INSERT INTO slot_hits (box, slot, minute, card) VALUES (?, ?, ?, ?)", rows)
+        self._bump(conn, "hour_version")
+
+    def save_hour(self, data: dict) -> None:
+        hits: List[Tuple[str, str, str]] = []
+        for box, slots in data.items():
+            if not isinstance(slots, dict):
+                continue
+            for slot, cards in slots.items():
+                if not cards:
+                    hits.append((box, slot, None))
+                for card in cards or []:
+                    hits.append((box, slot, card))
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM slot_hits")
+            self._insert_hits(conn, hits)
+            self._bump(conn, "hour_rewrites")
+
+    def append_hits(self, hits: List[Tuple[str, str, str]]) -> None:
+        if not hits:
+            return
+        conn = self._conn()
+        with conn:
+            self._insert_hits(conn, hits)
+
+    def delete_slot(self, box: str, slot: str) -> bool:
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("DELETE FROM slot_hits WHERE box = ? AND slot = ?", (box, slot))
+            if cur.rowcount:
+                self._bump(conn, "hour_version")
+                self._bump(conn, "hour_rewrites")
+        return cur.rowcount > 0
+
+    def box_card_counts(self, box: str, since: Optional[int] = None,
+                        until: Optional[int] = None) -> Counter:
+        if since is not None or until is not None:
+            where, params = window_sql(since, until, "r.ts")
+            rows = self._conn().execute(
+                "SELECT r.first_card, COUNT(*) FROM round_boxes rb JOIN rounds r ON r.seq = rb.seq "
+                f"WHERE rb.box = ? AND r.first_card IS NOT NULL AND r.first_card != ''{where} "
+                "GROUP BY r.first_card ORDER BY MIN(r.seq)", [box] + params)
+            return Counter(dict(rows))
+        rows = self._conn().execute(
+            "SELECT card, COUNT(*) FROM slot_hits WHERE box = ? AND card IS NOT NULL "
+            "GROUP BY card ORDER BY MIN(id)", (box,))
+        return Counter(dict(rows))
+
+    def minute_histogram(self, box: str, since: Optional[int] = None,
+                         until: Optional[int] = None) -> MinuteHistogram:
+        if since is not None or until is not None:
+            return MinuteHistogram(self._window_minute_counts(box, since, until))
+        version = self._meta("hour_version")
+        with self._hist_lock:
+            cached = self._hist.get(box)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        counts = [0] * MINUTES_PER_DAY
+        for minute, n in self._conn().execute(
+                "SELECT minute, COUNT(card) FROM slot_hits WHERE box = ? AND minute IS NOT NULL "
+                "GROUP BY minute", (box,)):
+            counts[minute] = n
+        hist = MinuteHistogram(counts)
+        with self._hist_lock:
+            self._hist[box] = (version, hist)
+        return hist
+
+    def _index(self) -> HourIndex:
+        """
+        HourIndex cộng dần các dòng slot_hits có id mới (id tăng theo thứ tự commit);
+        chỉ build lại từ đầu khi có dòng bị xóa (hour_rewrites đổi). Gọi khi giữ _index_lock.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN")  # meta và slot_hits đọc trong cùng 1 snapshot
+        try:
+            rewrites = self._meta("hour_rewrites")
+            cached_rewrites, last_id, index = self._hour_index
+            if index is None or cached_rewrites != rewrites:
+                index, last_id = HourIndex(), 0
+            for hit_id, box, slot, card in conn.execute(
+                    "SELECT id, box, slot, card FROM slot_hits WHERE id > ? ORDER BY id", (last_id,)):
+                index.add_hit(box, slot, card)
+                last_id = hit_id
+        finally:
+            conn.commit()
+        self._hour_index = (rewrites, last_id, index)
+        return index
+
+    def slot_best_card(self, box: str, slot: str) -> Optional[Tuple[str, int, int]]:
+        with self._index_lock:
+            return self._index().best(box, slot)
+
+    def box_top_cards(self, box: str, limit: Optional[int] = None) -> Tuple[List[Tuple[str, int]], int]:
+        with self._index_lock:
+            return self._index().top(box, limit)
+
+    def slot_index(self, box: str) -> SlotIndex:
+        version = self._meta("hour_version")
+        with self._hist_lock:
+            cached = self._slots.get(box)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        idx = SlotIndex(m for (m,) in self._conn().execute(
+            "SELECT DISTINCT minute FROM slot_hits WHERE box = ? AND minute IS NOT NULL", (box,)))
+        with self._hist_lock:
+            self._slots[box] = (version, idx)
+        return idx
+
+    def hit_times(self, box: str) -> List[int]:
+        return [ts for (ts,) in self._conn().execute(
+            "SELECT r.ts FROM round_boxes rb JOIN rounds r ON r.seq = rb.seq "
+            "WHERE rb.box = ? AND r.ts IS NOT NULL AND r.first_card IS NOT NULL AND r.first_card != '' "
+            "ORDER BY r.ts", (box,))]
+
+    def _window_minute_counts(self, box: str, since: Optional[int], until: Optional[int]) -> List[int]:
+        # phút trong ngày theo giờ VN tính ngay trong SQL từ ts
+        offset = int(VN_TZ.utcoffset(None).total_seconds())
+        where, params = window_sql(since, until, "r.ts")
+        counts = [0] * MINUTES_PER_DAY
+        for minute, n in self._conn().execute(
+                f"SELECT ((r.ts + ?) / 60) % {MINUTES_PER_DAY} AS m, COUNT(*) "
+                "FROM round_boxes rb JOIN rounds r ON r.seq = rb.seq "
+                f"WHERE rb.box = ? AND r.first_card IS NOT NULL AND r.first_card != ''{where} "
+                "GROUP BY m", [offset, box] + params):
+            counts[minute] += n
+        return counts
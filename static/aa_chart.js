@@ -3,7 +3,7 @@
 
 (function () {
   const CANVAS_ID = 'aaChart';
-  const API_URL_BASE = '/api/aa_minutes';
+  const API_URL_BASE = '/api/minutes/aa';
 
   function minutesToLabel(min) {
     const m = min % (24 * 60);
@@ -75,11 +75,21 @@
     });
   }
 
+  let currentAgg = 1;
+
+  // url -> { etag, data }: gửi If-None-Match, server trả 304 nếu dữ liệu chưa đổi
+  const responseCache = {};
+
   async function fetchData(agg = 1) {
     const url = API_URL_BASE + (agg && agg > 1 ? `?agg=${agg}` : '');
-    const res = await fetch(url, { cache: 'no-store' });
+    const prev = responseCache[url];
+    const headers = prev && prev.etag ? { 'If-None-Match': prev.etag } : {};
+    const res = await fetch(url, { cache: 'no-store', headers: headers });
+    if (res.status === 304 && prev) return prev.data;
     if (!res.ok) throw new Error('Fetch error ' + res.status);
-    return res.json();
+    const data = await res.json();
+    responseCache[url] = { etag: res.headers.get('ETag'), data: data };
+    return data;
   }
 
   async function initChart(opts = {}) {
@@ -125,6 +135,7 @@
       const ctx = canvas.getContext('2d');
       if (canvas._chartInstance) canvas._chartInstance.destroy();
       canvas._chartInstance = createLineChart(ctx, ds.labels, ds.counts);
+      currentAgg = agg;
 
       setTimeout(() => {
         try {
@@ -170,6 +181,21 @@
     initChart({ agg: 1, maxPoints: 1440 });
   });
 
+  // Cộng các lần nổ mới (phút trong ngày, từ /api/stream) vào dataset đang vẽ,
+  // không tải lại cả chuỗi 1440 điểm. Trả false nếu chart chưa sẵn sàng.
+  window.applyAaHits = function (minutes) {
+    const canvas = document.getElementById(CANVAS_ID);
+    const chart = canvas && canvas._chartInstance;
+    if (!chart) return false;
+    const data = chart.data.datasets[0].data;
+    minutes.forEach(min => {
+      const idx = Math.floor(min / currentAgg);
+      if (idx >= 0 && idx < data.length) data[idx] += 1;
+    });
+    chart.update('none');
+    return true;
+  };
+
   window.refreshAaChart = function (agg = 1) {
     return initChart({ agg: agg, maxPoints: 1440 });
   };
@@ -7,11 +7,34 @@ function getSelectedBoxes() {
   return Array.from(document.querySelectorAll('.box.selected')).map(el => el.getAttribute('data-val'));
 }
 
+function fillSelectedInputs(selected) {
+  // map selections vào form (ẩn) trước submit
+  const container = document.getElementById("selected-container");
+  container.innerHTML = ""; // clear previous
+  selected.forEach(k => {
+    const inp = document.createElement("input");
+    inp.type = "hidden";
+    inp.name = "selected_box";
+    inp.value = k;
+    container.appendChild(inp);
+  });
+}
+
 function validateAndSubmit() {
   const TOP = ["cowboy_win","draw","bull_win"];
   const RIGHT = ["high_onepair","two_pair","trips","full_house","four_kind"];
 
   const selected = getSelectedBoxes();
+  // có nhập bài -> server tự chốt box (và báo lỗi nếu box đã tick khác kết quả)
+  const dealt = ["cowboy","bull","board"].some(n => {
+    const inp = document.querySelector('#save-form input[name="' + n + '"]');
+    return inp && inp.value.trim() !== "";
+  });
+  if (dealt) {
+    fillSelectedInputs(selected);
+    document.getElementById("save-form").submit();
+    return;
+  }
   const topSel = selected.filter(s => TOP.includes(s));
   const rightSel = selected.filter(s => RIGHT.includes(s));
   const rightsExclFk = rightSel.filter(s => s !== "four_kind");
@@ -33,16 +56,7 @@ function validateAndSubmit() {
     return;
   }
 
-  // map selections vào form (ẩn) trước submit
-  const container = document.getElementById("selected-container");
-  container.innerHTML = ""; // clear previous
-  selected.forEach(k => {
-    const inp = document.createElement("input");
-    inp.type = "hidden";
-    inp.name = "selected_box";
-    inp.value = k;
-    container.appendChild(inp);
-  });
+  fillSelectedInputs(selected);
 
   // ensure first_card hidden input is set (already present in template)
   document.getElementById("save-first-card").value = document.getElementById("save-first-card").value || "";
@@ -82,6 +82,51 @@
     return refreshBoth(agg);
   };
 
+  function slotToMinute(slot) {
+    const parts = String(slot).split(':');
+    if (parts.length !== 2) return NaN;
+    return parseInt(parts[0], 10) * 60 + parseInt(parts[1], 10);
+  }
+
+  // Live updates: /api/stream đẩy round mới + các lần nổ, chart chỉ cộng thêm điểm tương ứng
+  function connectStream() {
+    if (typeof EventSource === 'undefined') return;
+    const es = new EventSource('/api/stream');
+    let connectedOnce = false;
+
+    const reloadAll = function () {
+      const agg = parseAgg($(FK_SELECT_ID) || $(AA_SELECT_ID));
+      refreshBoth(agg).catch(err => console.error('Error refreshing charts:', err));
+    };
+
+    // kết nối lại sau khi rớt mạng có thể đã lỡ event -> tải lại toàn bộ
+    es.addEventListener('hello', function () {
+      if (connectedOnce) reloadAll();
+      connectedOnce = true;
+    });
+
+    es.addEventListener('round', function (ev) {
+      let msg;
+      try { msg = JSON.parse(ev.data); } catch (e) { return; }
+      const byBox = { aa: [], four_kind: [] };
+      (msg.hits || []).forEach(h => {
+        const min = slotToMinute(h.slot);
+        if (byBox[h.box] && Number.isFinite(min)) byBox[h.box].push(min);
+      });
+      let ok = true;
+      if (byBox.aa.length) {
+        ok = typeof window.applyAaHits === 'function' && window.applyAaHits(byBox.aa) && ok;
+      }
+      if (byBox.four_kind.length) {
+        ok = typeof window.applyFourKindHits === 'function' && window.applyFourKindHits(byBox.four_kind) && ok;
+      }
+      if (!ok) reloadAll();
+    });
+
+    es.addEventListener('reset', reloadAll);
+    es.addEventListener('version', reloadAll);
+  }
+
   // Wire up events on DOM ready
   document.addEventListener('DOMContentLoaded', function () {
     const fk = $(FK_SELECT_ID);
@@ -103,5 +148,7 @@
         setControlsDisabled(false);
       }
     })();
+
+    connectStream();
   });
 })();
\ No newline at end of file
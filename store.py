@@ -0,0 +1,2120 @@
+# store.py
+import os
+import hashlib
+import contextlib
+import logging
+import datetime
+import stat
+import tempfile
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ có khoá trong process
+    fcntl = None
+
+import jsoncodec
+from columns import (
+    BOX_BIT, CARD_INDEX, CARDS, NO_CARD, NO_TS, RecentWindows, RoundFilter, RoundLog, RoundTable,
+    SequenceStats, card_box_of, row_of,
+)
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cấu hình file (có thể override bằng env vars)
+DATA_FILE = os.getenv("DATA_FILE", "data.json")
+HOUR_FILE = os.getenv("HOUR_FILE", "hour.json")
+
+# (mtime_ns, size, inode) của file tại lần parse gần nhất
+FileSignature = Tuple[int, int, int]
+
+# Snapshot dữ liệu dẫn xuất (<file>.snapshot.json): ghi lại sau mỗi SNAPSHOT_EVERY
+# record journal mới; 0 = tắt (mọi lần khởi động đều parse lại toàn bộ file)
+SNAPSHOT_EVERY = int(os.getenv("SNAPSHOT_EVERY", "1000"))
+SNAPSHOT_FORMAT = 5
+SNAPSHOT_ANCHOR_BYTES = 4096
+TAIL_CHUNK_BYTES = 64 * 1024  # RoundStore.tail: đọc ngược journal theo từng khối
+
+def parse_recent_windows(spec: str) -> Tuple[int, ...]:
+    """
+    '50,200,1000' -> (50, 200, 1000): chỉ giữ cỡ > 0, bỏ trùng, sắp tăng dần.
+    """
+    return tuple(sorted({w for w in (int(v) for v in spec.split(",") if v.strip()) if w > 0}))
+
+# Cỡ các cửa sổ "N round gần nhất" (stats trượt, cập nhật mỗi round mới)
+RECENT_WINDOWS = parse_recent_windows(os.getenv("RECENT_WINDOWS", "50,200,1000"))
+
+# Giờ VN: slot HH:MM và histogram theo phút đều tính theo giờ này
+VN_TZ = datetime.timezone(datetime.timedelta(hours=7))
+MINUTES_PER_DAY = 24 * 60
+
+# -----------------------
+# Helpers: timestamp của round (UTC epoch, giây)
+# -----------------------
+def round_ts(r: dict) -> Optional[int]:
+    """
+    Field 'ts' của round, None nếu round cũ chưa có timestamp.
+    """
+    ts = r.get("ts")
+    if isinstance(ts, bool) or not isinstance(ts, (int, float)):
+        return None
+    return int(ts)
+
+def vn_minute_of_day(ts: int) -> int:
+    """
+    Phút trong ngày (0..1439, giờ VN) của epoch ts.
+    """
+    offset = int(VN_TZ.utcoffset(None).total_seconds())
+    return ((ts + offset) // 60) % MINUTES_PER_DAY
+
+# -----------------------
+# Helpers: IO an toàn
+# -----------------------
+# umask của process (đọc 1 lần: os.umask chỉ đọc được bằng cách set lại)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _file_mode(path: str) -> int:
+    """
+    Quyền cho file ghi đè: giữ quyền của file cũ, file mới thì như open() (0666 & ~umask).
+    mkstemp tạo temp file 0600 nên phải chmod trước khi replace.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+def _atomic_write_bytes(path: str, payload: bytes) -> None:
+    dirn = os.path.dirname(path) or "."
+    os.makedirs(dirn, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dirn)
+    try:
+        with metrics.timer("atomic_write"):
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fchmod(f.fileno(), _file_mode(path))
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        metrics.add_written(path, len(payload))
+    finally:
+        if os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+
+def atomic_write_json(path: str, obj: Any) -> None:
+    """
+    Ghi JSON một cách atomic: ghi vào temp file rồi replace (định dạng theo DATA_JSON_STYLE).
+    """
+    _atomic_write_bytes(path, jsoncodec.dump_file(obj))
+
+def read_json_file(path: str) -> Any:
+    """
+    json.load cả file (đếm số byte đọc cho /metrics). Lỗi OSError/ValueError để caller xử lý.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    metrics.add_read(path, len(raw))
+    return jsoncodec.loads(raw)
+
+# -----------------------
+# Journal (JSONL): mỗi dòng 1 record, chỉ append
+# -----------------------
+def is_journal(path: str) -> bool:
+    """
+    File .jsonl được coi là journal (vd. DATA_FILE=data.jsonl).
+    """
+    return path.endswith(".jsonl")
+
+def _journal_bytes(records: Iterable[Any]) -> bytes:
+    return jsoncodec.dump_lines(records)
+
+def read_journal(path: str, offset: int = 0) -> Tuple[List[Any], int]:
+    """
+    Đọc các dòng hoàn chỉnh từ byte offset, trả về (records, offset mới).
+    Dòng cuối chưa có newline (đang được ghi dở) được để lại cho lần đọc sau.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    metrics.add_read(path, len(chunk))
+    end = chunk.rfind(b"\n") + 1
+    records: List[Any] = []
+    for raw in chunk[:end].splitlines():
+        if not raw.strip():
+            continue
+        try:
+            records.append(jsoncodec.loads(raw))
+        except ValueError:
+            logger.warning("Skipping invalid journal line in %s", path)
+    return records, offset + end
+
+def append_journal(path: str, records: Iterable[Any]) -> None:
+    """
+    Ghi thêm records vào cuối journal (O(số record mới), không đụng phần cũ).
+    """
+    payload = _journal_bytes(records)
+    if not payload:
+        return
+    with metrics.timer("append_journal"), open(path, "ab") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    metrics.add_written(path, len(payload))
+
+# tombstone trong journal: {"op": "delete", ...} huỷ các record trước nó (xem RoundStore/fold_hit)
+TOMBSTONE_OP = "delete"
+
+def is_tombstone(rec: Any) -> bool:
+    return isinstance(rec, dict) and rec.get("op") == TOMBSTONE_OP
+
+def replay_rounds(records: Iterable[Any]) -> Tuple[List[dict], int]:
+    """
+    Replay journal rounds: round bị bỏ nếu có tombstone cùng round_id nằm sau nó.
+    Trả về (rounds còn lại, số tombstone). O(n), chỉ giữ vị trí tombstone cuối của mỗi id.
+    """
+    records = [r for r in records if isinstance(r, dict)]
+    last_tomb: Dict[Any, int] = {}
+    tombstones = 0
+    for i, r in enumerate(records):
+        if is_tombstone(r):
+            last_tomb[r.get("round_id")] = i
+            tombstones += 1
+    rounds = [r for i, r in enumerate(records)
+              if not is_tombstone(r) and last_tomb.get(r.get("round_id"), -1) < i]
+    return rounds, tombstones
+
+def write_journal(path: str, records: Iterable[Any]) -> None:
+    """
+    Ghi lại toàn bộ journal (atomic). Dùng cho delete/clear/convert.
+    """
+    _atomic_write_bytes(path, _journal_bytes(records))
+
+# -----------------------
+# CachedFile: cache nội dung file, validate bằng (mtime, size, inode)
+# -----------------------
+class CachedFile:
+    """
+    Base cho các store đọc từ 1 file JSON/JSONL và giữ dữ liệu đã parse trong bộ nhớ.
+    Chỉ parse lại khi mtime/size/inode thay đổi (vd. worker khác ghi file).
+
+    Nếu path là .jsonl thì file là journal: khi file lớn lên (cùng inode) chỉ
+    đọc phần đuôi mới ghi và gọi _apply() cho các record mới.
+
+    Khởi động lạnh: nếu '<path>.snapshot.json' còn khớp file (journal: cùng inode
+    và phần đã phủ không đổi; JSON: cùng signature) thì nạp dữ liệu dẫn xuất từ
+    snapshot và chỉ replay các record ghi sau offset của nó.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.snapshot_path = path + ".snapshot.json"
+        self._lock = threading.RLock()
+        self._journal = is_journal(path)
+        self._sig: Optional[FileSignature] = None
+        self._offset = 0  # journal: số byte đã đọc
+        self._since_snapshot = 0  # số record journal đã apply từ snapshot gần nhất
+        self._lock_depth = 0
+        self.version = 0  # tăng mỗi lần dữ liệu cache thay đổi
+        self._snapshot_lock = threading.Lock()  # giữ khi có thread snapshot nền đang chạy
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    def _signature(self) -> Optional[FileSignature]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def ensure_file(self) -> None:
+        raise NotImplementedError
+
+    def _load_full(self) -> None:
+        """
+        Parse lại toàn bộ file và build lại dữ liệu dẫn xuất.
+        """
+        raise NotImplementedError
+
+    def _apply(self, records: List[Any]) -> None:
+        """
+        Journal: cộng các record mới đọc ở đuôi file vào dữ liệu đã cache.
+        """
+        raise NotImplementedError
+
+    # -----------------------
+    # Snapshot
+    # -----------------------
+    def _snapshot_state(self) -> Optional[dict]:
+        """
+        Dữ liệu dẫn xuất cần lưu (JSON được); None nếu store không hỗ trợ snapshot.
+        """
+        return None
+
+    def _restore_snapshot(self, state: dict) -> None:
+        raise NotImplementedError
+
+    def _use_snapshot(self) -> bool:
+        """
+        Có được nạp từ snapshot thay vì parse toàn bộ file không.
+        """
+        return SNAPSHOT_EVERY > 0
+
+    def _anchor(self, offset: int) -> str:
+        # hash đoạn cuối phần file mà snapshot phủ: phát hiện file bị thay (inode dùng lại)
+        with open(self.path, "rb") as f:
+            f.seek(max(0, offset - SNAPSHOT_ANCHOR_BYTES))
+            return hashlib.sha1(f.read(min(offset, SNAPSHOT_ANCHOR_BYTES))).hexdigest()
+
+    def _load_snapshot(self) -> bool:
+        """
+        Nạp snapshot nếu còn khớp file hiện tại, rồi apply phần journal ghi sau nó.
+        """
+        try:
+            snap = read_json_file(self.snapshot_path)
+        except (OSError, ValueError):
+            return False
+        sig = self._signature()
+        if not isinstance(snap, dict) or snap.get("format") != SNAPSHOT_FORMAT or sig is None:
+            return False
+        offset = snap.get("offset")
+        try:
+            if self._journal:
+                if (not isinstance(offset, int) or snap.get("inode") != sig[2]
+                        or offset > sig[1] or snap.get("anchor") != self._anchor(offset)):
+                    return False
+            elif snap.get("sig") != list(sig):
+                return False
+            self._restore_snapshot(snap["state"])
+        except (OSError, KeyError, TypeError, ValueError, AttributeError):
+            logger.warning("Ignoring unusable snapshot %s", self.snapshot_path)
+            return False
+        if self._journal:
+            records, self._offset = read_journal(self.path, offset)
+            self._since_snapshot = len(records)
+            self._apply(records)
+        return True
+
+    def write_snapshot(self) -> bool:
+        """
+        Ghi snapshot (atomic) của dữ liệu dẫn xuất hiện tại, gắn offset/signature nó phủ.
+        Chỉ lấy state + serialize trong lock; ghi file (fsync) ngoài lock.
+        """
+        with self._lock:
+            self._refresh()
+            state = self._snapshot_state()
+            if state is None or self._sig is None:
+                return False
+            snap: Dict[str, Any] = {"format": SNAPSHOT_FORMAT, "path": self.path}
+            if self._journal:
+                snap.update(offset=self._offset, inode=self._sig[2], anchor=self._anchor(self._offset))
+            else:
+                snap["sig"] = list(self._sig)
+            snap["state"] = state
+            payload = jsoncodec.dumps(snap)
+            self._since_snapshot = 0
+        try:
+            _atomic_write_bytes(self.snapshot_path, payload)
+        except OSError:
+            logger.exception("Failed to write snapshot %s", self.snapshot_path)
+            return False
+        return True
+
+    def _snapshot_in_background(self) -> bool:
+        """
+        Chạy write_snapshot() ở thread nền (như Storage.maybe_compact) để request vừa
+        refresh không phải chờ serialize + ghi snapshot. Mỗi store 1 thread cùng lúc.
+        """
+        if not self._snapshot_lock.acquire(blocking=False):
+            return False  # đang có snapshot chạy
+
+        def run() -> None:
+            try:
+                self.write_snapshot()
+            except Exception:
+                logger.exception("Background snapshot failed %s", self.snapshot_path)
+            finally:
+                self._snapshot_lock.release()
+
+        self._snapshot_thread = threading.Thread(target=run, name="snapshot", daemon=True)
+        self._snapshot_thread.start()
+        return True
+
+    def _read_journal_full(self) -> List[Any]:
+        try:
+            records, self._offset = read_journal(self.path)
+        except OSError:
+            logger.exception("Failed to load journal %s", self.path)
+            return []
+        return records
+
+    def _refresh(self) -> None:
+        self.ensure_file()
+        sig = self._signature()
+        if sig == self._sig:
+            return
+        old = self._sig
+        parsed = False
+        if (self._journal and old is not None and sig is not None
+                and sig[2] == old[2] and sig[1] >= self._offset):
+            # journal chỉ được ghi thêm -> đọc phần đuôi, cập nhật tại chỗ
+            records, self._offset = read_journal(self.path, self._offset)
+            self._since_snapshot += len(records)
+            self._apply(records)
+        elif not (self._use_snapshot() and self._load_snapshot()):
+            with metrics.timer("full_parse"):
+                self._load_full()
+            metrics.count_parse(self.path)
+            parsed = True
+        self._sig = sig
+        self.version += 1
+        if SNAPSHOT_EVERY > 0 and sig is not None and (
+                (parsed and (old is None or self._journal))
+                or (self._journal and self._since_snapshot >= SNAPSHOT_EVERY)):
+            # vừa parse lại từ đầu, hoặc đã replay đủ nhiều record -> lưu snapshot mới
+            self._snapshot_in_background()
+
+    def signature(self) -> Optional[FileSignature]:
+        """
+        Signature file sau khi refresh (giống nhau giữa các worker cùng đọc file).
+        """
+        with self._lock:
+            self._refresh()
+            return self._sig
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        """
+        Khoá ghi: RLock trong process + flock trên '<path>.lock' giữa các worker,
+        để read-modify-write của worker này không ghi đè round của worker khác.
+        Gọi lồng nhau trong cùng thread thì chỉ lấy flock ở lớp ngoài cùng.
+        """
+        with self._lock:
+            self._lock_depth += 1
+            try:
+                if fcntl is None or self._lock_depth > 1:
+                    yield
+                    return
+                with open(self.path + ".lock", "a") as lf:
+                    fcntl.flock(lf, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lf, fcntl.LOCK_UN)
+            finally:
+                self._lock_depth -= 1
+
+    def _mark_written(self) -> None:
+        self.version += 1
+        self._sig = self._signature()
+        if self._journal and self._sig is not None:
+            self._offset = self._sig[1]
+
+    def _append_journal(self, records: List[Any]) -> None:
+        # đọc trước phần đuôi của worker khác, rồi chỉ ghi thêm dòng mới;
+        # _refresh sẽ đọc lại các dòng vừa ghi và gọi _apply như mọi record khác
+        self._refresh()
+        append_journal(self.path, records)
+        self._refresh()
+
+
+def _exact(r: dict) -> bool:
+    """
+    Round dựng lại được nguyên vẹn (cho aggregate) từ dòng cột card/boxes/ts:
+    lá hợp lệ hoặc rỗng, box đều hợp lệ và không trùng, ts là số.
+    """
+    card, boxes = r.get("first_card"), r.get("selected_boxes") or []
+    return ((not card or card in CARD_INDEX) and isinstance(boxes, list)
+            and all(isinstance(b, str) and b in BOX_BIT for b in boxes) and len(set(boxes)) == len(boxes)
+            and (r.get("ts") is None or round_ts(r) is not None))
+
+
+# -----------------------
+# RoundStore: cache rounds + aggregate theo lá bài
+# -----------------------
+class RoundStore(CachedFile):
+    """
+    Giữ danh sách rounds của data.json (hoặc journal data.jsonl) trong bộ nhớ.
+
+    Kèm theo là aggregate theo lá bài (tổng rounds + số lần mỗi box), được cập
+    nhật tại chỗ khi append/delete nên stats không phải quét lại toàn bộ history.
+
+    Stats theo cửa sổ thời gian chạy trên RoundTable (dạng cột, sắp theo ts).
+    List rounds dạng dict (và time index) chỉ được giữ khi có request thật sự cần
+    tới nó (load, between, compact, ghi lại data.json); nạp từ snapshot hoặc parse
+    lần đầu chỉ để lại aggregate + bảng cột + RoundLog và index round_id.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._rounds: Optional[List[dict]] = None
+        self._count = 0
+        self._box_counts: Counter = Counter()
+        self._card_totals: Counter = Counter()
+        self._card_box_counts: Dict[str, Counter] = {}
+        # time index: ts tăng dần + round tương ứng, để bisect theo khoảng thời gian
+        self._ts_keys: List[int] = []
+        self._ts_rounds: List[dict] = []
+        self._table: Optional[RoundTable] = RoundTable()
+        self._recent: Optional[RecentWindows] = RecentWindows(RECENT_WINDOWS)  # None: đang build lại
+        self._sequence = SequenceStats()
+        # round còn sống theo thứ tự ghi + round_id -> seq (list nếu id trùng) để xóa không cần quét
+        self._log = RoundLog()
+        self._ids: Dict[str, Any] = {}
+        self._inexact: set = set()  # seq của round không dựng lại được từ dòng cột (xem _exact)
+        self._want_rounds = False
+        self.tombstones = 0  # journal: số tombstone chưa được compact
+
+    def ensure_file(self) -> None:
+        if not os.path.exists(self.path):
+            with open(self.path, "w", encoding="utf-8") as f:
+                if not self._journal:
+                    f.write(jsoncodec.dump_file([]).decode("utf-8"))
+
+    def _read(self) -> List[dict]:
+        if self._journal:
+            rounds, self.tombstones = replay_rounds(self._read_journal_full())
+            return rounds
+        try:
+            data = read_json_file(self.path)
+        except (ValueError, OSError):
+            logger.exception("Failed to load data file %s", self.path)
+            return []
+        return data if isinstance(data, list) else []
+
+    def _write(self, arr: List[dict]) -> None:
+        if self._journal:
+            write_journal(self.path, arr)
+        else:
+            atomic_write_json(self.path, arr)
+
+    def _load_full(self) -> None:
+        self._rounds = self._read()
+        self._rebuild_aggregates()
+        if not self._want_rounds:
+            # chưa ai cần list dict: chỉ giữ aggregate + bảng cột (ít bộ nhớ hơn nhiều)
+            self._rounds = None
+            self._ts_keys = []
+            self._ts_rounds = []
+
+    def _use_snapshot(self) -> bool:
+        # đã cần list rounds thì parse toàn bộ như cũ, snapshot không giúp được
+        return super()._use_snapshot() and not self._want_rounds
+
+    def _snapshot_state(self) -> Optional[dict]:
+        return {
+            "count": self._count,
+            "tombstones": self.tombstones,
+            "box_counts": dict(self._box_counts),
+            "card_totals": dict(self._card_totals),
+            "card_box_counts": {c: dict(v) for c, v in self._card_box_counts.items()},
+            "table": self._table.to_state(),
+            "recent": self._recent.to_state(),
+            "sequence": self._sequence.to_state(),
+            "log": self._log.to_state(),
+            "ids": self._ids_in_order(),
+            "inexact": sorted(self._log.position(seq) for seq in self._inexact),
+        }
+
+    def _ids_in_order(self) -> List[Optional[str]]:
+        ids: List[Optional[str]] = [None] * len(self._log)
+        for round_id, seqs in self._ids.items():
+            for seq in (seqs if isinstance(seqs, list) else (seqs,)):
+                ids[self._log.position(seq)] = round_id
+        return ids
+
+    def _restore_snapshot(self, state: dict) -> None:
+        self._rounds = None
+        self._ts_keys = []
+        self._ts_rounds = []
+        self._count = int(state["count"])
+        self.tombstones = int(state["tombstones"])
+        self._box_counts = Counter(state["box_counts"])
+        self._card_totals = Counter(state["card_totals"])
+        self._card_box_counts = {c: Counter(v) for c, v in state["card_box_counts"].items()}
+        self._table = RoundTable.from_state(state["table"])
+        self._recent = RecentWindows.from_state(RECENT_WINDOWS, state["recent"])
+        self._sequence = SequenceStats.from_state(state["sequence"])
+        # seq của log nạp từ snapshot = vị trí 0..n-1
+        self._log = RoundLog.from_state(state["log"])
+        ids = state["ids"]
+        if not (len(ids) == len(self._log) == self._count == len(self._table)):
+            raise ValueError("round snapshot sizes differ")
+        self._ids = {}
+        for seq, round_id in enumerate(ids):
+            self._index_id(round_id, seq)
+        self._inexact = set(state["inexact"])
+
+    def _apply(self, records: List[Any]) -> None:
+        for r in records:
+            if is_tombstone(r):
+                self.tombstones += 1
+                if not self._drop(r):
+                    # tombstone không kèm nội dung round -> chỉ còn cách parse lại toàn bộ
+                    self._load_full()
+                    return
+            elif isinstance(r, dict):
+                if self._rounds is not None:
+                    self._rounds.append(r)
+                self._add_to_aggregates(r)
+
+    def _drop(self, tomb: dict) -> bool:
+        positions = self._positions(tomb.get("round_id"))
+        if not positions:
+            return True
+        if self._rounds is not None:
+            removed = [self._rounds[i] for i in positions]
+            drop = set(positions)
+            # thay list mới (không sửa tại chỗ) vì list cũ có thể đang được request khác đọc
+            self._rounds = [r for i, r in enumerate(self._rounds) if i not in drop]
+        elif any(self._log.seq[i] in self._inexact for i in positions):
+            # round không dựng lại được từ dòng cột: dùng nội dung ghi kèm tombstone
+            removed = tomb.get("rounds")
+            if not isinstance(removed, list) or len(removed) != len(positions):
+                return False
+        else:
+            removed = [self._round_at(i, tomb["round_id"]) for i in positions]
+        self._discard(positions, removed)
+        return True
+
+    def _ensure_rounds(self) -> List[dict]:
+        self._refresh()
+        if self._rounds is None:
+            # đang chạy từ snapshot: parse toàn bộ 1 lần, từ đó giữ list trong bộ nhớ
+            self._want_rounds = True
+            self._sig = None
+            self._refresh()
+        return self._rounds
+
+    # -----------------------
+    # Aggregates
+    # -----------------------
+    def _rebuild_aggregates(self) -> None:
+        self._count = 0
+        self._box_counts = Counter()
+        self._card_totals = Counter()
+        self._card_box_counts = {}
+        self._ts_keys = []
+        self._ts_rounds = []
+        self._table = None
+        self._recent = None
+        self._sequence = SequenceStats()
+        self._log = RoundLog()
+        self._ids = {}
+        self._inexact = set()
+        for r in self._rounds:
+            self._add_to_aggregates(r)
+        self._table = RoundTable.from_rows(row_of(r, round_ts(r)) for r in self._rounds)
+        self._recent = self._build_recent()
+
+    def _build_recent(self) -> RecentWindows:
+        return RecentWindows.from_rows(RECENT_WINDOWS, self._log.tail(max(RECENT_WINDOWS, default=0)))
+
+    def _index_time(self, r: dict, sign: int) -> None:
+        ts = round_ts(r)
+        if ts is None:
+            return
+        if sign > 0:
+            if not self._ts_keys or ts >= self._ts_keys[-1]:
+                # trường hợp thường gặp: round mới nhất -> thêm vào cuối
+                self._ts_keys.append(ts)
+                self._ts_rounds.append(r)
+                return
+            i = bisect_right(self._ts_keys, ts)
+            self._ts_keys.insert(i, ts)
+            self._ts_rounds.insert(i, r)
+            return
+        lo, hi = bisect_left(self._ts_keys, ts), bisect_right(self._ts_keys, ts)
+        for i in range(lo, hi):
+            if self._ts_rounds[i] is r:
+                del self._ts_keys[i]
+                del self._ts_rounds[i]
+                return
+
+    def _add_to_aggregates(self, r: dict) -> None:
+        self._count += 1
+        if self._rounds is not None:
+            self._index_time(r, 1)
+        row = row_of(r, round_ts(r))
+        if self._table is not None:
+            self._table.add(row)
+        card_idx, mask, ts = row
+        if self._recent is not None:
+            self._recent.push(card_idx, mask)
+        self._sequence.push(mask)
+        seq = self._log.append(card_idx, mask, ts)
+        self._index_id(r.get("round_id"), seq)
+        if not _exact(r):
+            self._inexact.add(seq)
+        self._count_boxes(r, 1)
+
+    def _discard(self, positions: List[int], removed: List[dict]) -> None:
+        """
+        Bỏ các round ở positions (vị trí trong RoundLog, tăng dần) khỏi dữ liệu dẫn xuất.
+        Không quét history: dòng lấy từ RoundLog, SequenceStats sửa từ các round kề bên,
+        ring RecentWindows chỉ dựng lại (từ đuôi log) khi round nằm trong các cửa sổ.
+        """
+        log = self._log
+        in_ring = positions[-1] >= len(log) - self._recent.capacity
+        for pos, r in zip(reversed(positions), reversed(removed)):
+            self._count -= 1
+            if self._rounds is not None:
+                self._index_time(r, -1)
+            self._table.remove(log.row(pos))
+            self._sequence.remove(log.boxes, pos)
+            self._unindex_id(r.get("round_id"), log.seq[pos])
+            log.remove(pos)
+            self._count_boxes(r, -1)
+        if in_ring:
+            self._recent = self._build_recent()
+
+    def _count_boxes(self, r: dict, sign: int) -> None:
+        sbs = r.get("selected_boxes") or []
+        card = r.get("first_card")
+        per_card = self._card_box_counts.setdefault(card, Counter()) if card else None
+        for sb in sbs:
+            self._box_counts[sb] += sign
+            if per_card is not None:
+                per_card[sb] += sign
+        if sign < 0:
+            # giữ aggregate giống hệt khi build từ đầu: không để lại key = 0
+            self._box_counts += Counter()
+            if per_card is not None:
+                per_card += Counter()
+        if not card:
+            return
+        self._card_totals[card] += sign
+        if self._card_totals[card] <= 0:
+            # lá không còn round nào -> bỏ khỏi index như khi build từ đầu
+            del self._card_totals[card]
+            self._card_box_counts.pop(card, None)
+
+    # -----------------------
+    # Index round_id -> seq trong RoundLog
+    # -----------------------
+    def _index_id(self, round_id: Any, seq: int) -> None:
+        if not isinstance(round_id, str):
+            return
+        seqs = self._ids.get(round_id)
+        if seqs is None:
+            self._ids[round_id] = seq
+        elif isinstance(seqs, list):
+            seqs.append(seq)
+        else:
+            self._ids[round_id] = [seqs, seq]
+
+    def _unindex_id(self, round_id: Any, seq: int) -> None:
+        self._inexact.discard(seq)
+        seqs = self._ids.get(round_id) if isinstance(round_id, str) else None
+        if seqs is None:
+            return
+        if not isinstance(seqs, list):
+            del self._ids[round_id]
+            return
+        seqs.remove(seq)
+        if len(seqs) == 1:
+            self._ids[round_id] = seqs[0]
+
+    def _positions(self, round_id: Any) -> List[int]:
+        seqs = self._ids.get(round_id) if isinstance(round_id, str) else None
+        if seqs is None:
+            return []
+        return sorted(self._log.position(seq) for seq in (seqs if isinstance(seqs, list) else (seqs,)))
+
+    def _round_at(self, pos: int, round_id: str) -> dict:
+        """
+        Dựng lại round ở vị trí pos từ dòng cột (chỉ dùng cho round _exact).
+        """
+        card, boxes, ts = self._log.row(pos)
+        r = {"round_id": round_id, "first_card": CARDS[card] if card != NO_CARD else "",
+             "selected_boxes": [b for b, bit in BOX_BIT.items() if boxes & bit]}
+        if ts != NO_TS:
+            r["ts"] = ts
+        return r
+
+    def existing_round_ids(self, round_ids: Iterable[str]) -> set:
+        """
+        Các round_id trong round_ids đang có (tra index round_id, cập nhật khi ghi/xóa).
+        """
+        with self._lock:
+            self._refresh()
+            return {rid for rid in round_ids if isinstance(rid, str) and rid in self._ids}
+
+    def load(self) -> List[dict]:
+        """
+        Trả về list rounds đã cache (parse lại nếu file đổi).
+        List trả về dùng chung giữa các request: chỉ đọc, không sửa trực tiếp.
+        """
+        with self._lock:
+            return self._ensure_rounds()
+
+    def totals(self) -> Tuple[int, Dict[str, int]]:
+        """
+        (tổng số rounds, số rounds chứa mỗi box) trên toàn bộ history.
+        """
+        with self._lock:
+            self._refresh()
+            return self._count, dict(self._box_counts)
+
+    def card_stats(self, card: str) -> Tuple[int, Dict[str, int]]:
+        """
+        (số rounds có first_card == card, số lần mỗi box trong các round đó).
+        """
+        with self._lock:
+            self._refresh()
+            return self._card_totals.get(card, 0), dict(self._card_box_counts.get(card, {}))
+
+    def all_card_stats(self) -> Dict[str, Tuple[int, Dict[str, int]]]:
+        """
+        card_stats() của mọi lá có round, lấy 1 lần dưới lock.
+        """
+        with self._lock:
+            self._refresh()
+            return {c: (n, dict(self._card_box_counts.get(c, {}))) for c, n in self._card_totals.items()}
+
+    def top_cards(self, limit: int = 12) -> List[Tuple[str, int]]:
+        with self._lock:
+            self._refresh()
+            return self._card_totals.most_common(limit)
+
+    def recent_stats(self, window: int, card: Optional[str] = None) -> Tuple[int, Dict[str, int]]:
+        """
+        Như totals()/card_stats() nhưng chỉ trên `window` round mới nhất (window thuộc
+        RECENT_WINDOWS), đọc từ bộ đếm trượt.
+        """
+        with self._lock:
+            self._refresh()
+            if card is None:
+                return self._recent.totals(window)
+            return self._recent.card_stats(card, window)
+
+    def sequence_summary(self) -> Dict[str, Any]:
+        """
+        SequenceStats.summary() theo thứ tự ghi của rounds.
+        """
+        with self._lock:
+            self._refresh()
+            return self._sequence.summary()
+
+    def table_stat(self, since: Optional[int], until: Optional[int],
+                   reduce: Callable[[RoundTable, int, int], Any]) -> Any:
+        """
+        reduce(bảng cột, lo, hi) trên các dòng since <= ts < until (không có cả 2 = mọi
+        dòng), chạy dưới lock (bảng không bị sửa trong lúc numpy đang đọc buffer của nó).
+        """
+        with self._lock:
+            self._refresh()
+            if since is None and until is None:
+                lo, hi = 0, len(self._table)
+            else:
+                lo, hi = self._table.window(since, until)
+            return reduce(self._table, lo, hi)
+
+    def between(self, since: Optional[int] = None, until: Optional[int] = None) -> List[dict]:
+        """
+        Các round có since <= ts < until (theo ts tăng dần), bisect trên time index
+        nên chỉ tốn O(log n + số round trong cửa sổ). Round chưa có ts bị bỏ qua.
+        """
+        with self._lock:
+            self._ensure_rounds()
+            keys = self._ts_keys
+            lo = bisect_left(keys, since) if since is not None else 0
+            hi = bisect_left(keys, until) if until is not None else len(keys)
+            return self._ts_rounds[lo:hi]
+
+    def tail(self, n: int) -> List[dict]:
+        """
+        n round ghi sau cùng (thứ tự lưu) mà không nạp list rounds. Journal: đọc ngược
+        từ cuối file theo từng khối tới khi đủ n round còn sống. JSON: decode lần lượt,
+        chỉ giữ n round cuối.
+        """
+        if n <= 0:
+            return []
+        with self._lock:
+            self._refresh()
+            if self._rounds is not None:
+                return self._rounds[-n:]
+            if self._journal:
+                rounds = self._journal_tail(n)
+            else:
+                raw = self._read_covered()
+                rounds = list(deque(self._decode_array(raw), maxlen=n)) if raw is not None else None
+        return rounds if rounds is not None else self.load()[-n:]
+
+    def _journal_tail(self, n: int) -> Optional[List[dict]]:
+        # đọc ngược: tombstone nằm sau round nó xóa nên luôn gặp trước round đó
+        dead = set()
+        found: List[dict] = []
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if (st.st_mtime_ns, st.st_size, st.st_ino) != self._sig:
+                    return None
+                end, partial, read = self._offset, b"", 0
+                while end > 0 and len(found) < n:
+                    start = max(0, end - TAIL_CHUNK_BYTES)
+                    f.seek(start)
+                    chunk = f.read(end - start)
+                    read += len(chunk)
+                    lines = (chunk + partial).split(b"\n")
+                    end = start
+                    # dòng đầu khối có thể bị cắt: ghép với khối trước nó ở vòng sau
+                    partial = lines.pop(0) if end > 0 else b""
+                    for line in reversed(lines):
+                        if not line.strip():
+                            continue
+                        try:
+                            rec = jsoncodec.loads(line)
+                        except ValueError:
+                            continue
+                        if is_tombstone(rec):
+                            dead.add(rec.get("round_id"))
+                        elif isinstance(rec, dict) and rec.get("round_id") not in dead:
+                            found.append(rec)
+                            if len(found) == n:
+                                break
+        except OSError:
+            return None
+        metrics.add_read(self.path, read)
+        return found[::-1]
+
+    def iter_rounds(self, since: Optional[int] = None) -> Iterator[dict]:
+        """
+        Duyệt rounds cho export (thứ tự lưu, hoặc theo ts nếu có since) mà không dựng
+        list dict của cả history: đọc lại file và decode từng round, journal thì bỏ các
+        round có tombstone phía sau. Đã có list rounds trong bộ nhớ thì dùng luôn.
+        """
+        with self._lock:
+            self._refresh()
+            if self._rounds is not None:
+                return iter(self._rounds if since is None else self.between(since))
+            raw = self._read_covered()
+        if raw is None:
+            return iter(self.load() if since is None else self.between(since))
+        rounds = self._decode_journal(raw) if self._journal else self._decode_array(raw)
+        if since is None:
+            return rounds
+        # giữ round trong cửa sổ rồi sort ổn định theo ts (giống time index)
+        window = [(ts, r) for r in rounds for ts in (round_ts(r),) if ts is not None and ts >= since]
+        window.sort(key=lambda item: item[0])
+        return (r for _, r in window)
+
+    def _read_covered(self) -> Optional[bytes]:
+        """
+        Phần file mà dữ liệu cache đang phủ (journal: tới _offset); None nếu file trên
+        đĩa đã khác (worker khác vừa ghi / thay file) hoặc đọc lỗi.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if (st.st_mtime_ns, st.st_size, st.st_ino) != self._sig:
+                    return None
+                raw = f.read(self._offset) if self._journal else f.read()
+        except OSError:
+            return None
+        metrics.add_read(self.path, len(raw))
+        return raw
+
+    @staticmethod
+    def _decode_array(raw: bytes) -> Iterator[dict]:
+        try:
+            for r in jsoncodec.iter_array(raw):
+                yield r
+        except ValueError:
+            logger.exception("Failed to decode data file for export")
+
+    @staticmethod
+    def _decode_journal(raw: bytes) -> Iterator[dict]:
+        lines = raw.splitlines()
+        # lượt 1: chỉ parse các dòng có thể là tombstone -> vị trí tombstone cuối của mỗi id
+        last_tomb: Dict[Any, int] = {}
+        for i, line in enumerate(lines):
+            if b'"op"' in line:
+                try:
+                    rec = jsoncodec.loads(line)
+                except ValueError:
+                    continue
+                if is_tombstone(rec):
+                    last_tomb[rec.get("round_id")] = i
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                rec = jsoncodec.loads(line)
+            except ValueError:
+                continue
+            if isinstance(rec, dict) and not is_tombstone(rec) and last_tomb.get(rec.get("round_id"), -1) < i:
+                yield rec
+
+    def save(self, arr: List[dict]) -> None:
+        """
+        Ghi đè toàn bộ file và cập nhật cache.
+        """
+        with self._write_lock():
+            self._commit(list(arr))
+            self.tombstones = 0
+            self._rebuild_aggregates()
+
+    def _commit(self, rounds: List[dict]) -> None:
+        try:
+            self._write(rounds)
+        except Exception:
+            # không chắc file trên đĩa ra sao -> buộc parse lại ở lần đọc sau
+            self._sig = None
+            raise
+        self._rounds = rounds
+        self._mark_written()
+
+    def append(self, rec: dict) -> None:
+        """
+        Thêm 1 round vào cuối, cập nhật aggregate tại chỗ.
+        """
+        with self._write_lock():
+            if self._journal:
+                self._append_journal([rec])
+                return
+            self._commit(self.load() + [rec])
+            self._add_to_aggregates(rec)
+
+    def extend(self, recs: List[dict]) -> None:
+        """
+        Thêm nhiều round trong 1 lần ghi.
+        """
+        if not recs:
+            return
+        with self._write_lock():
+            if self._journal:
+                self._append_journal(recs)
+                return
+            self._commit(self.load() + list(recs))
+            for rec in recs:
+                self._add_to_aggregates(rec)
+
+    def delete(self, round_id: str) -> List[dict]:
+        """
+        Xóa các round có round_id, trả về các round đã xóa. Tìm round qua index round_id,
+        dữ liệu dẫn xuất được trừ tại chỗ (_discard).
+        Journal: chỉ ghi thêm 1 tombstone (O(1) I/O), compact() mới ghi lại file.
+        Tombstone mang theo nội dung round cho worker không dựng lại được round từ dòng cột.
+        """
+        with self._write_lock():
+            self._refresh()
+            positions = self._positions(round_id)
+            if not positions:
+                return []
+            if not self._journal:
+                # data.json phải ghi lại cả file -> cần list dict như mọi lần ghi
+                rounds = self._ensure_rounds()
+                positions = self._positions(round_id)
+                removed = [rounds[i] for i in positions]
+                drop = set(positions)
+                self._commit([r for i, r in enumerate(rounds) if i not in drop])
+                self._discard(positions, removed)
+                return removed
+            if self._rounds is None and any(self._log.seq[i] in self._inexact for i in positions):
+                self._ensure_rounds()
+                positions = self._positions(round_id)
+            if self._rounds is not None:
+                removed = [self._rounds[i] for i in positions]
+            else:
+                removed = [self._round_at(i, round_id) for i in positions]
+            self._append_journal([{"op": TOMBSTONE_OP, "round_id": round_id, "rounds": removed}])
+            return removed
+
+    def compact(self) -> int:
+        """
+        Journal: ghi lại file chỉ với các round còn sống (bỏ tombstone + round đã xóa).
+        Trả về số tombstone đã dọn.
+        """
+        with self._write_lock():
+            rounds = self._ensure_rounds()
+            if not self._journal or not self.tombstones:
+                return 0
+            dropped = self.tombstones
+            self._commit(rounds)
+            self.tombstones = 0
+        self.write_snapshot()
+        return dropped
+
+
+_stores: Dict[str, RoundStore] = {}
+_stores_lock = threading.Lock()
+
+def get_round_store(path: str = DATA_FILE) -> RoundStore:
+    """
+    Trả về RoundStore dùng chung cho path (mỗi file một instance trong process).
+    """
+    key = os.path.abspath(path)
+    with _stores_lock:
+        st = _stores.get(key)
+        if st is None:
+            st = RoundStore(path)
+            _stores[key] = st
+        return st
+
+
+# -----------------------
+# Hour file helpers (slot -> list of cards)
+# -----------------------
+HOUR_BOXES = ("aa", "four_kind")
+
+def empty_hour() -> dict:
+    return {k: {} for k in HOUR_BOXES}
+
+def normalize_hour(data: Any) -> dict:
+    """
+    Chuẩn hoá dữ liệu hour: đủ các box, migrate nhẹ nếu dữ liệu cũ là list các HH:MM strings.
+    """
+    if not isinstance(data, dict):
+        return empty_hour()
+    for key in HOUR_BOXES:
+        if key in data and isinstance(data[key], list):
+            new = {}
+            for t in data[key]:
+                if isinstance(t, str):
+                    new.setdefault(t, [])
+            data[key] = new
+        elif key not in data:
+            data[key] = {}
+    return data
+
+def parse_hhmm(s: str) -> Optional[Tuple[int, int]]:
+    """
+    Chuyển 'HH:MM' -> (h, m). Trả None nếu không phải chuỗi hợp lệ hoặc ngoài phạm vi.
+    """
+    if not isinstance(s, str):
+        return None
+    parts = s.split(":")
+    if len(parts) != 2:
+        return None
+    try:
+        h = int(parts[0])
+        m = int(parts[1])
+    except ValueError:
+        return None
+    if 0 <= h < 24 and 0 <= m < 60:
+        return h, m
+    return None
+
+def minute_counts_for_box(hour_data: dict, box_key: str) -> list:
+    """
+    Trả về list 1440 số nguyên: counts[0] = số lần nổ phút 00:00,
+    counts[1] = phút 00:01, ..., counts[1439] = phút 23:59.
+    """
+    counts = [0] * (24 * 60)
+    box = hour_data.get(box_key, {}) if isinstance(hour_data, dict) else {}
+    for slot, cards in box.items():
+        parsed = parse_hhmm(slot)
+        if parsed is None:
+            continue
+        h, m = parsed
+        idx = h * 60 + m
+        if isinstance(cards, list):
+            counts[idx] += len(cards)
+        elif isinstance(cards, int):
+            counts[idx] += cards
+    return counts
+
+def ensure_hour_file(path: str = HOUR_FILE) -> None:
+    if not os.path.exists(path):
+        if is_journal(path):
+            open(path, "a").close()
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(jsoncodec.dump_file(empty_hour()).decode("utf-8"))
+
+def fold_hit(data: dict, hit: Any) -> Optional[str]:
+    """
+    Cộng 1 record journal {"box", "slot", "card"} vào hour data, trả về box (None nếu bỏ qua).
+    Tombstone {"op": "delete", "box", "slot", "card"?}: bỏ 1 lần nổ của card
+    (slot hết lá thì bỏ luôn slot), không có "card" thì bỏ cả slot.
+    """
+    if not isinstance(hit, dict) or not hit.get("box") or not hit.get("slot"):
+        return None
+    if is_tombstone(hit):
+        slots = data.get(hit["box"], {})
+        if hit["slot"] not in slots:
+            return None
+        if "card" in hit:
+            cards = slots[hit["slot"]]
+            if hit["card"] not in cards:
+                return None
+            del cards[len(cards) - 1 - cards[::-1].index(hit["card"])]
+            if cards:
+                return hit["box"]
+        del slots[hit["slot"]]
+        return hit["box"]
+    cards = data.setdefault(hit["box"], {}).setdefault(hit["slot"], [])
+    if hit.get("card"):
+        cards.append(hit["card"])
+    return hit["box"]
+
+def read_hour_file(path: str = HOUR_FILE) -> dict:
+    """
+    Đọc hour data ({box: {slot: [cards]}}) từ hour.json hoặc journal hour.jsonl.
+    Journal chứa mỗi dòng 1 lần nổ: {"box": ..., "slot": "HH:MM", "card": ...}.
+    """
+    ensure_hour_file(path)
+    if is_journal(path):
+        data = empty_hour()
+        try:
+            hits, _ = read_journal(path)
+        except OSError:
+            logger.exception("Failed to load hour file %s", path)
+            return data
+        for h in hits:
+            fold_hit(data, h)
+        return data
+    try:
+        return normalize_hour(read_json_file(path))
+    except (ValueError, OSError):
+        logger.exception("Failed to load hour file %s", path)
+        return empty_hour()
+
+def round_hits(rounds: Iterable[dict]) -> List[Tuple[str, str, str]]:
+    """
+    Các lần nổ aa/four_kind mà các round này đã ghi vào hour data, (box, slot, card).
+    Slot suy từ ts (giờ VN) nên round cũ chưa có ts bị bỏ qua.
+    """
+    hits: List[Tuple[str, str, str]] = []
+    for r in rounds:
+        ts, card = round_ts(r), r.get("first_card")
+        if ts is None or not card:
+            continue
+        slot = datetime.datetime.fromtimestamp(ts, VN_TZ).strftime("%H:%M")
+        boxes = r.get("selected_boxes") or []
+        hits.extend((box, slot, card) for box in HOUR_BOXES if box in boxes)
+    return hits
+
+def _hour_hits(data: dict) -> List[dict]:
+    hits: List[dict] = []
+    for box, slots in data.items():
+        if not isinstance(slots, dict):
+            continue
+        for slot, cards in slots.items():
+            if not cards:
+                # slot rỗng (dữ liệu cũ) vẫn giữ lại
+                hits.append({"box": box, "slot": slot, "card": None})
+                continue
+            for card in cards:
+                hits.append({"box": box, "slot": slot, "card": card})
+    return hits
+
+def write_hour_file(data: dict, path: str = HOUR_FILE) -> None:
+    """
+    Ghi lại toàn bộ hour data (atomic).
+    """
+    if is_journal(path):
+        write_journal(path, _hour_hits(data))
+    else:
+        atomic_write_json(path, data)
+
+def append_hour_hits(hits: List[Tuple[str, str, str]], path: str = HOUR_FILE) -> None:
+    """
+    Ghi nhận các lần nổ (box, slot 'HH:MM', card).
+    Journal: chỉ ghi thêm dòng; hour.json: đọc - sửa - ghi lại như trước.
+    """
+    if not hits:
+        return
+    ensure_hour_file(path)
+    if is_journal(path):
+        append_journal(path, [{"box": b, "slot": s, "card": c} for b, s, c in hits])
+        return
+    data = read_hour_file(path)
+    for box, slot, card in hits:
+        data.setdefault(box, {}).setdefault(slot, []).append(card)
+    write_hour_file(data, path)
+
+
+# -----------------------
+# Minute histogram (prefix sum)
+# -----------------------
+MINUTE_LABELS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_PER_DAY)]
+
+class MinuteHistogram:
+    """
+    Histogram 1440 phút của 1 box kèm mảng cộng dồn: prefix[i] = tổng counts[0:i].
+    Tổng một khoảng phút bất kỳ là 1 phép trừ, nên gộp theo agg chỉ tốn O(số bucket).
+    """
+
+    def __init__(self, counts: List[int]):
+        self.counts = counts
+        self.prefix = [0] * (MINUTES_PER_DAY + 1)
+        acc = 0
+        for i, c in enumerate(counts):
+            acc += c
+            self.prefix[i + 1] = acc
+
+    def total(self) -> int:
+        return self.prefix[MINUTES_PER_DAY]
+
+    def range_sum(self, start: int, end: int) -> int:
+        """
+        Tổng các phút trong [start, end), cho phép vắt qua nửa đêm (end tới 2 * 1440).
+        """
+        p = self.prefix
+        if end <= MINUTES_PER_DAY:
+            return p[end] - p[start]
+        if start >= MINUTES_PER_DAY:
+            return p[end - MINUTES_PER_DAY] - p[start - MINUTES_PER_DAY]
+        return (p[MINUTES_PER_DAY] - p[start]) + p[end - MINUTES_PER_DAY]
+
+    def buckets(self, agg: int = 1, start: int = 0, end: int = MINUTES_PER_DAY) -> Tuple[List[str], List[int]]:
+        """
+        Gộp cửa sổ [start, end) thành các bucket agg phút, trả về (labels, counts).
+        end <= start nghĩa là cửa sổ vắt qua nửa đêm (vd. 22:00 -> 02:00).
+        """
+        if end <= start:
+            end += MINUTES_PER_DAY
+        if agg == 1 and start == 0 and end == MINUTES_PER_DAY:
+            return MINUTE_LABELS, self.counts
+        labels: List[str] = []
+        out: List[int] = []
+        for b in range(start, end, agg):
+            labels.append(MINUTE_LABELS[b % MINUTES_PER_DAY])
+            out.append(self.range_sum(b, min(b + agg, end)))
+        return labels, out
+
+
+def slot_minute(slot: str) -> Optional[int]:
+    parsed = parse_hhmm(slot)
+    return parsed[0] * 60 + parsed[1] if parsed else None
+
+class SlotIndex:
+    """
+    Các phút (sắp xếp, không trùng) có slot 'HH:MM' hợp lệ của 1 box, để tìm slot kế
+    tiếp theo vòng ngày bằng bisect. Không sửa tại chỗ (request khác có thể đang đọc):
+    with_slot() trả về index mới.
+    """
+
+    def __init__(self, minutes: Iterable[int] = ()):
+        self.minutes: List[int] = sorted(set(minutes))
+
+    @classmethod
+    def from_slots(cls, slots: Iterable[str]) -> "SlotIndex":
+        return cls(m for m in map(slot_minute, slots) if m is not None)
+
+    def __len__(self) -> int:
+        return len(self.minutes)
+
+    def with_slot(self, slot: str) -> "SlotIndex":
+        m = slot_minute(slot)
+        i = bisect_left(self.minutes, m) if m is not None else 0
+        if m is None or (i < len(self.minutes) and self.minutes[i] == m):
+            return self
+        idx = SlotIndex()
+        idx.minutes = self.minutes[:i] + [m] + self.minutes[i:]
+        return idx
+
+    def next_minutes(self, now_minute: int, n: int) -> List[int]:
+        """
+        n phút có slot sau now_minute (quay vòng qua nửa đêm; ít slot hơn n thì lặp lại).
+        """
+        if not self.minutes:
+            return []
+        start = bisect_right(self.minutes, now_minute)
+        return [self.minutes[(start + k) % len(self.minutes)] for k in range(n)]
+
+
+# -----------------------
+# Đếm lá theo slot / theo box (top-k đọc thẳng, cập nhật theo từng lần nổ)
+# -----------------------
+class RankedCounter:
+    """
+    Counter luôn giữ sẵn thứ hạng theo count giảm dần: most_common(k) là đọc k phần tử
+    đầu, mỗi lần +1/-1 chỉ đổi chỗ phần tử với các phần tử cùng count.
+    Hòa count: theo thứ tự `tie` nếu có (key ngoài tie đứng sau, theo tên), không thì
+    theo thứ tự xuất hiện như Counter.most_common.
+    """
+
+    def __init__(self, tie: Optional[Dict[str, int]] = None):
+        self.counts: Dict[str, int] = {}
+        self.total = 0
+        self._tie = tie
+        self._seq: Dict[str, int] = {}
+        self._next = 0
+        self._rank: List[str] = []
+        self._pos: Dict[str, int] = {}
+
+    def _key(self, k: str) -> tuple:
+        if self._tie is not None:
+            return (-self.counts[k], self._tie.get(k, len(self._tie)), k)
+        return (-self.counts[k], self._seq[k])
+
+    def _swap(self, i: int, j: int) -> None:
+        rank = self._rank
+        rank[i], rank[j] = rank[j], rank[i]
+        self._pos[rank[i]] = i
+        self._pos[rank[j]] = j
+
+    def add(self, k: str, n: int = 1) -> None:
+        if k not in self.counts:
+            if n <= 0:
+                return
+            self.counts[k] = 0
+            self._seq[k] = self._next
+            self._next += 1
+            self._pos[k] = len(self._rank)
+            self._rank.append(k)
+        self.counts[k] += n
+        self.total += n
+        i = self._pos[k]
+        if self.counts[k] <= 0:
+            # như Counter sau khi trừ: không giữ key <= 0
+            self.total -= self.counts[k]
+            del self.counts[k], self._seq[k], self._pos[k], self._rank[i]
+            for j in range(i, len(self._rank)):
+                self._pos[self._rank[j]] = j
+            return
+        key = self._key(k)
+        while i > 0 and self._key(self._rank[i - 1]) > key:
+            self._swap(i - 1, i)
+            i -= 1
+        while i + 1 < len(self._rank) and self._key(self._rank[i + 1]) < key:
+            self._swap(i, i + 1)
+            i += 1
+
+    def most_common(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        keys = self._rank if limit is None else self._rank[:limit]
+        return [(k, self.counts[k]) for k in keys]
+
+
+class HourIndex:
+    """
+    Số lần nổ theo lá của từng slot và của cả box, cho lá tốt nhất mỗi slot và top lá
+    mỗi box mà không phải dựng Counter mỗi request. fold() thay cho fold_hit() để
+    index đi cùng hour data.
+    """
+
+    def __init__(self, data: Optional[dict] = None):
+        self.slots: Dict[str, Dict[str, RankedCounter]] = {}
+        self.cards: Dict[str, RankedCounter] = {}
+        for box, slots in (data or {}).items():
+            if not isinstance(slots, dict):
+                continue
+            for slot, cards in slots.items():
+                for card in cards if isinstance(cards, list) else ():
+                    self._add(box, slot, card, 1)
+
+    def _add(self, box: str, slot: str, card: str, n: int) -> None:
+        if not card:
+            return
+        per_slot = self.slots.setdefault(box, {})
+        counter = per_slot.get(slot)
+        if counter is None:
+            counter = per_slot[slot] = RankedCounter()
+        counter.add(card, n)
+        if not counter.total:
+            del per_slot[slot]
+        # hòa ở top lá theo box: theo thứ tự lá (giống nhau dù build từ file hay cộng dần)
+        self.cards.setdefault(box, RankedCounter(CARD_INDEX)).add(card, n)
+
+    def add_hit(self, box: str, slot: str, card: Optional[str]) -> None:
+        """
+        Cộng 1 lần nổ đã nằm trong hour data (card rỗng = slot rỗng, bỏ qua).
+        """
+        self._add(box, slot, card, 1)
+
+    def fold(self, data: dict, hit: Any) -> Optional[str]:
+        """
+        fold_hit(data, hit) và cập nhật index theo đúng thay đổi của nó.
+        """
+        before = None
+        if isinstance(hit, dict) and is_tombstone(hit):
+            cards = data.get(hit.get("box"), {}).get(hit.get("slot"))
+            before = list(cards) if isinstance(cards, list) else None
+        box = fold_hit(data, hit)
+        if box is None:
+            return None
+        slot = hit["slot"]
+        if before is None:
+            self._add(box, slot, hit.get("card"), 1)
+        elif "card" in hit:
+            self._add(box, slot, hit["card"], -1)
+        else:
+            for card in before:
+                self._add(box, slot, card, -1)
+        return box
+
+    def best(self, box: str, slot: str) -> Optional[Tuple[str, int, int]]:
+        """
+        (lá nổ nhiều nhất ở slot, số lần, tổng số lần nổ của slot) hoặc None.
+        """
+        counter = self.slots.get(box, {}).get(slot)
+        if counter is None or not counter.total:
+            return None
+        card, count = counter.most_common(1)[0]
+        return card, count, counter.total
+
+    def top(self, box: str, limit: Optional[int] = None) -> Tuple[List[Tuple[str, int]], int]:
+        """
+        (top lá của box theo số lần nổ, tổng số lần nổ của box).
+        """
+        counter = self.cards.get(box)
+        if counter is None:
+            return [], 0
+        return counter.most_common(limit), counter.total
+
+
+# -----------------------
+# HourStore: cache hour data + histogram theo phút
+# -----------------------
+class HourStore(CachedFile):
+    """
+    Giữ hour data (hour.json hoặc journal hour.jsonl) trong bộ nhớ như RoundStore.
+    Histogram/prefix sum của mỗi box được build lười và chỉ bị bỏ khi box đó có
+    lần nổ mới (hoặc file bị ghi lại); SlotIndex của box được cập nhật theo từng lần nổ.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._data: dict = empty_hour()
+        self._hist: Dict[str, MinuteHistogram] = {}
+        self._slots: Dict[str, SlotIndex] = {}
+        self._index: Optional[HourIndex] = None  # build lúc cần, sau đó cộng dần theo lần nổ
+        self.tombstones = 0  # journal: số tombstone chưa được compact
+
+    def ensure_file(self) -> None:
+        ensure_hour_file(self.path)
+
+    def _load_full(self) -> None:
+        if self._journal:
+            data = empty_hour()
+            records = self._read_journal_full()
+            for h in records:
+                fold_hit(data, h)
+            self._data = data
+            self.tombstones = sum(1 for h in records if is_tombstone(h))
+        else:
+            self._data = read_hour_file(self.path)
+        self._hist = {}
+        self._slots = {}
+        self._index = None
+
+    def _snapshot_state(self) -> Optional[dict]:
+        return {
+            "tombstones": self.tombstones,
+            "data": self._data,
+            "minutes": {box: (self._hist[box].counts if box in self._hist
+                              else minute_counts_for_box(self._data, box)) for box in HOUR_BOXES},
+        }
+
+    def _restore_snapshot(self, state: dict) -> None:
+        self.tombstones = int(state["tombstones"])
+        self._data = normalize_hour(state["data"])
+        self._hist = {box: MinuteHistogram(list(counts)) for box, counts in state["minutes"].items()
+                      if isinstance(counts, list) and len(counts) == MINUTES_PER_DAY}
+        self._slots = {}
+        self._index = None
+
+    def _apply(self, records: List[Any]) -> None:
+        self.tombstones += sum(1 for h in records if is_tombstone(h))
+        self._fold(self._data, records)
+
+    def _fold(self, data: dict, records: List[Any]) -> None:
+        """
+        fold_hit() từng record vào data, cập nhật index/histogram/SlotIndex theo đúng
+        box bị đổi thay vì build lại từ đầu.
+        """
+        for h in records:
+            box = self._index.fold(data, h) if self._index is not None else fold_hit(data, h)
+            if box is None:
+                continue
+            self._hist.pop(box, None)
+            if is_tombstone(h):
+                self._slots.pop(box, None)
+            elif box in self._slots:
+                self._slots[box] = self._slots[box].with_slot(h["slot"])
+
+    def load(self) -> dict:
+        """
+        Hour data đã cache; dùng chung giữa các request nên chỉ đọc.
+        """
+        with self._lock:
+            self._refresh()
+            return self._data
+
+    def save(self, data: dict) -> None:
+        with self._write_lock():
+            try:
+                write_hour_file(data, self.path)
+            except Exception:
+                self._sig = None
+                raise
+            self._data = normalize_hour(data)
+            self._hist = {}
+            self._slots = {}
+            self._index = None
+            self._mark_written()
+
+    def _rewrite(self, records: List[Any]) -> None:
+        """
+        Không journal: fold các record vào bản sao hour data rồi ghi lại cả file.
+        Dữ liệu dẫn xuất được cập nhật như _apply, không bị bỏ đi như save().
+        """
+        self._refresh()
+        data = copy_hour(self._data)
+        self._fold(data, records)
+        try:
+            write_hour_file(data, self.path)
+        except Exception:
+            # index đã cộng các record chưa ghi được -> buộc parse (và build) lại
+            self._sig = None
+            raise
+        self._data = data
+        self._mark_written()
+
+    def append_hits(self, hits: List[Tuple[str, str, str]]) -> None:
+        if not hits:
+            return
+        records = [{"box": b, "slot": s, "card": c} for b, s, c in hits]
+        with self._write_lock():
+            if self._journal:
+                self._append_journal(records)
+                return
+            self._rewrite(records)
+
+    def remove_hits(self, hits: List[Tuple[str, str, str]]) -> None:
+        """
+        Bỏ các lần nổ (box, slot, card) của round bị xóa; lần nổ không còn trong slot thì bỏ qua.
+        """
+        if not hits:
+            return
+        tombs = [{"op": TOMBSTONE_OP, "box": b, "slot": s, "card": c} for b, s, c in hits]
+        with self._write_lock():
+            if self._journal:
+                self._append_journal(tombs)
+                return
+            self._rewrite(tombs)
+
+    def delete_slot(self, box: str, slot: str) -> bool:
+        with self._write_lock():
+            self._refresh()
+            if slot not in self._data.get(box, {}):
+                return False
+            tomb = {"op": TOMBSTONE_OP, "box": box, "slot": slot}
+            if self._journal:
+                self._append_journal([tomb])
+            else:
+                self._rewrite([tomb])
+            return True
+
+    def compact(self) -> int:
+        """
+        Journal: ghi lại file từ hour data hiện tại (bỏ tombstone). Trả về số tombstone đã dọn.
+        """
+        with self._write_lock():
+            self._refresh()
+            if not self._journal or not self.tombstones:
+                return 0
+            dropped = self.tombstones
+            self.save(self._data)
+            self.tombstones = 0
+        self.write_snapshot()
+        return dropped
+
+    def histogram(self, box: str) -> MinuteHistogram:
+        with self._lock:
+            self._refresh()
+            hist = self._hist.get(box)
+            if hist is None:
+                hist = MinuteHistogram(minute_counts_for_box(self._data, box))
+                self._hist[box] = hist
+            return hist
+
+    def _hour_index(self) -> HourIndex:
+        self._refresh()
+        if self._index is None:
+            self._index = HourIndex(self._data)
+        return self._index
+
+    def best_card(self, box: str, slot: str) -> Optional[Tuple[str, int, int]]:
+        with self._lock:
+            return self._hour_index().best(box, slot)
+
+    def top_cards(self, box: str, limit: Optional[int] = None) -> Tuple[List[Tuple[str, int]], int]:
+        with self._lock:
+            return self._hour_index().top(box, limit)
+
+    def slot_index(self, box: str) -> SlotIndex:
+        with self._lock:
+            self._refresh()
+            idx = self._slots.get(box)
+            if idx is None:
+                slots = self._data.get(box, {})
+                idx = SlotIndex.from_slots(slots if isinstance(slots, dict) else ())
+                self._slots[box] = idx
+            return idx
+
+
+def copy_hour(data: dict) -> dict:
+    """
+    Bản sao đủ sâu để sửa slot mà không đụng vào dữ liệu đang cache.
+    """
+    return {box: ({slot: list(cards) for slot, cards in slots.items()} if isinstance(slots, dict) else slots)
+            for box, slots in data.items()}
+
+_hour_stores: Dict[str, HourStore] = {}
+
+def get_hour_store(path: str = HOUR_FILE) -> HourStore:
+    """
+    Trả về HourStore dùng chung cho path.
+    """
+    key = os.path.abspath(path)
+    with _stores_lock:
+        st = _hour_stores.get(key)
+        if st is None:
+            st = HourStore(path)
+            _hour_stores[key] = st
+        return st
+
+
+# -----------------------
+# Storage interface (chọn backend bằng STORAGE_BACKEND=json|sqlite)
+# -----------------------
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+SQLITE_FILE = os.getenv("SQLITE_FILE", "texascowboy.db")
+# số tombstone (journal) để tự chạy compaction nền sau delete; 0 = chỉ compact khi gọi tay
+COMPACT_THRESHOLD = int(os.getenv("COMPACT_THRESHOLD", "500"))
+
+class PartialCommitError(RuntimeError):
+    """
+    commit_batch: rounds đã ghi nhưng hour hits thì không, và gỡ lại rounds cũng lỗi.
+    Client không được gửi lại các round này (sẽ bị trùng).
+    """
+
+    def __init__(self, round_ids: List[str], cause: BaseException):
+        super().__init__(f"{len(round_ids)} rounds saved but hour hits were not: {cause}")
+        self.round_ids = round_ids
+
+
+class DataVersion(NamedTuple):
+    version: int     # tăng dần mỗi khi dữ liệu đổi
+    etag: str        # định danh nội dung, giống nhau giữa các worker
+    modified: float  # epoch (giây) của lần đổi gần nhất
+
+
+class Storage:
+    """
+    Interface lưu trữ rounds + hour slots dùng chung cho main.py / admin.py.
+    Backend JSON (data.json/hour.json hoặc .jsonl) và SQLite cùng implement.
+    """
+
+    def ensure(self) -> None:
+        raise NotImplementedError
+
+    def data_version(self) -> DataVersion:
+        """
+        Phiên bản dữ liệu hiện tại (rounds + hour), dùng cho ETag/Last-Modified.
+        """
+        raise NotImplementedError
+
+    def raw_json_path(self, which: str) -> Optional[str]:
+        """
+        Path file JSON có thể gửi nguyên cho download ('data' | 'hour'),
+        None nếu backend không lưu dạng đó (journal, sqlite).
+        """
+        return None
+
+    # rounds
+    def load_rounds(self) -> List[dict]:
+        raise NotImplementedError
+
+    def save_rounds(self, arr: List[dict]) -> None:
+        raise NotImplementedError
+
+    def append_round(self, rec: dict) -> None:
+        self.extend_rounds([rec])
+
+    def extend_rounds(self, recs: List[dict]) -> None:
+        """
+        Thêm nhiều round trong 1 lần commit.
+        """
+        raise NotImplementedError
+
+    def delete_round(self, round_id: str) -> int:
+        """
+        Xóa round theo round_id kèm các lần nổ aa/four_kind của nó trong hour data.
+        """
+        raise NotImplementedError
+
+    def existing_round_ids(self, round_ids: Iterable[str]) -> set:
+        """
+        Các round_id trong round_ids đã có trong rounds.
+        """
+        wanted = set(round_ids)
+        if not wanted:
+            return set()
+        return {r.get("round_id") for r in self.load_rounds()} & wanted
+
+    def commit_batch(self, recs: List[dict], hits: List[Tuple[str, str, str]]) -> None:
+        """
+        extend_rounds + append_hits như 1 đơn vị: ghi hits lỗi thì gỡ lại các round vừa
+        thêm, để client retry không tạo round trùng và hour data không lệch khỏi rounds.
+        Gỡ lại cũng lỗi -> PartialCommitError (rounds đã lưu).
+        """
+        self.extend_rounds(recs)
+        if not hits:
+            return
+        try:
+            self.append_hits(hits)
+        except Exception as e:
+            ids = [r["round_id"] for r in recs]
+            try:
+                self._discard_rounds(ids)
+            except Exception:
+                logger.exception("Rolling back %d rounds failed", len(ids))
+                raise PartialCommitError(ids, e) from e
+            raise
+
+    def _discard_rounds(self, round_ids: List[str]) -> None:
+        """
+        Gỡ các round vừa thêm (chưa có hit nào trong hour data).
+        """
+        raise NotImplementedError
+
+    def tombstones(self) -> int:
+        """
+        Số tombstone đang chờ compaction.
+        """
+        return 0
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Ghi lại store vật lý, bỏ tombstone / dữ liệu đã xóa. Trả về số tombstone đã dọn.
+        """
+        return {}
+
+    def write_snapshots(self) -> List[str]:
+        """
+        Ghi snapshot dữ liệu dẫn xuất ngay (ngoài lịch SNAPSHOT_EVERY). Trả về các file đã ghi.
+        """
+        return []
+
+    def maybe_compact(self) -> bool:
+        """
+        Chạy compact() ở thread nền nếu số tombstone vượt COMPACT_THRESHOLD.
+        """
+        if COMPACT_THRESHOLD <= 0 or self.tombstones() < COMPACT_THRESHOLD:
+            return False
+        if not _compact_lock.acquire(blocking=False):
+            return False  # đang có compaction chạy
+
+        def run() -> None:
+            try:
+                logger.info("Background compaction done: %s", self.compact())
+            except Exception:
+                logger.exception("Background compaction failed")
+            finally:
+                _compact_lock.release()
+
+        threading.Thread(target=run, name="compaction", daemon=True).start()
+        return True
+
+    def totals(self) -> Tuple[int, Dict[str, int]]:
+        raise NotImplementedError
+
+    def rounds_between(self, since: Optional[int] = None, until: Optional[int] = None) -> List[dict]:
+        """
+        Các round có since <= ts < until, theo ts tăng dần (round chưa có ts bị bỏ qua).
+        """
+        raise NotImplementedError
+
+    def count_rounds(self, since: Optional[int] = None) -> int:
+        if since is None:
+            return self.totals()[0]
+        return len(self.rounds_between(since))
+
+    def tail_rounds(self, n: int) -> List[dict]:
+        """
+        n round ghi sau cùng theo thứ tự lưu (vd. preview trang admin).
+        """
+        return list(self.iter_rounds(offset=max(0, self.totals()[0] - n))) if n > 0 else []
+
+    def iter_rounds(self, since: Optional[int] = None, offset: int = 0,
+                    limit: Optional[int] = None) -> Iterator[dict]:
+        """
+        Duyệt rounds cho export: theo thứ tự lưu, hoặc theo ts nếu có since.
+        offset/limit để phân trang (cursor = offset của trang kế tiếp).
+        """
+        rounds = self.load_rounds() if since is None else self.rounds_between(since)
+        stop = len(rounds) if limit is None else min(len(rounds), offset + limit)
+        for i in range(offset, stop):
+            yield rounds[i]
+
+    # since/until (epoch UTC) = chỉ tính các round trong cửa sổ [since, until)
+    def card_stats(self, card: str, since: Optional[int] = None,
+                   until: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
+        raise NotImplementedError
+
+    def all_card_stats(self, since: Optional[int] = None,
+                       until: Optional[int] = None) -> Dict[str, Tuple[int, Dict[str, int]]]:
+        """
+        card_stats của mọi lá trong 1 lần (lá không có round nào thì không có key).
+        """
+        raise NotImplementedError
+
+    def top_cards(self, limit: int = 12, since: Optional[int] = None,
+                  until: Optional[int] = None) -> List[Tuple[str, int]]:
+        raise NotImplementedError
+
+    # hour slots
+    def recent_stats(self, window: int, card: Optional[str] = None) -> Tuple[int, Dict[str, int]]:
+        """
+        (số round, số lần mỗi box) trong `window` round mới nhất (window thuộc
+        RECENT_WINDOWS); có card thì chỉ tính các round có first_card == card.
+        """
+        raise NotImplementedError
+
+    def query(self, flt: RoundFilter, targets: Sequence[str], since: Optional[int] = None,
+              until: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
+        """
+        (số round thỏa flt, {box target: số round thỏa flt và nổ box đó}).
+        """
+        raise NotImplementedError
+
+    def load_hour(self) -> dict:
+        raise NotImplementedError
+
+    def save_hour(self, data: dict) -> None:
+        raise NotImplementedError
+
+    def append_hits(self, hits: List[Tuple[str, str, str]]) -> None:
+        raise NotImplementedError
+
+    def delete_slot(self, box: str, slot: str) -> bool:
+        raise NotImplementedError
+
+    def box_card_counts(self, box: str, since: Optional[int] = None,
+                        until: Optional[int] = None) -> Counter:
+        """
+        Số lần nổ của từng lá trên toàn bộ slot của box.
+        Có since/until thì đếm từ các round trong cửa sổ (hour.json không lưu ngày).
+        """
+        raise NotImplementedError
+
+    def slot_best_card(self, box: str, slot: str) -> Optional[Tuple[str, int, int]]:
+        """
+        (lá nổ nhiều nhất ở slot của box, số lần, tổng số lần nổ của slot) hoặc None.
+        """
+        raise NotImplementedError
+
+    def box_top_cards(self, box: str, limit: Optional[int] = None) -> Tuple[List[Tuple[str, int]], int]:
+        """
+        (top lá của box theo số lần nổ - hòa thì theo thứ tự lá, tổng số lần nổ của box).
+        """
+        raise NotImplementedError
+
+    def minute_histogram(self, box: str, since: Optional[int] = None,
+                         until: Optional[int] = None) -> MinuteHistogram:
+        """
+        Histogram theo phút (kèm prefix sum) của box, được cache tới lần nổ kế tiếp.
+        Có since/until thì build từ các round trong cửa sổ, không cache.
+        """
+        raise NotImplementedError
+
+    def minute_counts(self, box: str, since: Optional[int] = None,
+                      until: Optional[int] = None) -> List[int]:
+        return self.minute_histogram(box, since, until).counts
+
+    def sequence_summary(self) -> Dict[str, Any]:
+        """
+        Ma trận chuyển top/loại bài và chuỗi nổ theo box (xem columns.SequenceStats).
+        """
+        raise NotImplementedError
+
+    def slot_index(self, box: str) -> SlotIndex:
+        """
+        SlotIndex các slot của box trong hour data (cache tới lần đổi kế tiếp).
+        """
+        raise NotImplementedError
+
+    def hit_times(self, box: str) -> List[int]:
+        """
+        ts (epoch, tăng dần) của mọi round nổ box, để tính khoảng cách giữa các lần nổ.
+        """
+        raise NotImplementedError
+
+
+class JsonStorage(Storage):
+    """
+    Backend file: rounds qua RoundStore (cache + aggregate), hour qua hour.json/hour.jsonl.
+    """
+
+    def __init__(self, data_file: str = DATA_FILE, hour_file: str = HOUR_FILE):
+        self.data_file = data_file
+        self.hour_file = hour_file
+
+    @property
+    def rounds(self) -> RoundStore:
+        return get_round_store(self.data_file)
+
+    def ensure(self) -> None:
+        self.rounds.ensure_file()
+        self.hours.ensure_file()
+
+    def data_version(self) -> DataVersion:
+        rounds, hours = self.rounds, self.hours
+        sigs = (rounds.signature(), hours.signature())
+        etag = hashlib.sha1(repr(sigs).encode("ascii")).hexdigest()[:16]
+        modified = max((sig[0] for sig in sigs if sig), default=0) / 1e9
+        return DataVersion(rounds.version + hours.version, etag, modified)
+
+    def raw_json_path(self, which: str) -> Optional[str]:
+        path = self.data_file if which == "data" else self.hour_file
+        return None if is_journal(path) else path
+
+    def load_rounds(self) -> List[dict]:
+        return self.rounds.load()
+
+    def save_rounds(self, arr: List[dict]) -> None:
+        self.rounds.save(arr)
+
+    def append_round(self, rec: dict) -> None:
+        self.rounds.append(rec)
+
+    def extend_rounds(self, recs: List[dict]) -> None:
+        self.rounds.extend(recs)
+
+    def tail_rounds(self, n: int) -> List[dict]:
+        return self.rounds.tail(n)
+
+    def iter_rounds(self, since: Optional[int] = None, offset: int = 0,
+                    limit: Optional[int] = None) -> Iterator[dict]:
+        return islice(self.rounds.iter_rounds(since), offset, None if limit is None else offset + limit)
+
+    def existing_round_ids(self, round_ids: Iterable[str]) -> set:
+        return self.rounds.existing_round_ids(round_ids)
+
+    def commit_batch(self, recs: List[dict], hits: List[Tuple[str, str, str]]) -> None:
+        # giữ khoá ghi cả 2 file: worker khác không thấy rounds mới khi hits chưa có
+        with self.rounds._write_lock(), self.hours._write_lock():
+            super().commit_batch(recs, hits)
+
+    def _discard_rounds(self, round_ids: List[str]) -> None:
+        for round_id in round_ids:
+            self.rounds.delete(round_id)
+
+    def delete_round(self, round_id: str) -> int:
+        removed = self.rounds.delete(round_id)
+        self.hours.remove_hits(round_hits(removed))
+        self.maybe_compact()
+        return len(removed)
+
+    def tombstones(self) -> int:
+        return self.rounds.tombstones + self.hours.tombstones
+
+    def compact(self) -> Dict[str, int]:
+        return {"rounds": self.rounds.compact(), "hour": self.hours.compact()}
+
+    def write_snapshots(self) -> List[str]:
+        return [store.snapshot_path for store in (self.rounds, self.hours) if store.write_snapshot()]
+
+    def totals(self) -> Tuple[int, Dict[str, int]]:
+        return self.rounds.totals()
+
+    def rounds_between(self, since: Optional[int] = None, until: Optional[int] = None) -> List[dict]:
+        return self.rounds.between(since, until)
+
+    def count_rounds(self, since: Optional[int] = None) -> int:
+        if since is None:
+            return self.totals()[0]
+        return self.rounds.table_stat(since, None, lambda t, lo, hi: hi - lo)
+
+    def card_stats(self, card: str, since: Optional[int] = None,
+                   until: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
+        if since is None and until is None:
+            return self.rounds.card_stats(card)
+        return self.rounds.table_stat(since, until, lambda t, lo, hi: t.card_stats(card, lo, hi))
+
+    def all_card_stats(self, since: Optional[int] = None,
+                       until: Optional[int] = None) -> Dict[str, Tuple[int, Dict[str, int]]]:
+        if since is None and until is None:
+            return self.rounds.all_card_stats()
+        return self.rounds.table_stat(since, until, lambda t, lo, hi: t.all_card_stats(lo, hi))
+
+    def top_cards(self, limit: int = 12, since: Optional[int] = None,
+                  until: Optional[int] = None) -> List[Tuple[str, int]]:
+        if since is None and until is None:
+            return self.rounds.top_cards(limit)
+        return self.rounds.table_stat(since, until, lambda t, lo, hi: t.top_cards(limit, lo, hi))
+
+    def recent_stats(self, window: int, card: Optional[str] = None) -> Tuple[int, Dict[str, int]]:
+        return self.rounds.recent_stats(window, card)
+
+    def query(self, flt: RoundFilter, targets: Sequence[str], since: Optional[int] = None,
+              until: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
+        return self.rounds.table_stat(since, until, lambda t, lo, hi: t.query(flt, targets, lo, hi))
+
+    @property
+    def hours(self) -> HourStore:
+        return get_hour_store(self.hour_file)
+
+    def load_hour(self) -> dict:
+        return self.hours.load()
+
+    def save_hour(self, data: dict) -> None:
+        self.hours.save(data)
+
+    def append_hits(self, hits: List[Tuple[str, str, str]]) -> None:
+        self.hours.append_hits(hits)
+
+    def delete_slot(self, box: str, slot: str) -> bool:
+        deleted = self.hours.delete_slot(box, slot)
+        self.maybe_compact()
+        return deleted
+
+    def box_card_counts(self, box: str, since: Optional[int] = None,
+                        until: Optional[int] = None) -> Counter:
+        if since is not None or until is not None:
+            return self.rounds.table_stat(since, until, lambda t, lo, hi: t.box_card_counts(box, lo, hi))
+        return Counter(dict(self.hours.top_cards(box)[0]))
+
+    def slot_best_card(self, box: str, slot: str) -> Optional[Tuple[str, int, int]]:
+        return self.hours.best_card(box, slot)
+
+    def box_top_cards(self, box: str, limit: Optional[int] = None) -> Tuple[List[Tuple[str, int]], int]:
+        return self.hours.top_cards(box, limit)
+
+    def minute_histogram(self, box: str, since: Optional[int] = None,
+                         until: Optional[int] = None) -> MinuteHistogram:
+        if since is not None or until is not None:
+            return MinuteHistogram(self.rounds.table_stat(
+                since, until, lambda t, lo, hi: t.minute_counts(box, lo, hi)))
+        return self.hours.histogram(box)
+
+    def slot_index(self, box: str) -> SlotIndex:
+        return self.hours.slot_index(box)
+
+    def sequence_summary(self) -> Dict[str, Any]:
+        return self.rounds.sequence_summary()
+
+    def hit_times(self, box: str) -> List[int]:
+        return self.rounds.table_stat(None, None, lambda t, lo, hi: t.hit_times(box, lo, hi))
+
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+_compact_lock = threading.Lock()
+
+def get_storage() -> Storage:
+    """
+    Storage dùng chung trong process, theo STORAGE_BACKEND (mặc định 'json').
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == "sqlite":
+                from sqlite_store import SqliteStorage
+                _storage = SqliteStorage(SQLITE_FILE)
+            elif STORAGE_BACKEND == "json":
+                _storage = JsonStorage(DATA_FILE, HOUR_FILE)
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+        return _storage
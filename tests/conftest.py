@@ -0,0 +1,31 @@
+# conftest.py
+import os
+
+import pytest
+
+import store
+from helpers import Backend
+
+# import main không được dựng bảng lý thuyết (Monte Carlo) trong lúc chạy test
+os.environ.setdefault("THEORY_WARM", "0")
+
+
+@pytest.fixture(params=["json", "jsonl", "sqlite"])
+def backend(request, tmp_path):
+    b = Backend(request.param, tmp_path)
+    yield b
+    for path in b.paths:
+        store._stores.pop(os.path.abspath(path), None)
+        store._hour_stores.pop(os.path.abspath(path), None)
+
+
+@pytest.fixture
+def client(backend, monkeypatch):
+    """
+    Flask test client của main.app, get_storage() trả về storage của backend.
+    """
+    import main
+    monkeypatch.setattr(store, "_storage", backend.storage)
+    main.app.config["TESTING"] = True
+    with main.app.test_client() as c:
+        yield c
@@ -0,0 +1,259 @@
+# helpers.py
+import os
+import random
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import store
+from columns import BOX_KEYS, CARD_INDEX, CARDS, HAND_OUTCOMES, TOP_OUTCOMES, RoundFilter
+from sqlite_store import SqliteStorage
+from store import HOUR_BOXES, MINUTES_PER_DAY, RECENT_WINDOWS, JsonStorage, Storage, round_hits, slot_minute
+from theory import settle_batch
+
+BASE_TS = 1_700_000_000
+# ít phút khác nhau -> nhiều lần nổ chung 1 slot (lá tốt nhất / top-k có ý nghĩa)
+SLOT_MINUTES = (0, 7, 59, 60, 61, 715, 1380, 1439)
+WINDOW = (BASE_TS + 40 * 86400, BASE_TS + 160 * 86400)
+FILTERS = (
+    RoundFilter(),
+    RoundFilter(rank="A"),
+    RoundFilter(suit="h", with_boxes=("pair_any",)),
+    RoundFilter(rank="K", without_boxes=("cowboy_win",)),
+)
+
+
+def make_rounds(n: int, seed: int, start: int = 0) -> List[dict]:
+    """
+    n round ngẫu nhiên (box chốt từ bài thật), mỗi ngày 1 round bắt đầu từ ngày `start`.
+    """
+    rng = random.Random(seed)
+    deals = [rng.sample(range(52), 9) for _ in range(n)]
+    rounds = []
+    for i, (deal, boxes) in enumerate(zip(deals, settle_batch(deals))):
+        # nhiều lần nổ aa / four_kind hơn thực tế để hour index có dữ liệu
+        for box, p in (("aa", 0.3), ("four_kind", 0.1)):
+            if rng.random() < p and box not in boxes:
+                boxes = boxes + [box]
+        rounds.append({
+            "round_id": f"r{seed}-{i}",
+            "first_card": CARDS[deal[4] % 16],  # ít lá -> nhiều lá trùng trong 1 slot
+            "selected_boxes": boxes,
+            "ts": BASE_TS + (start + i) * 86400 + rng.choice(SLOT_MINUTES) * 60,
+        })
+    return rounds
+
+
+def commit(st: Storage, recs: List[dict]) -> None:
+    # như WriteBehindQueue: rounds + hour hits của chúng trong 1 lần commit
+    st.commit_batch(recs, round_hits(recs))
+
+
+def _box_state(fn):
+    return {box: (lambda st, box=box: fn(st, box)) for box in HOUR_BOXES}
+
+
+# dữ liệu dẫn xuất mà các route đọc, theo tên; state(st, keys) chỉ tính các key cần
+STATE: Dict[str, Callable[[Storage], Any]] = {
+    "rounds": lambda st: list(st.load_rounds()),
+    "totals": lambda st: st.totals(),
+    "cards": lambda st: st.all_card_stats(),
+    "card": lambda st: st.card_stats("Ah"),
+    "top": lambda st: st.top_cards(52),
+    "between": lambda st: [r["round_id"] for r in st.rounds_between(*WINDOW)],
+    "window_count": lambda st: st.count_rounds(WINDOW[0]),
+    "window_card": lambda st: st.card_stats("Ah", *WINDOW),
+    "window_cards": lambda st: st.all_card_stats(*WINDOW),
+    "window_top": lambda st: st.top_cards(52, *WINDOW),
+    "query": lambda st: [st.query(f, BOX_KEYS) for f in FILTERS],
+    "window_query": lambda st: [st.query(f, BOX_KEYS, *WINDOW) for f in FILTERS],
+    "recent": lambda st: {w: (st.recent_stats(w), st.recent_stats(w, "Ah")) for w in RECENT_WINDOWS},
+    "sequence": lambda st: st.sequence_summary(),
+    "hour": lambda st: st.load_hour(),
+}
+for _name, _fn in (
+        ("minutes", lambda st, box: st.minute_histogram(box).counts),
+        ("window_minutes", lambda st, box: st.minute_histogram(box, *WINDOW).counts),
+        ("best", lambda st, box: {slot: st.slot_best_card(box, slot) for slot in st.load_hour().get(box, {})}),
+        ("box_top", lambda st, box: st.box_top_cards(box)),
+        ("box_card_counts", lambda st, box: st.box_card_counts(box)),
+        ("slots", lambda st, box: st.slot_index(box).minutes),
+        ("hit_times", lambda st, box: st.hit_times(box))):
+    for _box, _f in _box_state(_fn).items():
+        STATE[f"{_box}.{_name}"] = _f
+
+
+def box_keys(*names: str) -> Tuple[str, ...]:
+    return tuple(f"{box}.{name}" for name in names for box in HOUR_BOXES)
+
+
+def state(st: Storage, keys: Iterable[str]) -> Dict[str, Any]:
+    return {k: STATE[k](st) for k in keys}
+
+
+# -----------------------
+# Kết quả tính thẳng từ list rounds / hour data (không qua engine nào)
+# -----------------------
+def _box_stats(rounds: List[dict]) -> Tuple[int, Dict[str, int]]:
+    return len(rounds), dict(Counter(b for r in rounds for b in r["selected_boxes"]))
+
+
+def _matches(r: dict, f: RoundFilter) -> bool:
+    card, boxes = r["first_card"], r["selected_boxes"]
+    return ((f.rank is None or card[0] == f.rank) and (f.suit is None or card[1] == f.suit)
+            and all(b in boxes for b in f.with_boxes) and not any(b in boxes for b in f.without_boxes))
+
+
+def _transitions(rounds: List[dict], outcomes: Tuple[str, ...]) -> Dict[str, Any]:
+    counts = [[0] * len(outcomes) for _ in outcomes]
+    prev: Optional[int] = None
+    for r in rounds:
+        hit = [i for i, o in enumerate(outcomes) if o in r["selected_boxes"]]
+        cur = hit[0] if len(hit) == 1 else None
+        if prev is not None and cur is not None:
+            counts[prev][cur] += 1
+        prev = cur
+    return {"outcomes": list(outcomes), "counts": counts,
+            "last": outcomes[prev] if prev is not None else None}
+
+
+def _streaks(rounds: List[dict], box: str) -> Dict[str, int]:
+    runs = {True: [0], False: [0]}
+    last = None
+    for r in rounds:
+        hit = box in r["selected_boxes"]
+        if hit != last:
+            runs[hit].append(0)
+        runs[hit][-1] += 1
+        last = hit
+    current = runs[True][-1] if last is True else 0
+    misses = runs[False][-1] if last is False else 0
+    return {"current": current, "longest": max(runs[True]),
+            "misses": misses, "longest_misses": max(runs[False])}
+
+
+def expected(rounds: List[dict], hour: dict) -> Dict[str, Any]:
+    """
+    Các key của STATE tính lại bằng vòng lặp đơn giản trên rounds / hour data.
+    """
+    by_card: Dict[str, List[dict]] = {}
+    for r in rounds:
+        by_card.setdefault(r["first_card"], []).append(r)
+    since, until = WINDOW
+    in_window = [r for r in rounds if since <= r["ts"] < until]
+    out: Dict[str, Any] = {
+        "totals": _box_stats(rounds),
+        "cards": {c: _box_stats(rs) for c, rs in by_card.items()},
+        "card": _box_stats(by_card.get("Ah", [])),
+        "top": Counter(r["first_card"] for r in rounds).most_common(52),
+        "between": [r["round_id"] for r in sorted(in_window, key=lambda r: r["ts"])],
+        "window_count": sum(1 for r in rounds if r["ts"] >= since),
+        "window_card": _box_stats([r for r in in_window if r["first_card"] == "Ah"]),
+        "recent": {w: (_box_stats(rounds[-w:]), _box_stats([r for r in rounds[-w:] if r["first_card"] == "Ah"]))
+                   for w in RECENT_WINDOWS},
+        "sequence": {
+            "rounds": len(rounds),
+            "top": _transitions(rounds, TOP_OUTCOMES),
+            "hand": _transitions(rounds, HAND_OUTCOMES),
+            "streaks": {b: _streaks(rounds, b) for b in BOX_KEYS},
+        },
+    }
+    for key, rs in (("query", rounds), ("window_query", in_window)):
+        out[key] = []
+        for f in FILTERS:
+            hit = [r for r in rs if _matches(r, f)]
+            out[key].append((len(hit), {b: sum(1 for r in hit if b in r["selected_boxes"]) for b in BOX_KEYS}))
+    for box in HOUR_BOXES:
+        slots = hour.get(box, {})
+        minutes = [0] * MINUTES_PER_DAY
+        for slot, cards in slots.items():
+            minutes[slot_minute(slot)] += len(cards)
+        counts = Counter(c for cards in slots.values() for c in cards)
+        best = {}
+        for slot, cards in slots.items():
+            card, n = Counter(cards).most_common(1)[0]
+            best[slot] = (card, n, len(cards))
+        out[f"{box}.minutes"] = minutes
+        out[f"{box}.best"] = best
+        out[f"{box}.box_top"] = (sorted(counts.items(), key=lambda kv: (-kv[1], CARD_INDEX[kv[0]])),
+                                 sum(counts.values()))
+        out[f"{box}.box_card_counts"] = counts
+        out[f"{box}.slots"] = sorted(slot_minute(s) for s in slots)
+        out[f"{box}.hit_times"] = sorted(r["ts"] for r in rounds if box in r["selected_boxes"])
+    return out
+
+
+def check(backend: "Backend", keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Các key đã chọn: store cộng dần == tính thẳng từ rounds/hour == build lại từ đầu
+    (không snapshot) == nạp từ snapshot. Trả về state của store đang chạy.
+    """
+    keys = tuple(keys)
+    live = state(backend.storage, keys)
+    want = expected(list(backend.storage.load_rounds()), backend.storage.load_hour())
+    for k in keys:
+        if k in want:
+            assert live[k] == want[k], k
+    assert state(backend.reopen(snapshots=False), keys) == live
+    assert state(backend.reopen(), keys) == live
+    return live
+
+
+def exercise(backend: "Backend", keys: Iterable[str]) -> None:
+    """
+    Chạy các thao tác ghi (bulk, từng round, ts cũ chèn giữa, xóa, xóa slot, compact,
+    khởi động lại từ snapshot) và check() các key sau mỗi bước.
+    """
+    keys = tuple(keys)
+    st = backend.storage
+    rounds = make_rounds(240, seed=1)
+    commit(st, rounds)
+    check(backend, keys)
+
+    for rec in make_rounds(30, seed=2, start=240):
+        commit(st, [rec])
+    commit(st, make_rounds(5, seed=3, start=50))  # ts cũ hơn: chèn vào giữa bảng theo ts
+    check(backend, keys)
+
+    rng = random.Random(4)
+    with_hits = [r for r in rounds if any(b in r["selected_boxes"] for b in HOUR_BOXES)]
+    for rid in {r["round_id"] for r in rng.sample(with_hits, 8) + rng.sample(rounds, 8) + rounds[-2:]}:
+        assert st.delete_round(rid) == 1
+    check(backend, keys)
+
+    assert st.delete_slot("aa", next(iter(st.load_hour()["aa"])))
+    st.compact()
+    commit(st, make_rounds(10, seed=5, start=270))
+    check(backend, keys)
+
+    st.write_snapshots()
+    st = backend.storage = backend.reopen()
+    for rec in make_rounds(10, seed=6, start=280):
+        commit(st, [rec])
+    for r in rounds[1::40]:
+        st.delete_round(r["round_id"])
+    check(backend, keys)
+
+
+class Backend:
+    """
+    1 storage trên tmp_path; reopen() bỏ mọi cache trong process, như khởi động lại worker.
+    """
+
+    def __init__(self, kind: str, tmp_path):
+        self.kind = kind
+        ext = "jsonl" if kind == "jsonl" else "json"
+        self.paths: Tuple[str, ...] = (
+            (str(tmp_path / "t.db"),) if kind == "sqlite"
+            else (str(tmp_path / f"data.{ext}"), str(tmp_path / f"hour.{ext}")))
+        self.storage = self.reopen()
+
+    def reopen(self, snapshots: bool = True) -> Storage:
+        if self.kind == "sqlite":
+            return SqliteStorage(self.paths[0])
+        for cache, path in ((store._stores, self.paths[0]), (store._hour_stores, self.paths[1])):
+            cache.pop(os.path.abspath(path), None)
+            if not snapshots and os.path.exists(path + ".snapshot.json"):
+                os.remove(path + ".snapshot.json")
+        st = JsonStorage(*self.paths)
+        st.ensure()
+        return st
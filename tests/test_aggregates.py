@@ -0,0 +1,17 @@
+# test_aggregates.py
+from helpers import check, commit, exercise, make_rounds
+
+KEYS = ("totals", "cards", "card", "top")
+
+
+def test_aggregates_match_rebuild(backend):
+    exercise(backend, KEYS)
+
+
+def test_bulk_then_appends(backend):
+    st = backend.storage
+    commit(st, make_rounds(300, seed=1))
+    assert check(backend, KEYS)["totals"][0] == 300
+    for rec in make_rounds(40, seed=2, start=300):
+        commit(st, [rec])
+    assert check(backend, KEYS)["totals"][0] == 340
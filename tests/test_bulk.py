@@ -0,0 +1,83 @@
+# test_bulk.py
+import json
+
+from helpers import BASE_TS, commit, make_rounds
+
+GOOD = ["cowboy_win", "high_onepair"]
+
+
+def post(client, items):
+    return client.post("/api/rounds/bulk", data=json.dumps(items), content_type="application/json")
+
+
+def test_bulk_reports_errors_per_item(client, backend):
+    items = [
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": BASE_TS, "round_id": "a"},
+        {"first_card": "Xx", "selected_boxes": GOOD},
+        {"first_card": "Kd", "selected_boxes": ["cowboy_win"]},
+        "not an object",
+        {"first_card": "Kd", "selected_boxes": GOOD, "ts": BASE_TS, "slot": "00:00"},
+        {"first_card": "2c", "selected_boxes": ["draw", "two_pair", "four_kind"],
+         "ts": "2023-11-15T00:00:00+07:00", "slot": "00:00"},
+    ]
+    body = post(client, items).get_json()
+    assert (body["accepted"], body["rejected"]) == (2, 4)
+    assert [e["index"] for e in body["errors"]] == [1, 2, 3, 4]
+    assert body["round_ids"][0] == "a"
+    st = backend.storage
+    assert st.totals()[0] == 2
+    # slot suy từ ts (giờ VN), không lấy từ client
+    assert st.load_hour()["four_kind"] == {"00:00": ["2c"]}
+
+
+def test_bulk_rejects_duplicate_round_ids(client, backend):
+    commit(backend.storage, make_rounds(3, seed=1))
+    items = [
+        {"first_card": "Ah", "selected_boxes": GOOD, "round_id": "r1-0"},  # đã có
+        {"first_card": "Ah", "selected_boxes": GOOD, "round_id": "dup"},
+        {"first_card": "Ah", "selected_boxes": GOOD, "round_id": "dup"},
+        {"first_card": "Ah", "selected_boxes": GOOD, "round_id": "new"},
+    ]
+    body = post(client, items).get_json()
+    assert body["round_ids"] == ["new"]
+    assert [e["index"] for e in body["errors"]] == [0, 1, 2]
+    assert backend.storage.totals()[0] == 4
+
+    # id đã xóa thì dùng lại được
+    backend.storage.delete_round("r1-0")
+    body = post(client, [{"first_card": "Ah", "selected_boxes": GOOD, "round_id": "r1-0"}]).get_json()
+    assert body["round_ids"] == ["r1-0"]
+
+
+def test_bulk_ndjson_and_settling(client, backend):
+    lines = [
+        json.dumps({"cowboy": "Ah Ad", "bull": "7c 2d", "board": "As Kh 9s 3c 4d"}),
+        "{broken",
+        json.dumps({"first_card": "Qs", "selected_boxes": GOOD}),
+    ]
+    resp = client.post("/api/rounds/bulk", data="\n".join(lines), content_type="application/x-ndjson")
+    body = resp.get_json()
+    assert (body["accepted"], body["settled"]) == (2, 1)
+    assert [e["index"] for e in body["errors"]] == [1]
+    settled = next(r for r in backend.storage.load_rounds() if r["round_id"] == body["round_ids"][0])
+    assert settled["first_card"] == "As"
+    assert {"cowboy_win", "trips", "aa"} <= set(settled["selected_boxes"])
+    assert client.post("/api/rounds/bulk", data="[1,", content_type="application/json").status_code == 400
+
+
+def test_bulk_ts_accepts_only_epoch_or_iso(client, backend):
+    items = [
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": BASE_TS},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": BASE_TS * 1000},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": "2023-11-15T00:00:00Z"},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": "2h"},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": "now"},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": "today"},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": str(BASE_TS)},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": 1.5},
+        {"first_card": "Ah", "selected_boxes": GOOD, "ts": True},
+    ]
+    body = post(client, items).get_json()
+    assert body["accepted"] == 3
+    assert [e["index"] for e in body["errors"]] == [3, 4, 5, 6, 7, 8]
+    assert sorted(r["ts"] for r in backend.storage.load_rounds()) == [BASE_TS, BASE_TS, 1700006400]
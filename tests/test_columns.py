@@ -0,0 +1,8 @@
+# test_columns.py
+from helpers import exercise
+
+KEYS = ("window_cards", "window_top", "window_query")
+
+
+def test_table_windows_match_rebuild(backend):
+    exercise(backend, KEYS)
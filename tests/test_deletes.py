@@ -0,0 +1,70 @@
+# test_deletes.py
+import random
+
+from helpers import STATE, Backend, check, commit, make_rounds
+from store import HOUR_BOXES, RoundStore
+
+
+def test_deletes_and_compact(backend):
+    st = backend.storage
+    rounds = make_rounds(250, seed=4)
+    commit(st, rounds)
+    rng = random.Random(4)
+    with_hits = [r for r in rounds if any(b in r["selected_boxes"] for b in HOUR_BOXES)]
+    deleted = {r["round_id"] for r in rng.sample(with_hits, 10) + rng.sample(rounds, 10) + rounds[-3:]}
+    for round_id in deleted:
+        assert st.delete_round(round_id) == 1
+    assert st.delete_round("missing") == 0
+    live = check(backend, STATE)
+    assert live["totals"][0] == 250 - len(deleted)
+    assert not deleted & {r["round_id"] for r in live["rounds"]}
+
+    slot = next(iter(live["hour"]["aa"]))
+    assert st.delete_slot("aa", slot)
+    assert slot not in check(backend, ["hour"])["hour"]["aa"]
+
+    st.compact()
+    assert st.tombstones() == 0
+    check(backend, STATE)
+
+    # sau compact vẫn cộng dần đúng
+    commit(st, make_rounds(20, seed=5, start=250))
+    check(backend, STATE)
+
+
+def test_journal_records_tombstones(tmp_path):
+    b = Backend("jsonl", tmp_path)
+    rounds = make_rounds(30, seed=1)
+    commit(b.storage, rounds)
+    for r in rounds[:4]:
+        b.storage.delete_round(r["round_id"])
+    assert b.storage.tombstones() >= 4
+    b.storage.compact()
+    assert b.storage.tombstones() == 0
+    with open(b.paths[0], encoding="utf-8") as f:
+        assert sum(1 for line in f if line.strip()) == 26
+
+
+def test_delete_through_index_keeps_rounds_unloaded(tmp_path):
+    b = Backend("jsonl", tmp_path)
+    rounds = make_rounds(120, seed=6)
+    # round_id trùng + round không dựng lại được từ dòng cột (box lạ, box trùng)
+    rounds[10]["round_id"] = rounds[90]["round_id"]
+    rounds[20]["selected_boxes"] = rounds[20]["selected_boxes"] + ["unknown_box"]
+    rounds[30]["selected_boxes"] = ["aa", "aa"]
+    commit(b.storage, rounds)
+    other = RoundStore(b.paths[0])  # worker khác trên cùng file
+    other.ensure_file()
+    other.totals()
+
+    rs = b.storage.rounds
+    for r in (rounds[5], rounds[10], rounds[119], rounds[60]):
+        assert b.storage.delete_round(r["round_id"]) >= 1
+    assert rs._rounds is None
+    assert b.storage.delete_round(rounds[20]["round_id"]) == 1  # box lạ: nạp list rounds
+    other.totals()  # worker khác dùng nội dung ghi kèm tombstone
+    assert other._rounds is None
+    assert b.storage.delete_round(rounds[30]["round_id"]) == 1
+    assert other.card_stats(rounds[30]["first_card"]) == rs.card_stats(rounds[30]["first_card"])
+    assert other.sequence_summary() == rs.sequence_summary()
+    check(b, STATE)
@@ -0,0 +1,32 @@
+# test_etag.py
+from helpers import commit, make_rounds
+
+
+def test_not_modified_until_data_changes(client, backend):
+    commit(backend.storage, make_rounds(20, seed=1))
+    first = client.get("/api/stats/Ah")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Last-Modified"]
+
+    again = client.get("/api/stats/Ah", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+
+    commit(backend.storage, make_rounds(1, seed=2, start=20))
+    changed = client.get("/api/stats/Ah", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_etag_varies_with_window(client, backend):
+    commit(backend.storage, make_rounds(20, seed=1))
+    all_time = client.get("/api/stats/all").headers["ETag"]
+    windowed = client.get("/api/stats/all?since=1700000000")
+    assert windowed.headers["ETag"] != all_time
+    resp = client.get("/api/stats/all?since=1700000000", headers={"If-None-Match": all_time})
+    assert resp.status_code == 200
+
+
+def test_index_page_is_versioned(client, backend):
+    commit(backend.storage, make_rounds(20, seed=1))
+    page = client.get("/")
+    assert page.status_code == 200
+    assert client.get("/", headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
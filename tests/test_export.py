@@ -0,0 +1,68 @@
+# test_export.py
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from helpers import BASE_TS, commit, make_rounds
+
+
+def ndjson(data):
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+
+def test_export_rounds_pages(client, backend):
+    rounds = make_rounds(120, seed=1)
+    commit(backend.storage, rounds)
+    seen = []
+    cursor = "0"
+    while cursor is not None:
+        resp = client.get(f"/api/export/rounds?limit=50&cursor={cursor}")
+        assert resp.headers["X-Total-Count"] == "120"
+        seen += ndjson(resp.data)
+        cursor = resp.headers.get("X-Next-Cursor")
+    assert [r["round_id"] for r in seen] == [r["round_id"] for r in rounds]
+
+    since = BASE_TS + 100 * 86400
+    resp = client.get(f"/api/export/rounds?since={since}")
+    assert [r["round_id"] for r in ndjson(resp.data)] == [r["round_id"] for r in rounds[100:]]
+    assert client.get("/api/export/rounds?cursor=-1").status_code == 400
+    assert client.get("/api/export/rounds?format=xml").status_code == 400
+
+
+def test_export_gzip_and_csv(client, backend):
+    commit(backend.storage, make_rounds(30, seed=1))
+    plain = client.get("/api/export/rounds").data
+
+    resp = client.get("/api/export/rounds?gzip=1")
+    assert resp.mimetype == "application/gzip" and "rounds.ndjson.gz" in resp.headers["Content-Disposition"]
+    assert gzip.decompress(resp.data) == plain
+
+    resp = client.get("/api/export/rounds", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(resp.data) == plain
+
+    rows = list(csv.DictReader(io.StringIO(client.get("/api/export/hour?format=csv").data.decode("utf-8"))))
+    hour = backend.storage.load_hour()
+    assert len(rows) == sum(len(cards) for slots in hour.values() for cards in slots.values())
+    assert client.get("/api/export/hour?since=1d").status_code == 400
+
+
+def test_json_export_streams_without_loading_rounds(backend):
+    if backend.kind == "sqlite":
+        pytest.skip("sqlite đọc theo cursor")
+    rounds = make_rounds(80, seed=2)
+    rounds[5]["round_id"] = rounds[60]["round_id"]  # id trùng: xóa 1 lần mất cả 2
+    commit(backend.storage, rounds)
+    commit(backend.storage, make_rounds(5, seed=3, start=20))  # ts cũ chèn giữa
+    for r in (rounds[5], rounds[30], rounds[79]):
+        backend.storage.delete_round(r["round_id"])
+    since = BASE_TS + 10 * 86400
+    want = (list(backend.storage.load_rounds()), list(backend.storage.rounds_between(since)))
+
+    st = backend.reopen()
+    got = (list(st.iter_rounds()), list(st.iter_rounds(since)), list(st.iter_rounds(since, 7, 10)))
+    assert st.rounds._rounds is None
+    assert got == want + (want[1][7:17],)
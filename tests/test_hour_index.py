@@ -0,0 +1,14 @@
+# test_hour_index.py
+from helpers import box_keys, commit, exercise, make_rounds
+
+
+def test_hour_index_matches_rebuild(backend):
+    exercise(backend, ("hour",) + box_keys("best", "box_top", "box_card_counts"))
+
+
+def test_top_cards_route(client, backend):
+    commit(backend.storage, make_rounds(150, seed=1))
+    top, total = backend.storage.box_top_cards("aa")
+    body = client.get("/api/top_cards?box=aa&limit=3").get_json()
+    assert [(t["card"], t["count"], t["total"]) for t in body["top"]] == [(c, n, total) for c, n in top[:3]]
+    assert client.get("/api/top_cards?box=nope").status_code == 404
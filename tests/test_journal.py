@@ -0,0 +1,26 @@
+# test_journal.py
+import os
+
+from helpers import Backend, commit, make_rounds, state
+from store import append_journal, read_journal
+
+
+def test_save_appends_instead_of_rewriting(tmp_path):
+    b = Backend("jsonl", tmp_path)
+    commit(b.storage, make_rounds(50, seed=1))
+    data_file = b.paths[0]
+    size = os.path.getsize(data_file)
+    ino = os.stat(data_file).st_ino
+    commit(b.storage, make_rounds(1, seed=2, start=50))
+    assert os.stat(data_file).st_ino == ino
+    records, offset = read_journal(data_file, size)
+    assert [r["round_id"] for r in records] == ["r2-0"]
+    assert offset == os.path.getsize(data_file)
+
+
+def test_other_worker_appends_are_picked_up(tmp_path):
+    b = Backend("jsonl", tmp_path)
+    commit(b.storage, make_rounds(50, seed=1))
+    # worker khác ghi thẳng vào journal: store trong process này thấy qua signature file
+    append_journal(b.paths[0], make_rounds(5, seed=3, start=50))
+    assert state(b.storage, ["totals"])["totals"][0] == 55
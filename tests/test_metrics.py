@@ -0,0 +1,16 @@
+# test_metrics.py
+from helpers import commit, make_rounds
+
+
+def test_metrics_endpoint(client, backend):
+    commit(backend.storage, make_rounds(10, seed=1))
+    client.get("/api/stats/Ah")
+    client.get("/api/stats/Kd")
+    resp = client.get("/metrics")
+    assert resp.mimetype == "text/plain"
+    text = resp.data.decode("utf-8")
+    assert "# TYPE texascowboy_http_request_duration_seconds histogram" in text
+    # label theo rule, không theo path -> 2 request trên chung 1 series
+    assert 'route="/api/stats/<card>"' in text
+    assert 'route="/api/stats/Ah"' not in text
+    assert "texascowboy_store_op_duration_seconds" in text
@@ -0,0 +1,26 @@
+# test_minutes.py
+from helpers import box_keys, commit, exercise, make_rounds
+
+
+def test_minute_histograms_match_rebuild(backend):
+    exercise(backend, box_keys("minutes"))
+
+
+def test_minutes_route(client, backend):
+    commit(backend.storage, make_rounds(120, seed=1))
+    counts = backend.storage.minute_histogram("aa").counts
+
+    full = client.get("/api/minutes/aa").get_json()
+    assert full["counts"] == counts and full["labels"][715] == "11:55"
+
+    hourly = client.get("/api/minutes/aa?agg=60").get_json()
+    assert len(hourly["counts"]) == 24 and sum(hourly["counts"]) == sum(counts)
+
+    # cửa sổ vắt qua nửa đêm: 23:00 -> 01:10
+    night = client.get("/api/minutes/aa?agg=30&from=23:00&to=70").get_json()
+    assert (night["from"], night["to"]) == ("23:00", "01:10")
+    assert night["labels"][:3] == ["23:00", "23:30", "00:00"]
+    assert sum(night["counts"]) == sum(counts[1380:]) + sum(counts[:70])
+
+    assert client.get("/api/aa_minutes").get_json() == full
+    assert client.get("/api/minutes/nope").status_code == 404
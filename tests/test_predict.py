@@ -0,0 +1,24 @@
+# test_predict.py
+import datetime
+
+from helpers import box_keys, commit, exercise, make_rounds
+from store import VN_TZ
+
+
+def test_slot_index_matches_rebuild(backend):
+    exercise(backend, box_keys("slots", "hit_times"))
+
+
+def test_predict_route(client, backend, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "now_vn", lambda: datetime.datetime(2024, 1, 1, 11, 50, tzinfo=VN_TZ))
+    rounds = make_rounds(150, seed=1)
+    commit(backend.storage, rounds)
+    # 11:50 giờ VN: slot kế tiếp là 11:55 (phút 715), rồi 23:00, 23:59, 00:00...
+    body = client.get("/api/predict/aa?n=3").get_json()
+    slots = backend.storage.slot_index("aa").minutes
+    after = [m for m in slots if m > 710] + [m for m in slots if m <= 710]
+    assert [s["slot"] for s in body["next"]] == [f"{m // 60:02d}:{m % 60:02d}" for m in after[:3]]
+    hits = sum(1 for r in rounds if "aa" in r["selected_boxes"])
+    assert body["hits"] == hits and body["gaps"]["count"] == hits - 1
+    assert client.get("/api/predict/nope").status_code == 404
@@ -0,0 +1,21 @@
+# test_query.py
+from helpers import commit, exercise, expected, make_rounds
+
+
+def test_query_matches_rebuild(backend):
+    exercise(backend, ("query", "window_query"))
+
+
+def test_query_route(client, backend):
+    rounds = make_rounds(150, seed=1)
+    commit(backend.storage, rounds)
+    body = client.get("/api/query?rank=A&target=four_kind,aa").get_json()
+    aces = [r for r in rounds if r["first_card"][0] == "A"]
+    assert body["total"] == len(aces)
+    assert body["counts"] == {b: sum(1 for r in aces if b in r["selected_boxes"]) for b in ("four_kind", "aa")}
+    # FILTERS[2]: suit h, with pair_any
+    want = expected(rounds, {})["query"][2]
+    body = client.get("/api/query?suit=h&with=pair_any").get_json()
+    assert (body["total"], body["counts"]) == (want[0], {b: want[1][b] for b in body["counts"]})
+    assert client.get("/api/query?rank=Z").status_code == 400
+    assert client.get("/api/query?with=nope").status_code == 400
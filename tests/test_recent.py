@@ -0,0 +1,41 @@
+# test_recent.py
+import os
+import subprocess
+import sys
+
+from helpers import commit, exercise, make_rounds
+from store import RECENT_WINDOWS, parse_recent_windows
+
+
+def test_recent_windows_match_rebuild(backend):
+    exercise(backend, ("recent",))
+
+
+def test_recent_route(client, backend):
+    rounds = make_rounds(120, seed=1)
+    commit(backend.storage, rounds)
+    w = RECENT_WINDOWS[0]
+    body = client.get(f"/api/stats/Ah?window={w}").get_json()
+    last = [r for r in rounds[-w:] if r["first_card"] == "Ah"]
+    assert body["window"] == w and body["total"] == len(last)
+    assert client.get("/api/stats/Ah?window=7").status_code == 400
+    assert client.get(f"/api/stats/Ah?window={w}&since=1d").status_code == 400
+
+
+def test_recent_windows_are_normalized(tmp_path):
+    assert parse_recent_windows("1000, 0,50,-3,50,,200") == (50, 200, 1000)
+    assert parse_recent_windows("0") == ()
+    # env có cỡ 0: route trả 400 thay vì KeyError, trang chủ vẫn render
+    code = (
+        "import main\n"
+        "c = main.app.test_client()\n"
+        "assert main.RECENT_WINDOWS == (50,)\n"
+        "assert c.get('/api/stats/Ah?window=0').status_code == 400\n"
+        "assert c.get('/api/stats/Ah?window=50').status_code == 200\n"
+        "assert c.get('/').status_code == 200\n"
+    )
+    env = dict(os.environ, RECENT_WINDOWS="0,50,50", THEORY_WARM="0", STORAGE_BACKEND="json",
+               DATA_FILE=str(tmp_path / "data.json"), HOUR_FILE=str(tmp_path / "hour.json"))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
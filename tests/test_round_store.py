@@ -0,0 +1,43 @@
+# test_round_store.py
+import store
+from helpers import commit, make_rounds
+from store import atomic_write_json, get_round_store
+
+
+def test_reads_reuse_parsed_rounds(tmp_path):
+    path = str(tmp_path / "data.json")
+    atomic_write_json(path, make_rounds(20, seed=1))
+    rs = get_round_store(path)
+    assert get_round_store(path) is rs
+    first = rs.load()
+    assert len(first) == 20 and rs.load() is first
+
+    # file đổi từ ngoài (process khác) -> lần đọc sau parse lại
+    atomic_write_json(path, make_rounds(5, seed=2))
+    assert [r["round_id"] for r in rs.load()] == [f"r2-{i}" for i in range(5)]
+    assert rs.totals()[0] == 5
+
+
+def test_tail_rounds_without_loading(backend, monkeypatch):
+    monkeypatch.setattr(store, "TAIL_CHUNK_BYTES", 200)  # nhiều khối, dòng bị cắt giữa khối
+    rounds = make_rounds(60, seed=3)
+    rounds[50]["round_id"] = rounds[10]["round_id"]
+    commit(backend.storage, rounds)
+    for r in (rounds[10], rounds[58], rounds[40]):
+        backend.storage.delete_round(r["round_id"])
+    commit(backend.storage, [dict(rounds[58], first_card="Kd")])  # id đã xóa được ghi lại
+    want = list(backend.storage.load_rounds())
+
+    st = backend.reopen()
+    assert [st.tail_rounds(n) for n in (0, 1, 7, 200)] == [[], want[-1:], want[-7:], want]
+    if backend.kind != "sqlite":
+        assert st.rounds._rounds is None
+
+
+def test_admin_dashboard_and_health(client, backend):
+    rounds = make_rounds(70, seed=4)
+    commit(backend.storage, rounds)
+    body = client.get("/admin/").get_data(as_text=True)
+    assert rounds[-1]["round_id"] in body and rounds[-50]["round_id"] in body
+    assert rounds[-51]["round_id"] not in body
+    assert client.get("/admin/health").status_code == 200
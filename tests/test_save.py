@@ -0,0 +1,36 @@
+# test_save.py
+from helpers import commit, make_rounds
+
+
+def save(client, **form):
+    return client.post("/save", data=form)
+
+
+def test_save_settles_from_dealt_cards(client, backend):
+    resp = save(client, cowboy="Ah Ad", bull="7c 2d", board="As Kh 9s 3c 4d")
+    assert resp.status_code == 302
+    (rec,) = backend.storage.load_rounds()
+    assert rec["first_card"] == "As"
+    assert {"cowboy_win", "trips", "aa", "pair_any"} <= set(rec["selected_boxes"])
+    # lần nổ aa vào hour data theo slot hiện tại, lá = lá mở
+    assert [cards for cards in backend.storage.load_hour()["aa"].values()] == [["As"]]
+
+
+def test_save_rejects_mismatched_settlement(client, backend):
+    commit(backend.storage, make_rounds(3, seed=1))
+    # first_card khác lá chung đầu tiên
+    save(client, first_card="Kd", cowboy="Ah Ad", bull="7c 2d", board="As Kh 9s 3c 4d")
+    # box đã tick khác kết quả từ bài
+    client.post("/save", data={"cowboy": "Ah Ad", "bull": "7c 2d", "board": "As Kh 9s 3c 4d",
+                               "selected_box": ["bull_win", "two_pair"]})
+    # bài không hợp lệ (lá trùng)
+    save(client, cowboy="Ah Ah", bull="7c 2d", board="As Kh 9s 3c 4d")
+    assert backend.storage.totals()[0] == 3
+    with client.session_transaction() as session:
+        assert len(session["_flashes"]) == 3
+
+
+def test_save_without_deal_uses_ticked_boxes(client, backend):
+    client.post("/save", data={"first_card": "Qs", "selected_box": ["draw", "two_pair"]})
+    (rec,) = backend.storage.load_rounds()
+    assert (rec["first_card"], rec["selected_boxes"]) == ("Qs", ["draw", "two_pair"])
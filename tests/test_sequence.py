@@ -0,0 +1,19 @@
+# test_sequence.py
+from helpers import commit, exercise, expected, make_rounds
+
+
+def test_sequence_matches_rebuild(backend):
+    exercise(backend, ("sequence",))
+
+
+def test_sequence_route(client, backend):
+    rounds = make_rounds(100, seed=1)
+    commit(backend.storage, rounds)
+    body = client.get("/api/sequence").get_json()
+    want = expected(rounds, {})["sequence"]
+    assert body["rounds"] == 100 and body["streaks"] == want["streaks"]
+    top = body["top"]
+    assert top["counts"] == want["top"]["counts"]
+    for row, probs in zip(top["counts"], top["probabilities"]):
+        assert sum(probs) == 0 or abs(sum(probs) - 100) < 0.1
+    assert top["next"] == dict(zip(top["outcomes"], top["probabilities"][top["outcomes"].index(top["last"])]))
@@ -0,0 +1,63 @@
+# test_snapshot.py
+import os
+import threading
+
+import pytest
+
+import store
+
+from helpers import STATE, check, commit, make_rounds
+from store import atomic_write_json, write_journal
+
+
+def test_snapshot_restart_then_writes(backend):
+    commit(backend.storage, make_rounds(200, seed=6))
+    backend.storage.write_snapshots()
+    # worker mới nạp từ snapshot rồi tiếp tục ghi / xóa
+    st = backend.storage = backend.reopen()
+    for rec in make_rounds(15, seed=7, start=200):
+        commit(st, [rec])
+    for r in make_rounds(200, seed=6)[::25]:
+        st.delete_round(r["round_id"])
+    check(backend, STATE)
+
+
+def test_cold_start_skips_full_parse(backend):
+    if backend.kind == "sqlite":
+        pytest.skip("sqlite không dùng snapshot")
+    commit(backend.storage, make_rounds(100, seed=1))
+    assert backend.storage.write_snapshots()
+    st = backend.reopen()
+    assert st.totals()[0] == 100
+    assert st.rounds._rounds is None
+    # file bị thay bởi tiến trình khác sau snapshot -> bỏ snapshot, parse lại
+    write = write_journal if backend.kind == "jsonl" else atomic_write_json
+    write(backend.paths[0], make_rounds(7, seed=2))
+    assert backend.reopen().totals()[0] == 7
+
+
+def test_refresh_writes_snapshot_in_background(backend, monkeypatch):
+    if backend.kind == "sqlite":
+        pytest.skip("sqlite không dùng snapshot")
+    commit(backend.storage, make_rounds(50, seed=3))
+    for cached in (backend.storage.rounds, backend.storage.hours):
+        if cached._snapshot_thread is not None:
+            cached._snapshot_thread.join(5)
+    started = threading.Event()
+    release = threading.Event()
+    write = store._atomic_write_bytes
+
+    def slow_write(path, data):
+        started.set()
+        release.wait(5)
+        write(path, data)
+    monkeypatch.setattr(store, "_atomic_write_bytes", slow_write)
+    rs = backend.reopen(snapshots=False).rounds
+    # lần đọc đầu parse đầy đủ -> snapshot được giao cho thread nền, request không chờ
+    assert rs.totals()[0] == 50
+    assert started.wait(5)
+    assert rs.card_stats("Ah") is not None  # thread đang ghi file không giữ lock của store
+    assert not os.path.exists(rs.snapshot_path)
+    release.set()
+    rs._snapshot_thread.join(5)
+    assert os.path.exists(rs.snapshot_path)
@@ -0,0 +1,15 @@
+# test_sqlite_store.py
+from helpers import STATE, Backend, commit, make_rounds, state
+
+
+def test_sqlite_matches_json(tmp_path):
+    rounds = make_rounds(200, seed=1)
+    states = []
+    for kind in ("json", "sqlite"):
+        st = Backend(kind, tmp_path).storage
+        commit(st, rounds)
+        for r in rounds[::17]:
+            assert st.delete_round(r["round_id"]) == 1
+        st.delete_slot("aa", next(iter(st.load_hour()["aa"])))
+        states.append(state(st, STATE))
+    assert states[0] == states[1]
@@ -0,0 +1,15 @@
+# test_stats_all.py
+from helpers import commit, make_rounds
+
+
+def test_stats_all_matches_per_card(client, backend):
+    commit(backend.storage, make_rounds(150, seed=1))
+    body = client.get("/api/stats/all").get_json()
+    assert len(body["cards"]) == 52 and body["total"] == 150
+    for card in ("Ah", "2c", "Ts"):
+        assert body["cards"][card] == client.get(f"/api/stats/{card}").get_json()
+    matrix = body["matrix"]
+    row = matrix["cards"].index("Ah")
+    assert matrix["totals"][row] == body["cards"]["Ah"]["total"]
+    assert dict(zip(matrix["boxes"], matrix["counts"][row])) == {
+        b: body["cards"]["Ah"]["counts"].get(b, 0) for b in matrix["boxes"]}
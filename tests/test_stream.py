@@ -0,0 +1,54 @@
+# test_stream.py
+import threading
+
+from helpers import make_rounds
+from store import round_hits
+from writer import writer
+
+
+def read_event(lines):
+    """
+    Đọc tới hết 1 event SSE, trả về (event, data); bỏ qua dòng retry/comment.
+    """
+    event = data = None
+    for line in lines:
+        if line.startswith("event:"):
+            event = line.split(":", 1)[1].strip()
+        elif line.startswith("data:"):
+            data = line.split(":", 1)[1].strip()
+        elif line == "" and event is not None:
+            return event, data
+    raise AssertionError("stream ended")
+
+
+def sse_lines(resp):
+    buf = ""
+    for chunk in resp.response:
+        buf += chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+        while "\n" in buf:
+            line, buf = buf.split("\n", 1)
+            yield line
+
+
+def test_stream_pushes_saved_rounds(client, backend):
+    resp = client.get("/api/stream", buffered=False)
+    assert resp.mimetype == "text/event-stream"
+    lines = sse_lines(resp)
+    try:
+        event, _ = read_event(lines)
+        assert event == "hello"
+        rec = next(r for r in make_rounds(20, seed=1) if "aa" in r["selected_boxes"])
+        # ghi từ thread khác như 1 request /save đồng thời
+        t = threading.Thread(target=writer.submit, args=([rec], round_hits([rec])))
+        t.start()
+        event, data = read_event(lines)
+        t.join()
+        assert event == "round"
+        assert rec["round_id"] in data and '"aa"' in data
+
+        t = threading.Thread(target=writer.submit, args=(make_rounds(3, seed=2), [], "reset"))
+        t.start()
+        assert read_event(lines)[0] == "reset"
+        t.join()
+    finally:
+        resp.close()
@@ -0,0 +1,56 @@
+# test_theory.py
+import random
+
+import pytest
+
+from theory import card_index, category_of, rank7, settle, settle_batch, STRAIGHT, STRAIGHT_FLUSH
+
+np = pytest.importorskip("numpy")
+from theory import rank7_batch  # noqa: E402
+
+
+def hand(*cards):
+    return [card_index(c) for c in cards]
+
+
+# tay hay sai ở bản vector hóa: wheel, steel wheel, 2 bộ ba, 3 đôi, flush + straight khác chất
+EDGE_HANDS = [
+    hand("Ah", "2d", "3c", "4s", "5h", "9d", "Kc"),
+    hand("Ah", "2h", "3h", "4h", "5h", "9d", "Kc"),
+    hand("Ah", "Ad", "Ac", "Kh", "Kd", "Kc", "2s"),
+    hand("Ah", "Ad", "Kh", "Kd", "Qh", "Qd", "2s"),
+    hand("2h", "3h", "4h", "5h", "7h", "6d", "Kc"),
+    hand("Th", "Td", "Tc", "Ts", "9h", "9d", "9c"),
+    hand("2h", "4d", "6c", "8s", "Th", "Qd", "Ac"),
+]
+
+
+def test_rank7_batch_matches_rank7():
+    rng = random.Random(7)
+    hands = EDGE_HANDS + [rng.sample(range(52), 7) for _ in range(20000)]
+    assert list(rank7_batch(hands)) == [rank7(h) for h in hands]
+    assert category_of(rank7(EDGE_HANDS[0])) == STRAIGHT
+    assert category_of(rank7(EDGE_HANDS[1])) == STRAIGHT_FLUSH
+
+
+def test_settle_batch_matches_settle():
+    rng = random.Random(9)
+    deals = [rng.sample(range(52), 9) for _ in range(2000)]
+    assert settle_batch(deals) == [settle(d) for d in deals]
+
+
+def test_theory_route_is_load_only(client, tmp_path, monkeypatch):
+    import main
+    from theory import TheoryTable
+    table = TheoryTable(str(tmp_path / "theory.json"), samples=200, seed=1, build=False)
+    monkeypatch.setattr(main, "theory", table)
+    resp = client.get("/api/theory/Ah")
+    assert resp.status_code == 503 and resp.headers["Retry-After"] == "10"
+    assert table._thread is None and not (tmp_path / "theory.json").exists()
+
+    # file do `migrate.py theory` (hoặc worker khác) ghi -> đọc được ngay, không cần restart
+    TheoryTable(table.path, samples=200, seed=1).load()
+    body = client.get("/api/theory/Ah").get_json()
+    assert body["card"] == "Ah" and body["samples"] == 200
+    assert set(body["percent"]) >= {"cowboy_win", "aa", "four_kind"}
+    assert client.get("/api/theory/Zz").status_code == 404
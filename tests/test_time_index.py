@@ -0,0 +1,18 @@
+# test_time_index.py
+from helpers import BASE_TS, box_keys, commit, exercise, make_rounds
+
+KEYS = ("between", "window_count", "window_card") + box_keys("window_minutes")
+
+
+def test_time_windows_match_rebuild(backend):
+    exercise(backend, KEYS)
+
+
+def test_windowed_stats_route(client, backend):
+    commit(backend.storage, make_rounds(100, seed=1))
+    since, until = BASE_TS + 10 * 86400, BASE_TS + 30 * 86400
+    body = client.get(f"/api/stats/all?since={since}&until={until}").get_json()
+    assert (body["since"], body["until"]) == (since, until)
+    assert body["total"] == 20
+    assert client.get("/api/stats/all?since=2h").get_json()["total"] == 0
+    assert client.get("/api/stats/all?since=bogus").status_code == 400
@@ -0,0 +1,62 @@
+# test_writer.py
+import threading
+
+import pytest
+
+import store
+from helpers import STATE, commit, make_rounds, state
+from store import round_hits
+from writer import WriteBehindQueue
+
+
+def test_failed_hits_roll_back_rounds(backend):
+    st = backend.storage
+    commit(st, make_rounds(30, seed=8))
+    before = state(st, STATE)
+    rec = next(r for r in make_rounds(30, seed=9, start=30) if "aa" in r["selected_boxes"])
+
+    def fail(*args):
+        raise OSError("disk full")
+    if backend.kind == "sqlite":
+        st._insert_hits = fail
+    else:
+        st.append_hits = fail
+    with pytest.raises(OSError):
+        commit(st, [rec])
+    assert state(st, STATE) == before
+    assert state(backend.reopen(snapshots=False), STATE) == before
+
+
+def test_concurrent_submits_are_all_committed(backend, monkeypatch):
+    monkeypatch.setattr(store, "_storage", backend.storage)
+    queue = WriteBehindQueue(flush_interval=0.01, durability="sync")
+    rounds = make_rounds(40, seed=1)
+
+    def submit(rec):
+        queue.submit([rec], round_hits([rec]))
+    threads = [threading.Thread(target=submit, args=(r,)) for r in rounds]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert backend.storage.totals()[0] == 40
+    assert state(backend.reopen(snapshots=False), ["hour"])["hour"] == backend.storage.load_hour()
+
+
+def test_async_submit_then_flush(backend, monkeypatch):
+    monkeypatch.setattr(store, "_storage", backend.storage)
+    queue = WriteBehindQueue(flush_interval=0.01, durability="async")
+    pending = queue.submit(make_rounds(3, seed=2))
+    queue.flush(5)
+    assert pending.wait(5) == backend.storage.data_version().version
+    assert backend.storage.totals()[0] == 3
+
+
+def test_commit_error_reaches_submitter(backend, monkeypatch):
+    monkeypatch.setattr(store, "_storage", backend.storage)
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(backend.storage, "commit_batch", fail)
+    with pytest.raises(OSError):
+        WriteBehindQueue(durability="sync").submit(make_rounds(1, seed=3))
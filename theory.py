@@ -0,0 +1,555 @@
+# theory.py
+import contextlib
+import os
+import logging
+import random
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy không bắt buộc -> dùng bộ xếp hạng thuần Python (chậm hơn)
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock
+    fcntl = None
+
+from store import atomic_write_json, read_json_file
+
+logger = logging.getLogger(__name__)
+
+# Cấu hình (có thể override bằng env vars)
+# THEORY_FILE: file cache kết quả cho 52 lá
+# THEORY_SAMPLES: số ván Monte Carlo cho mỗi rank (4 chất cho kết quả như nhau)
+# THEORY_SEED: seed cố định -> kết quả tái lập được
+# THEORY_WARM: "0" (mặc định) = app chỉ đọc THEORY_FILE, tạo file bằng `python migrate.py theory`;
+#              "1" = chưa có file thì tính ở thread nền lúc khởi động (khoá '<file>.lock': 1 worker tính)
+THEORY_FILE = os.getenv("THEORY_FILE", "theory.json")
+THEORY_SAMPLES = int(os.getenv("THEORY_SAMPLES", "200000"))
+THEORY_SEED = int(os.getenv("THEORY_SEED", "20240101"))
+THEORY_WARM = os.getenv("THEORY_WARM", "0") == "1"
+THEORY_FORMAT = 1
+# không có numpy: giới hạn số ván để tính xong trong thời gian chấp nhận được
+PY_MAX_SAMPLES = 20000
+BATCH = 50000
+
+RANKS = "23456789TJQKA"
+SUITS = ['h', 'd', 'c', 's']
+ACE = len(RANKS) - 1
+
+# Loại bài (category) của tay 7 lá, tăng dần
+HIGH_CARD, ONE_PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+
+# category của tay thắng -> box bên phải
+CATEGORY_BOX = {
+    HIGH_CARD: "high_onepair",
+    ONE_PAIR: "high_onepair",
+    TWO_PAIR: "two_pair",
+    TRIPS: "trips",
+    STRAIGHT: "trips",
+    FLUSH: "trips",
+    FULL_HOUSE: "full_house",
+    QUADS: "four_kind",
+    STRAIGHT_FLUSH: "four_kind",
+}
+
+OUTCOMES = (
+    "cowboy_win", "draw", "bull_win",
+    "suited_combo", "pair_any", "aa",
+    "high_onepair", "two_pair", "trips", "full_house", "four_kind",
+)
+
+
+def card_index(card: str) -> int:
+    """
+    'Ah' -> rank * 4 + suit (cùng thứ tự với all_cards()). ValueError nếu sai.
+    """
+    if not isinstance(card, str) or len(card) != 2 or card[0] not in RANKS or card[1] not in SUITS:
+        raise ValueError(f"invalid card: {card!r}")
+    return RANKS.index(card[0]) * 4 + SUITS.index(card[1])
+
+
+def card_name(idx: int) -> str:
+    return RANKS[idx >> 2] + SUITS[idx & 3]
+
+# -----------------------
+# Lookup tables (theo bitmask 13 rank)
+# -----------------------
+MASKS = 1 << len(RANKS)
+
+
+def _straight_high(mask: int) -> int:
+    # rank cao nhất của sảnh tốt nhất trong mask, -1 nếu không có; A-2-3-4-5 -> 3 (lá 5)
+    for top in range(ACE, 3, -1):
+        need = 0b11111 << (top - 4)
+        if mask & need == need:
+            return top
+    wheel = (1 << ACE) | 0b1111
+    return 3 if mask & wheel == wheel else -1
+
+
+def _top_ranks(mask: int, k: int) -> int:
+    # k rank cao nhất của mask, gói thành k nibble (cao nhất ở nibble đầu)
+    packed = 0
+    taken = 0
+    for r in range(ACE, -1, -1):
+        if taken == k:
+            break
+        if mask >> r & 1:
+            packed = (packed << 4) | r
+            taken += 1
+    return packed << 4 * (k - taken)
+
+
+STRAIGHT_HIGH = [_straight_high(m) for m in range(MASKS)]
+TOP = {k: [_top_ranks(m, k) for m in range(MASKS)] for k in (1, 2, 3, 5)}
+
+
+def _score(cat: int, packed: int = 0) -> int:
+    # điểm so sánh được: category ở bit 20+, rank/kicker ở 5 nibble dưới
+    return (cat << 20) | packed
+
+
+def category_of(score: int) -> int:
+    return score >> 20
+
+
+def rank7(cards: Sequence[int]) -> int:
+    """
+    Điểm của tay 7 lá (index 0..51); điểm lớn hơn = tay mạnh hơn, bằng nhau = hòa.
+    """
+    counts = [0] * len(RANKS)
+    suit_masks = [0, 0, 0, 0]
+    for c in cards:
+        counts[c >> 2] += 1
+        suit_masks[c & 3] |= 1 << (c >> 2)
+    present = pairs = trips = quads = 0
+    for r, n in enumerate(counts):
+        bit = 1 << r
+        if n:
+            present |= bit
+        if n >= 2:
+            pairs |= bit
+        if n >= 3:
+            trips |= bit
+        if n == 4:
+            quads |= bit
+    flush = next((m for m in suit_masks if bin(m).count("1") >= 5), 0)
+
+    if flush and STRAIGHT_HIGH[flush] >= 0:
+        return _score(STRAIGHT_FLUSH, STRAIGHT_HIGH[flush] << 16)
+    if quads:
+        q = TOP[1][quads]
+        return _score(QUADS, q << 16 | TOP[1][present & ~(1 << q)] << 12)
+    if trips:
+        t = TOP[1][trips]
+        rest = pairs & ~(1 << t)
+        if rest:
+            return _score(FULL_HOUSE, t << 16 | TOP[1][rest] << 12)
+    if flush:
+        return _score(FLUSH, TOP[5][flush])
+    if STRAIGHT_HIGH[present] >= 0:
+        return _score(STRAIGHT, STRAIGHT_HIGH[present] << 16)
+    if trips:
+        t = TOP[1][trips]
+        return _score(TRIPS, t << 16 | TOP[2][present & ~(1 << t)] << 8)
+    if pairs:
+        p1 = TOP[1][pairs]
+        rest = pairs & ~(1 << p1)
+        if rest:
+            p2 = TOP[1][rest]
+            return _score(TWO_PAIR, p1 << 16 | p2 << 12 | TOP[1][present & ~(1 << p1) & ~(1 << p2)] << 8)
+        return _score(ONE_PAIR, p1 << 16 | TOP[3][present & ~(1 << p1)] << 4)
+    return _score(HIGH_CARD, TOP[5][present])
+
+
+def rank7_batch(hands):
+    """
+    Bản vector hóa của rank7 cho mảng (N, 7) index lá -> mảng (N,) điểm. Cần numpy.
+    """
+    straight_high = np.asarray(STRAIGHT_HIGH, dtype=np.int64)
+    top = {k: np.asarray(v, dtype=np.int64) for k, v in TOP.items()}
+    hands = np.asarray(hands, dtype=np.int64)
+    ranks = hands >> 2
+    suits = hands & 3
+    bits = np.int64(1) << ranks
+
+    counts = (ranks[:, :, None] == np.arange(len(RANKS))).sum(axis=1)
+    weights = np.int64(1) << np.arange(len(RANKS), dtype=np.int64)
+    present = (counts >= 1) @ weights
+    pairs = (counts >= 2) @ weights
+    trips = (counts >= 3) @ weights
+    quads = (counts == 4) @ weights
+
+    suit_counts = (suits[:, :, None] == np.arange(4)).sum(axis=1)
+    has_flush = suit_counts.max(axis=1) >= 5
+    flush_suit = suit_counts.argmax(axis=1)
+    flush = np.where(has_flush, (bits * (suits == flush_suit[:, None])).sum(axis=1), 0)
+
+    sf = straight_high[flush]
+    st = straight_high[present]
+    q = top[1][quads]
+    t = top[1][trips]
+    p1 = top[1][pairs]
+    fh_pair = pairs & ~(np.int64(1) << t)
+    second = pairs & ~(np.int64(1) << p1)
+    p2 = top[1][second]
+    one = np.int64(1)
+
+    conds = [
+        sf >= 0,
+        quads > 0,
+        (trips > 0) & (fh_pair > 0),
+        has_flush,
+        st >= 0,
+        trips > 0,
+        second > 0,
+        pairs > 0,
+    ]
+    choices = [
+        STRAIGHT_FLUSH << 20 | sf << 16,
+        QUADS << 20 | q << 16 | top[1][present & ~(one << q)] << 12,
+        FULL_HOUSE << 20 | t << 16 | top[1][fh_pair] << 12,
+        FLUSH << 20 | top[5][flush],
+        STRAIGHT << 20 | st << 16,
+        TRIPS << 20 | t << 16 | top[2][present & ~(one << t)] << 8,
+        TWO_PAIR << 20 | p1 << 16 | p2 << 12 | top[1][present & ~(one << p1) & ~(one << p2)] << 8,
+        ONE_PAIR << 20 | p1 << 16 | top[3][present & ~(one << p1)] << 4,
+    ]
+    return np.select(conds, choices, default=HIGH_CARD << 20 | top[5][present])
+
+
+def _is_suited_combo(a: int, b: int) -> bool:
+    # "Dây / Đồng chất / Dây đồng chất": 2 lá tẩy cùng chất hoặc liền rank (kể cả A-2)
+    ra, rb = a >> 2, b >> 2
+    return (a & 3) == (b & 3) or abs(ra - rb) == 1 or {ra, rb} == {0, ACE}
+
+# -----------------------
+# Chốt kết quả round từ các lá đã chia
+# -----------------------
+DEAL_SIZE = 9  # Cowboy 2 lá, Bull 2 lá, 5 lá chung (lá chung đầu tiên = first_card)
+
+
+def parse_cards(value: Any, count: int) -> List[int]:
+    """
+    List lá hoặc chuỗi 'AhKd' / 'Ah Kd' / 'Ah,Kd' -> list index. ValueError nếu sai số lá.
+    """
+    if isinstance(value, str):
+        value = re.findall(r"\S\S", value.replace(",", " "))
+    if not isinstance(value, (list, tuple)) or len(value) != count:
+        raise ValueError(f"expected {count} cards, got {value!r}")
+    return [card_index(c) for c in value]
+
+
+def parse_deal(cowboy: Any, bull: Any, board: Any) -> List[int]:
+    """
+    9 lá của 1 round theo thứ tự Cowboy, Bull, board. ValueError nếu sai hoặc trùng lá.
+    """
+    deal = parse_cards(cowboy, 2) + parse_cards(bull, 2) + parse_cards(board, 5)
+    if len(set(deal)) != DEAL_SIZE:
+        raise ValueError("duplicate cards in deal")
+    return deal
+
+
+def _settled_boxes(cowboy: int, bull: int, holes: Sequence[Sequence[int]]) -> List[str]:
+    boxes = ["cowboy_win" if cowboy > bull else "draw" if cowboy == bull else "bull_win"]
+    if any(_is_suited_combo(a, b) for a, b in holes):
+        boxes.append("suited_combo")
+    if any((a >> 2) == (b >> 2) for a, b in holes):
+        boxes.append("pair_any")
+    if any((a >> 2) == ACE and (b >> 2) == ACE for a, b in holes):
+        boxes.append("aa")
+    boxes.append(CATEGORY_BOX[category_of(max(cowboy, bull))])
+    return boxes
+
+
+def settle(deal: Sequence[int]) -> List[str]:
+    """
+    selected_boxes của 1 round (deal = 9 index theo parse_deal).
+    """
+    board = list(deal[4:9])
+    cowboy = rank7(list(deal[0:2]) + board)
+    bull = rank7(list(deal[2:4]) + board)
+    return _settled_boxes(cowboy, bull, (deal[0:2], deal[2:4]))
+
+
+def settle_batch(deals: Sequence[Sequence[int]]) -> List[List[str]]:
+    """
+    settle() cho nhiều round: xếp hạng cả batch 1 lần bằng numpy (nếu có).
+    """
+    if not deals:
+        return []
+    if np is None:
+        return [settle(d) for d in deals]
+    arr = np.asarray(deals, dtype=np.int64)
+    cowboy = rank7_batch(arr[:, [0, 1, 4, 5, 6, 7, 8]]).tolist()
+    bull = rank7_batch(arr[:, [2, 3, 4, 5, 6, 7, 8]]).tolist()
+    return [_settled_boxes(c, b, (d[0:2], d[2:4])) for c, b, d in zip(cowboy, bull, deals)]
+
+# -----------------------
+# Xác suất cho lá mở đầu (lá chung đầu tiên)
+# -----------------------
+def _hole_predicates():
+    return {
+        "suited_combo": _is_suited_combo,
+        "pair_any": lambda a, b: (a >> 2) == (b >> 2),
+        "aa": lambda a, b: (a >> 2) == ACE and (b >> 2) == ACE,
+    }
+
+
+def exact_hole_probabilities(revealed: int) -> Dict[str, float]:
+    """
+    Xác suất chính xác (đếm tổ hợp) cho các box chỉ phụ thuộc 2 tay tẩy:
+    P(Cowboy hoặc Bull thỏa) = 1 - P(cả 2 tay không thỏa), với 51 lá còn lại.
+    """
+    rest = [c for c in range(52) if c != revealed]
+    pairs = [(a, b) for i, a in enumerate(rest) for b in rest[i + 1:]]
+    # số cặp (tay Cowboy, tay Bull) rời nhau
+    total = len(pairs) * ((len(rest) - 2) * (len(rest) - 3) // 2)
+    out = {}
+    for key, pred in _hole_predicates().items():
+        misses = [(a, b) for a, b in pairs if not pred(a, b)]
+        degree = [0] * 52
+        for a, b in misses:
+            degree[a] += 1
+            degree[b] += 1
+        # với mỗi tay Cowboy không thỏa: số tay Bull không thỏa và không trùng lá
+        neither = sum(len(misses) - degree[a] - degree[b] + 1 for a, b in misses)
+        out[key] = 1.0 - neither / total
+    return out
+
+
+def _showdown_counts_numpy(revealed: int, samples: int, seed: int) -> List[int]:
+    rng = np.random.default_rng(seed)
+    rest = np.array([c for c in range(52) if c != revealed], dtype=np.int64)
+    wins = np.zeros(3, dtype=np.int64)  # cowboy, draw, bull
+    cats = np.zeros(9, dtype=np.int64)
+    done = 0
+    while done < samples:
+        n = min(BATCH, samples - done)
+        dealt = rest[rng.random((n, len(rest))).argsort(axis=1)[:, :8]]
+        board = np.concatenate([np.full((n, 1), revealed, dtype=np.int64), dealt[:, 4:8]], axis=1)
+        cowboy = rank7_batch(np.concatenate([dealt[:, 0:2], board], axis=1))
+        bull = rank7_batch(np.concatenate([dealt[:, 2:4], board], axis=1))
+        wins += [(cowboy > bull).sum(), (cowboy == bull).sum(), (cowboy < bull).sum()]
+        cats += np.bincount(np.maximum(cowboy, bull) >> 20, minlength=9)
+        done += n
+    return [int(x) for x in wins] + [int(x) for x in cats]
+
+
+def _showdown_counts_python(revealed: int, samples: int, seed: int) -> List[int]:
+    rng = random.Random(seed)
+    rest = [c for c in range(52) if c != revealed]
+    wins = [0, 0, 0]
+    cats = [0] * 9
+    for _ in range(samples):
+        d = rng.sample(rest, 8)
+        board = [revealed] + d[4:8]
+        cowboy = rank7(d[0:2] + board)
+        bull = rank7(d[2:4] + board)
+        wins[0 if cowboy > bull else 1 if cowboy == bull else 2] += 1
+        cats[category_of(max(cowboy, bull))] += 1
+    return wins + cats
+
+
+def card_probabilities(revealed: int, samples: int, seed: int) -> Dict[str, float]:
+    """
+    Xác suất mỗi box khi lá chung đầu tiên là `revealed`.
+    Box tay tẩy: đếm chính xác. Thắng/thua và loại bài thắng: Monte Carlo (đếm hết
+    C(51,2)*C(49,2)*C(47,4) ~ 2.7e11 ván là không khả thi).
+    """
+    probs = exact_hole_probabilities(revealed)
+    counter = _showdown_counts_numpy if np is not None else _showdown_counts_python
+    counts = counter(revealed, samples, seed)
+    for key, n in zip(("cowboy_win", "draw", "bull_win"), counts[:3]):
+        probs[key] = n / samples
+    for key in set(CATEGORY_BOX.values()):
+        probs[key] = 0.0
+    for cat, n in enumerate(counts[3:]):
+        probs[CATEGORY_BOX[cat]] += n / samples
+    return probs
+
+
+def percent_by_section(probs: Dict[str, float]) -> Dict[str, float]:
+    """
+    Cùng cách chia section như compute_stats_for_card: right (trừ four_kind) chuẩn hóa
+    nội bộ, còn lại theo tổng số ván.
+    """
+    out = {k: round(probs[k] * 100, 2) for k in OUTCOMES}
+    non_four = 1.0 - probs["four_kind"]
+    for k in ("high_onepair", "two_pair", "trips", "full_house"):
+        out[k] = round(probs[k] / non_four * 100, 2) if non_four > 0 else 0.0
+    return out
+
+# -----------------------
+# Bảng 52 lá + cache trên đĩa
+# -----------------------
+def _params(samples: int, seed: int) -> dict:
+    return {
+        "format": THEORY_FORMAT,
+        "samples": samples,
+        "seed": seed,
+        "engine": "numpy" if np is not None else "python",
+    }
+
+
+def compute_table(samples: int = THEORY_SAMPLES, seed: int = THEORY_SEED) -> dict:
+    """
+    Tính cho cả 52 lá. Đổi chất không đổi xác suất nên chỉ tính 1 lá mỗi rank.
+    """
+    if np is None and samples > PY_MAX_SAMPLES:
+        logger.warning("numpy not installed; limiting theory samples to %d", PY_MAX_SAMPLES)
+        samples = PY_MAX_SAMPLES
+    cards = {}
+    for i, r in enumerate(RANKS):
+        probs = card_probabilities(card_index(r + SUITS[0]), samples, seed + i)
+        entry = {
+            "percent": {k: round(probs[k] * 100, 3) for k in OUTCOMES},
+            "percent_by_section": percent_by_section(probs),
+        }
+        for s in SUITS:
+            cards[r + s] = entry
+    table = _params(samples, seed)
+    table["cards"] = cards
+    return table
+
+
+class TheoryNotReady(RuntimeError):
+    """
+    Bảng chưa có trong bộ nhớ (đang tính ở thread nền).
+    """
+
+
+class TheoryTable:
+    """
+    Bảng xác suất lý thuyết, tính 1 lần rồi lưu THEORY_FILE; app chỉ đọc file
+    (bỏ qua file nếu samples/seed/engine khác với cấu hình hiện tại).
+    Request không bao giờ tự tính: tạo file bằng `python migrate.py theory` lúc deploy,
+    hoặc THEORY_WARM=1 để 1 worker tính ở thread nền; chưa có bảng thì for_card() raise TheoryNotReady.
+    """
+
+    def __init__(self, path: str = THEORY_FILE, samples: int = THEORY_SAMPLES, seed: int = THEORY_SEED,
+                 build: bool = THEORY_WARM):
+        self.path = path
+        self.samples = samples
+        self.seed = seed
+        self.build = build
+        self._lock = threading.Lock()
+        self._table: Optional[dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        # signature của file lúc đọc không dùng được -> không đọc lại tới khi file đổi
+        self._unusable: Optional[tuple] = None
+
+    def _matches(self, table: dict) -> bool:
+        want = _params(self.samples, self.seed)
+        if np is None:
+            want["samples"] = min(self.samples, PY_MAX_SAMPLES)
+        return all(table.get(k) == v for k, v in want.items()) and isinstance(table.get("cards"), dict)
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _read(self) -> Optional[dict]:
+        try:
+            table = read_json_file(self.path)
+        except (OSError, ValueError):
+            return None
+        return table if isinstance(table, dict) and self._matches(table) else None
+
+    @contextlib.contextmanager
+    def _build_lock(self):
+        """
+        flock trên '<file>.lock': giữa các worker chỉ 1 bên tính, bên kia chờ rồi đọc file đã ghi.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def load(self, rebuild: bool = False) -> dict:
+        """
+        Chặn tới khi có bảng (đọc file hoặc tính). Chỉ dùng cho CLI / thread nền.
+        """
+        if self._table is not None and not rebuild:
+            return self._table
+        with self._build_lock():
+            table = None if rebuild else self._read()
+            if table is None:
+                logger.info("Computing theory table (%d samples per rank)", self.samples)
+                table = compute_table(self.samples, self.seed)
+                try:
+                    atomic_write_json(self.path, table)
+                except OSError:
+                    logger.exception("Could not write theory cache %s", self.path)
+        self._table = table
+        return table
+
+    def _build(self) -> None:
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Building theory table failed")
+
+    def ensure(self) -> Optional[dict]:
+        """
+        Không chặn: trả về bảng nếu đã có (hoặc đọc được THEORY_FILE khớp cấu hình), nếu
+        chưa thì None; với build=True thì đồng thời bắt đầu tính ở thread nền.
+        """
+        if self._table is not None:
+            return self._table
+        with self._lock:
+            if self._table is not None:
+                return self._table
+            # thread không sống qua fork (gunicorn --preload) -> mỗi worker tự khởi động lại
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return None
+            sig = self._signature()
+            if sig is not None and sig != self._unusable:
+                table = self._read()
+                if table is not None:
+                    self._table = table
+                    return table
+            self._unusable = sig
+            if not self.build:
+                return None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._build, name="theory", daemon=True)
+            self._thread.start()
+            return None
+
+    def ready(self) -> bool:
+        return self.ensure() is not None
+
+    def for_card(self, card: str) -> dict:
+        """
+        Kết quả cho 1 lá; KeyError nếu không phải lá hợp lệ, TheoryNotReady nếu bảng chưa có.
+        """
+        table = self.ensure()
+        if table is None:
+            raise TheoryNotReady("theory table is being computed" if self.build
+                                 else "theory table not built yet (python migrate.py theory)")
+        entry = table["cards"][card]
+        return {
+            "card": card,
+            "samples": table["samples"],
+            "seed": table["seed"],
+            "engine": table["engine"],
+            "percent": entry["percent"],
+            "percent_by_section": entry["percent_by_section"],
+        }
+
+
+theory = TheoryTable()
@@ -0,0 +1,157 @@
+# writer.py
+import os
+import atexit
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from events import bus
+from store import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Cấu hình (có thể override bằng env vars)
+# SAVE_FLUSH_INTERVAL: số giây committer chờ gom thêm round trước khi ghi (chỉ ở chế độ async)
+# SAVE_DURABILITY: "sync" = request chờ tới khi ghi xong, "async" = trả về ngay
+SAVE_FLUSH_INTERVAL = float(os.getenv("SAVE_FLUSH_INTERVAL", "0.05"))
+SAVE_DURABILITY = os.getenv("SAVE_DURABILITY", "sync").lower()
+
+Hit = Tuple[str, str, Optional[str]]
+
+
+class PendingWrite:
+    """
+    Một lần submit: các round + hit hour cần ghi, và kết quả sau khi commit.
+    """
+
+    def __init__(self, recs: List[dict], hits: List[Hit], notify: str):
+        self.recs = recs
+        self.hits = hits
+        self.notify = notify  # "round": đẩy delta từng round, "reset": client tải lại
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.version: Optional[int] = None
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Chờ commit xong; raise lại lỗi ghi nếu có. Trả về data version sau commit.
+        """
+        if not self.done.wait(timeout):
+            raise TimeoutError("write-behind commit timed out")
+        if self.error is not None:
+            raise self.error
+        return self.version
+
+
+class WriteBehindQueue:
+    """
+    Đường ghi duy nhất cho /save và /api/rounds/bulk.
+    Request chỉ đưa round đã validate vào queue; 1 thread committer gom mọi thứ
+    đang chờ (async: thêm flush_interval) thành 1 lần commit_batch (rounds + hour hits
+    cùng thành công hoặc cùng không), thay vì 1 lần ghi cho mỗi request.
+    """
+
+    def __init__(self, flush_interval: float = SAVE_FLUSH_INTERVAL, durability: str = SAVE_DURABILITY):
+        self.flush_interval = max(0.0, flush_interval)
+        self.durability = durability
+        self._cond = threading.Condition()
+        self._pending: List[PendingWrite] = []
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_thread(self) -> None:
+        # thread không sống qua fork (gunicorn --preload) -> mỗi worker tự khởi động lại
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, recs: Iterable[dict], hits: Iterable[Hit] = (), notify: str = "round") -> PendingWrite:
+        """
+        Đưa vào queue. Ở chế độ sync thì chờ commit (raise nếu ghi lỗi).
+        """
+        item = PendingWrite(list(recs), list(hits), notify)
+        with self._cond:
+            self._ensure_thread()
+            self._pending.append(item)
+            self._cond.notify_all()
+        if self.durability == "sync":
+            item.wait()
+        return item
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Chờ mọi thứ đang trong queue được ghi xong.
+        """
+        with self._cond:
+            if not self._pending and not self._busy:
+                return
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                return
+            marker = PendingWrite([], [], "round")
+            self._pending.append(marker)
+            self._cond.notify_all()
+        marker.done.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                self._busy = True
+            # async: chờ thêm 1 chút để các request đồng thời vào chung 1 batch.
+            # sync: request đang đứng chờ -> ghi ngay; request đến trong lúc đang ghi
+            # tự gom vào batch kế tiếp nên vẫn được group commit khi tải cao
+            if self.flush_interval and self.durability != "sync":
+                time.sleep(self.flush_interval)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            try:
+                self._commit(batch)
+            finally:
+                with self._cond:
+                    self._busy = bool(self._pending)
+
+    def _commit(self, batch: List[PendingWrite]) -> None:
+        recs = [r for item in batch for r in item.recs]
+        hits = [h for item in batch for h in item.hits]
+        storage = get_storage()
+        try:
+            storage.commit_batch(recs, hits)
+            version = storage.data_version().version if (recs or hits) else None
+        except Exception as e:
+            logger.exception("Group commit of %d rounds failed", len(recs))
+            for item in batch:
+                item.error = e
+                item.done.set()
+            return
+
+        if recs or hits:
+            self._publish(batch, version)
+        for item in batch:
+            item.version = version
+            item.done.set()
+
+    def _publish(self, batch: List[PendingWrite], version: int) -> None:
+        # đẩy delta cho các dashboard đang mở /api/stream; batch nhiều round/item -> reset
+        if any(item.notify == "reset" or len(item.recs) > 1 for item in batch):
+            bus.publish("reset", {"version": version})
+            return
+        for item in batch:
+            if not item.recs:
+                continue
+            bus.publish("round", {
+                "version": version,
+                "round": item.recs[0],
+                "hits": [{"box": b, "slot": s, "card": c} for b, s, c in item.hits],
+            })
+
+
+writer = WriteBehindQueue()
+
+# chế độ async: ghi nốt phần còn trong queue trước khi process thoát
+atexit.register(writer.flush, 10.0)